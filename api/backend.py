@@ -0,0 +1,129 @@
+"""Mosaic backend with a process-level cache of parsed MosaicJSON documents."""
+
+import gzip
+import os
+import threading
+import time
+from typing import Callable
+
+import attr
+import fsspec
+from cachetools import TTLCache
+from cogeo_mosaic.backends.base import MosaicJSONBackend
+from cogeo_mosaic.mosaic import MosaicJSON
+
+from api.mosaic_store import mosaic_versions
+
+MOSAIC_CACHE_SIZE = int(os.getenv("MOSAIC_CACHE_SIZE", "32"))  # documents
+MOSAIC_CACHE_TTL = int(os.getenv("MOSAIC_CACHE_TTL", "3600"))  # seconds
+
+# GDAL settings for tile reads from GCS. Every tile reopens its COGs; the curl
+# range cache is shared by all datasets in the process, so headers and IFDs read
+# once are served from memory until evicted. Deployments can override any of them.
+GDAL_ENV = {
+    # Do not list the bucket prefix when opening a COG.
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.TIF,.tiff",
+    # Global LRU of downloaded byte ranges, in bytes.
+    "CPL_VSIL_CURL_CACHE_SIZE": str(256 * 2**20),
+    # Fetch the header and IFDs of a COG with overviews in one request.
+    "GDAL_INGESTED_BYTES_AT_OPEN": "65536",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "GDAL_HTTP_VERSION": "2",
+}
+
+
+def configure_gdal_env() -> None:
+    """Apply GDAL_ENV defaults to the process environment."""
+    for name, value in GDAL_ENV.items():
+        os.environ.setdefault(name, value)
+
+
+def load_mosaic_document(url: str) -> MosaicJSON:
+    """Read and parse a (optionally gzipped) MosaicJSON from a path or fsspec URI."""
+    fs, path = fsspec.core.url_to_fs(url)
+    data = fs.cat_file(path)
+    if url.endswith(".gz"):
+        data = gzip.decompress(data)
+    return MosaicJSON.model_validate_json(data)
+
+
+class MosaicCache:
+    """
+    Parsed MosaicJSON documents by URL, with LRU eviction and a TTL.
+
+    Documents are stored with the mosaic version they were loaded at and reloaded
+    once the stored version changes, so a mosaic saved by another worker is not
+    served for the rest of the TTL.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = MOSAIC_CACHE_SIZE,
+        ttl: float = MOSAIC_CACHE_TTL,
+        timer: Callable[[], float] = time.monotonic,
+        load: Callable[[str], MosaicJSON] = load_mosaic_document,
+        version: Callable[[str], str | None] = mosaic_versions.get,
+    ):
+        """
+        Create an empty cache.
+
+        Args:
+            maxsize: The maximum number of documents.
+            ttl: Seconds a document is reused before it is loaded again.
+            timer: The clock of the TTL.
+            load: Loads a document from its URL.
+            version: Returns the stored version of a document's URL. See
+                api.mosaic_store.MosaicVersions.
+        """
+        self.load = load
+        self.version = version
+        self._documents: TTLCache[str, tuple[str | None, MosaicJSON]] = TTLCache(
+            maxsize=maxsize, ttl=ttl, timer=timer
+        )
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> MosaicJSON:
+        """Return the cached document of ``url``, loading it on a miss."""
+        version = self.version(url)
+        with self._lock:
+            cached_version, mosaic = self._documents.get(url, (None, None))
+        if mosaic is None or cached_version != version:
+            mosaic = self.load(url)
+            with self._lock:
+                self._documents[url] = (version, mosaic)
+        return mosaic
+
+    def invalidate(self, url: str) -> None:
+        """Drop a document, e.g. after it was regenerated."""
+        with self._lock:
+            self._documents.pop(url, None)
+
+    def clear(self) -> None:
+        """Drop every document."""
+        with self._lock:
+            self._documents.clear()
+
+
+mosaic_cache = MosaicCache()
+
+
+@attr.s
+class CachedMosaicBackend(MosaicJSONBackend):
+    """
+    Read-only MosaicJSON backend for any fsspec URI, served from mosaic_cache.
+
+    Tile requests share one parsed document per mosaic instead of downloading and
+    decompressing it for every request.
+    """
+
+    _backend_name = "Cached MosaicJSON"
+
+    def _read(self) -> MosaicJSON:
+        """Get the mosaicjson document from the process cache."""
+        return mosaic_cache.get(self.input)
+
+    def write(self, overwrite: bool = True):
+        """Mosaics are written by /mosaicjson/generate and /mosaicjson/update."""
+        raise NotImplementedError("CachedMosaicBackend is read-only")
@@ -0,0 +1,331 @@
+"""Two-tier (memory LRU and optional disk) cache for rendered map tiles."""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from starlette.datastructures import QueryParams
+
+logger = logging.getLogger(__name__)
+
+TILE_PATH_PREFIX = "/mosaicjson/tiles/"
+# Query parameters that do not change a rendered tile.
+IGNORED_PARAMS = {"api_key"}
+# Response headers that are recomputed for every cached response.
+DROPPED_HEADERS = {"content-length", "etag", "cache-control", "date", "server"}
+
+
+class CachedTile(NamedTuple):
+    """A rendered tile response."""
+
+    body: bytes
+    headers: dict[str, str]
+    etag: str
+    expires: float
+
+
+def make_etag(body: bytes, version: str | None = None) -> str:
+    """Return a strong ETag for a response body rendered from a mosaic version."""
+    digest = hashlib.sha256(f"{version}\n".encode("utf-8"))
+    digest.update(body)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return whether an If-None-Match header matches an ETag."""
+    if not if_none_match:
+        return False
+    candidates = {
+        value.strip().removeprefix("W/") for value in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
+
+
+def tile_cache_key(path: str, query_params: QueryParams) -> tuple[str, str] | None:
+    """
+    Return the (mosaic URL, cache key) of a tile request, or None if the request
+    is not a cacheable tile request.
+
+    The key is the tile path (tile matrix set, z/x/y, scale and format) plus the
+    sorted render parameters, so parameter order does not split the cache.
+    """
+    if not path.startswith(TILE_PATH_PREFIX):
+        return None
+
+    params = sorted(
+        (name, value)
+        for name, value in query_params.multi_items()
+        if name not in IGNORED_PARAMS
+    )
+    mosaic_url = dict(params).get("url", "")
+    return mosaic_url, json.dumps([path, params])
+
+
+def _versioned_key(key: str, version: str | None) -> str:
+    return json.dumps([version, key])
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """LRU of tile responses bounded by total body size."""
+
+    def __init__(self, max_bytes: int):
+        """Keep at most ``max_bytes`` of tile bodies."""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._tiles: OrderedDict[str, CachedTile] = OrderedDict()
+        self._keys_by_mosaic: dict[str, set[str]] = {}
+        self._mosaic_by_key: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached tiles."""
+        return len(self._tiles)
+
+    def get(self, key: str, now: float) -> CachedTile | None:
+        """Return a tile that has not expired and mark it recently used, or None."""
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                return None
+            if tile.expires <= now:
+                self._pop(key)
+                return None
+            self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, mosaic_url: str, key: str, tile: CachedTile) -> None:
+        """Store a tile, evicting the least recently used ones beyond the budget."""
+        if len(tile.body) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._tiles[key] = tile
+            self._keys_by_mosaic.setdefault(mosaic_url, set()).add(key)
+            self._mosaic_by_key[key] = mosaic_url
+            self.size += len(tile.body)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._tiles)))
+
+    def invalidate(self, mosaic_url: str) -> None:
+        """Drop every tile of a mosaic."""
+        with self._lock:
+            for key in list(self._keys_by_mosaic.get(mosaic_url, ())):
+                self._pop(key)
+
+    def clear(self) -> None:
+        """Drop every tile."""
+        with self._lock:
+            self._tiles.clear()
+            self._keys_by_mosaic.clear()
+            self._mosaic_by_key.clear()
+            self.size = 0
+
+    def _pop(self, key: str) -> None:
+        """Remove a tile and its entry in the per-mosaic index."""
+        tile = self._tiles.pop(key, None)
+        if tile is None:
+            return
+        self.size -= len(tile.body)
+        mosaic_url = self._mosaic_by_key.pop(key)
+        keys = self._keys_by_mosaic[mosaic_url]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_mosaic[mosaic_url]
+
+
+class DiskTier:
+    """
+    Tile responses stored as files, one directory per mosaic.
+
+    The directory can be shared by every worker on a host. Tiles of an outdated
+    mosaic version are never read again, since keys include the version, and age
+    out like other entries: expired entries are removed when read, and the least
+    recently written entries once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        """Store up to about ``max_bytes`` of entries under ``directory``."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+        self._lock = threading.Lock()
+
+    def _path(self, mosaic_url: str, key: str) -> str:
+        return os.path.join(self.directory, _hash(mosaic_url)[:16], _hash(key))
+
+    def _entries(self):
+        """Yield (path, size, mtime) of every stored entry."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, mosaic_url: str, key: str, now: float) -> CachedTile | None:
+        """Return a stored tile that has not expired, or None."""
+        path = self._path(mosaic_url, key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+        tile = CachedTile(body, header["headers"], header["etag"], header["expires"])
+        if tile.expires <= now:
+            self._remove(path)
+            return None
+        return tile
+
+    def put(self, mosaic_url: str, key: str, tile: CachedTile) -> None:
+        """Store a tile atomically, pruning the oldest entries beyond the budget."""
+        path = self._path(mosaic_url, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {"headers": tile.headers, "etag": tile.etag, "expires": tile.expires}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(tile.body)
+        size = os.path.getsize(tmp_path)
+        self._remove(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.size += size
+            if self.size > self.max_bytes:
+                self._prune()
+
+    def invalidate(self, mosaic_url: str) -> None:
+        """Remove the directory of a mosaic."""
+        shutil.rmtree(
+            os.path.join(self.directory, _hash(mosaic_url)[:16]), ignore_errors=True
+        )
+        with self._lock:
+            self.size = sum(size for _, size, _ in self._entries())
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self.size = 0
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.size -= size
+
+    def _prune(self) -> None:
+        """Remove the oldest entries until the tier is at 90% of its budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.size -= size
+
+
+class TileCache:
+    """
+    Cache of rendered tiles, keyed by mosaic URL and version, tile and render
+    parameters.
+
+    Tiles are looked up in memory first, then on disk; disk hits are promoted to
+    memory. A mosaic rewritten by another worker has a new version (see
+    api.mosaic_store.MosaicVersions), so its old tiles are no longer served even
+    though only the writing worker invalidated them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        directory: str | None = None,
+        disk_max_bytes: int = 2**30,
+    ):
+        """
+        Create the memory tier and, if ``directory`` is given, the disk tier.
+
+        Args:
+            max_bytes: The memory tier's budget.
+            ttl: Seconds a tile is served before it is rendered again.
+            directory: The disk tier's directory.
+            disk_max_bytes: The disk tier's budget.
+        """
+        self.ttl = ttl
+        self.memory = MemoryTier(max_bytes)
+        self.disk = DiskTier(directory, disk_max_bytes) if directory else None
+
+    def get(
+        self, mosaic_url: str, key: str, version: str | None = None
+    ) -> CachedTile | None:
+        """Return a cached tile of a mosaic version that has not expired, or None."""
+        key = _versioned_key(key, version)
+        now = time.time()
+        tile = self.memory.get(key, now)
+        if tile is None and self.disk is not None:
+            tile = self.disk.get(mosaic_url, key, now)
+            if tile is not None:
+                self.memory.put(mosaic_url, key, tile)
+        return tile
+
+    def put(
+        self,
+        mosaic_url: str,
+        key: str,
+        body: bytes,
+        headers: dict[str, str],
+        version: str | None = None,
+    ) -> CachedTile:
+        """Cache a tile rendered from a mosaic version and return it with its ETag."""
+        key = _versioned_key(key, version)
+        headers = {
+            name: value
+            for name, value in headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        }
+        tile = CachedTile(
+            body, headers, make_etag(body, version), time.time() + self.ttl
+        )
+        self.memory.put(mosaic_url, key, tile)
+        if self.disk is not None:
+            try:
+                self.disk.put(mosaic_url, key, tile)
+            except OSError as e:
+                # A full disk or a concurrent invalidation must not fail the request.
+                logger.warning(f"Failed to cache tile on disk: {e}")
+        return tile
+
+    def invalidate(self, mosaic_url: str) -> None:
+        """Drop every cached tile of a mosaic, e.g. after it was regenerated."""
+        self.memory.invalidate(mosaic_url)
+        if self.disk is not None:
+            self.disk.invalidate(mosaic_url)
+
+    def clear(self) -> None:
+        """Drop every cached tile."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
@@ -0,0 +1,247 @@
+"""Export a mosaic as a static PMTiles archive, for serving without a live tiler."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import fsspec
+import morecantile
+from cogeo_mosaic.mosaic import MosaicJSON
+from pmtiles.tile import Compression, TileType, tileid_to_zxy, zxy_to_tileid
+from pmtiles.writer import Writer
+from rio_tiler.colormap import cmap
+from rio_tiler.errors import EmptyMosaicError, NoAssetFoundError
+
+from api.backend import CachedMosaicBackend, configure_gdal_env, load_mosaic_document
+
+DEFAULT_MIN_ZOOM = 0
+DEFAULT_MAX_ZOOM = 12
+# Rendering options of the frontend's tile layer (frontend/index.html).
+COLORMAP_NAME = "coolwarm"
+RESCALE = (0, 100)
+# Tiles rendered per worker task.
+CHUNK_SIZE = 64
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+WEB_MERCATOR = morecantile.tms.get("WebMercatorQuad")
+
+# Set in each worker process by _init_worker().
+_backend: CachedMosaicBackend | None = None
+
+
+def pyramid_tile_ids(bounds: Sequence[float], minzoom: int, maxzoom: int) -> list[int]:
+    """Return the PMTiles IDs of the tiles covering WGS84 bounds, in archive order."""
+    tiles = WEB_MERCATOR.tiles(*bounds, zooms=list(range(minzoom, maxzoom + 1)))
+    return sorted(zxy_to_tileid(tile.z, tile.x, tile.y) for tile in tiles)
+
+
+def _init_worker(mosaic_url: str, log_level: str) -> None:
+    """Open the mosaic once per worker process."""
+    global _backend
+    logging.basicConfig(level=getattr(logging, log_level), format=LOG_FORMAT)
+    configure_gdal_env()
+    # attrs generates __init__ from the untyped MosaicJSONBackend base, which mypy
+    # cannot see.
+    _backend = CachedMosaicBackend(mosaic_url)  # type: ignore[call-arg]
+
+
+def render_tile(backend: CachedMosaicBackend, z: int, x: int, y: int) -> bytes | None:
+    """
+    Render a tile as the frontend requests it from the tiler.
+
+    Returns:
+        The PNG, or None if the tile has no data.
+    """
+    if not backend.assets_for_tile(x, y, z):
+        return None
+    try:
+        img, _ = backend.tile(x, y, z, indexes=1)
+    except (EmptyMosaicError, NoAssetFoundError):
+        return None
+    if img.array.mask.all():
+        return None
+
+    img.rescale(in_range=(RESCALE,))
+    return img.render(img_format="PNG", colormap=cmap.get(COLORMAP_NAME))
+
+
+def render_tiles(tile_ids: list[int]) -> list[tuple[int, bytes]]:
+    """Render a chunk of tiles in a worker process, dropping empty tiles."""
+    if _backend is None:
+        raise RuntimeError("render_tiles must run in a worker set up by _init_worker")
+    rendered = []
+    for tile_id in tile_ids:
+        data = render_tile(_backend, *tileid_to_zxy(tile_id))
+        if data is not None:
+            rendered.append((tile_id, data))
+    return rendered
+
+
+def pmtiles_header(mosaic: MosaicJSON, minzoom: int, maxzoom: int) -> dict:
+    """Build the PMTiles header of a PNG pyramid of a mosaic."""
+    west, south, east, north = mosaic.bounds
+    center_lon, center_lat, center_zoom = mosaic.center
+    return {
+        "tile_type": TileType.PNG,
+        "tile_compression": Compression.NONE,
+        "min_lon_e7": int(west * 1e7),
+        "min_lat_e7": int(south * 1e7),
+        "max_lon_e7": int(east * 1e7),
+        "max_lat_e7": int(north * 1e7),
+        "center_zoom": min(max(int(center_zoom), minzoom), maxzoom),
+        "center_lon_e7": int(center_lon * 1e7),
+        "center_lat_e7": int(center_lat * 1e7),
+    }
+
+
+def _write_archive(
+    f,
+    mosaic_url: str,
+    mosaic: MosaicJSON,
+    minzoom: int,
+    maxzoom: int,
+    workers: int | None,
+    log_level: str,
+) -> int:
+    tile_ids = pyramid_tile_ids(mosaic.bounds, minzoom, maxzoom)
+    chunks = [tile_ids[i : i + CHUNK_SIZE] for i in range(0, len(tile_ids), CHUNK_SIZE)]
+    logging.info(
+        "Rendering up to %d tiles (z%d-z%d) of %s",
+        len(tile_ids),
+        minzoom,
+        maxzoom,
+        mosaic_url,
+    )
+
+    writer = Writer(f)
+    count = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(mosaic_url, log_level),
+    ) as executor:
+        # map() yields chunks in submission order, so tiles are written in tile ID
+        # order and the archive is clustered.
+        for i, rendered in enumerate(executor.map(render_tiles, chunks), start=1):
+            for tile_id, data in rendered:
+                writer.write_tile(tile_id, data)
+            count += len(rendered)
+            if i % 100 == 0:
+                logging.info("Rendered %d/%d chunks", i, len(chunks))
+
+    if not count:
+        raise ValueError(f"No tiles with data in {mosaic_url}")
+
+    metadata = {
+        "name": os.path.basename(mosaic_url),
+        "description": "Yearly clear sky percentage",
+        "format": "png",
+        "minzoom": minzoom,
+        "maxzoom": maxzoom,
+        "colormap_name": COLORMAP_NAME,
+        "rescale": list(RESCALE),
+        "mosaic": mosaic_url,
+        "mosaic_version": mosaic.version,
+    }
+    writer.finalize(pmtiles_header(mosaic, minzoom, maxzoom), metadata)
+    return count
+
+
+def export_pmtiles(
+    mosaic_url: str,
+    output: str,
+    minzoom: int = DEFAULT_MIN_ZOOM,
+    maxzoom: int = DEFAULT_MAX_ZOOM,
+    workers: int | None = None,
+    log_level: str = "INFO",
+) -> int:
+    """
+    Render a mosaic's tile pyramid into one PMTiles archive.
+
+    Tiles are rendered with the frontend's colormap and rescaling, in chunks of
+    CHUNK_SIZE tiles across worker processes. Tiles without data are left out of
+    the archive, and identical tiles, such as uniform ones, are stored once.
+
+    Args:
+        mosaic_url: The MosaicJSON path or fsspec URI.
+        output: A local path or fsspec URI. Remote archives are written locally
+            and uploaded in one transfer.
+        minzoom: The lowest zoom level.
+        maxzoom: The highest zoom level; clients overzoom beyond it.
+        workers: The number of render processes; defaults to the CPU count.
+        log_level: The log level of the worker processes.
+
+    Returns:
+        The number of tiles written.
+
+    Raises:
+        ValueError: If no tile has data.
+    """
+    mosaic = load_mosaic_document(mosaic_url)
+
+    remote = "://" in output and not output.startswith("file://")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if remote:
+            local_path = os.path.join(tmp_dir, os.path.basename(output))
+        else:
+            local_path = output.removeprefix("file://")
+        with open(local_path, "wb") as f:
+            count = _write_archive(
+                f, mosaic_url, mosaic, minzoom, maxzoom, workers, log_level
+            )
+        if remote:
+            fs, fs_path = fsspec.core.url_to_fs(output)
+            fs.put_file(local_path, fs_path)
+
+    logging.info("Wrote %d tiles to %s", count, output)
+    return count
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(
+        description="Export a clear-sky mosaic as a static PMTiles archive."
+    )
+    parser.add_argument("mosaic_url", help="MosaicJSON path or URI, e.g. gs://...")
+    parser.add_argument("output", help="Output .pmtiles path or URI.")
+    parser.add_argument("--minzoom", type=int, default=DEFAULT_MIN_ZOOM)
+    parser.add_argument("--maxzoom", type=int, default=DEFAULT_MAX_ZOOM)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of render processes. Defaults to the CPU count.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the CLI."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not 0 <= args.minzoom <= args.maxzoom:
+        parser.error("--minzoom must be between 0 and --maxzoom")
+    logging.basicConfig(level=getattr(logging, args.log_level), format=LOG_FORMAT)
+    configure_gdal_env()
+    export_pmtiles(
+        args.mosaic_url,
+        args.output,
+        minzoom=args.minzoom,
+        maxzoom=args.maxzoom,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
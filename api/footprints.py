@@ -0,0 +1,137 @@
+"""Concurrent COG footprint reads for MosaicJSON generation."""
+
+import asyncio
+import json
+import logging
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from cogeo_mosaic.mosaic import MosaicJSON
+from rio_tiler.constants import WGS84_CRS
+from rio_tiler.io import Reader
+
+logger = logging.getLogger(__name__)
+
+# Header reads are network-bound, so far more threads than cores pay off.
+MAX_THREADS = int(os.getenv("MOSAIC_MAX_THREADS", "32"))
+# Sidecar reads share the filesystem's connection pool and need no thread.
+MAX_CONCURRENT_READS = int(os.getenv("MOSAIC_MAX_CONCURRENT_READS", "128"))
+# Footprint sidecars written next to each COG by the data pipeline.
+FOOTPRINT_SUFFIX = "_footprint.json"
+
+
+class FootprintError(RuntimeError):
+    """Raised when some COG headers cannot be read."""
+
+    def __init__(self, failures: dict[str, str]):
+        """Store the error message of each COG URL that failed."""
+        self.failures = failures
+        urls = ", ".join(sorted(failures))
+        super().__init__(f"Failed to read {len(failures)} COG(s): {urls}")
+
+
+def read_cog_footprint(url: str) -> dict:
+    """Read the WGS84 bounds and zoom range of one COG as a GeoJSON feature."""
+    with Reader(url) as src:
+        minx, miny, maxx, maxy = src.get_geographic_bounds(WGS84_CRS)
+        minzoom, maxzoom = src.minzoom, src.maxzoom
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [
+                [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+            ],
+        },
+        "properties": {"path": url, "minzoom": minzoom, "maxzoom": maxzoom},
+    }
+
+
+def get_footprint_path(url: str) -> str:
+    """Return the footprint sidecar path of a COG."""
+    return os.path.splitext(url)[0] + FOOTPRINT_SUFFIX
+
+
+async def read_footprint_sidecar(fs, url: str) -> dict | None:
+    """Read a COG's footprint sidecar from an async filesystem, or return None."""
+    try:
+        feature = json.loads(await fs._cat_file(get_footprint_path(url)))
+    except FileNotFoundError:
+        return None
+
+    # The COG may be served from a different URL than the one it was written to.
+    feature["properties"]["path"] = url
+    return feature
+
+
+async def read_cog_footprints(
+    urls: list[str],
+    fs=None,
+    max_threads: int = MAX_THREADS,
+    max_concurrent_reads: int = MAX_CONCURRENT_READS,
+) -> list[dict]:
+    """
+    Read COG footprints concurrently without blocking the event loop.
+
+    Sidecars are fetched with the async filesystem; COG headers, which GDAL reads
+    synchronously, are read in worker threads. Total latency is close to the
+    slowest single read instead of the sum of all of them. Features are returned
+    in the order of ``urls``.
+
+    Args:
+        urls: The COG URLs.
+        fs: The async filesystem holding footprint sidecars. When given, COG
+            headers are only read for COGs without a sidecar.
+        max_threads: The maximum number of concurrent COG header reads.
+        max_concurrent_reads: The maximum number of concurrent sidecar reads.
+
+    Raises:
+        FootprintError: If any footprint cannot be read.
+    """
+    if not urls:
+        return []
+
+    loop = asyncio.get_running_loop()
+    sidecar_slots = asyncio.Semaphore(max_concurrent_reads)
+
+    async def read(url: str, executor: ThreadPoolExecutor) -> dict | Exception:
+        try:
+            if fs is not None:
+                async with sidecar_slots:
+                    feature = await read_footprint_sidecar(fs, url)
+                if feature is not None:
+                    return feature
+            return await loop.run_in_executor(executor, read_cog_footprint, url)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(max_threads, len(urls))) as executor:
+        results = await asyncio.gather(*(read(url, executor) for url in urls))
+
+    failures = {
+        url: str(result)
+        for url, result in zip(urls, results)
+        if isinstance(result, Exception)
+    }
+    if failures:
+        raise FootprintError(failures)
+    return [result for result in results if not isinstance(result, Exception)]
+
+
+def mosaic_from_footprints(features: list[dict]) -> MosaicJSON:
+    """
+    Build a MosaicJSON from COG footprint features.
+
+    Zoom levels follow ``MosaicJSON.from_urls``: the highest minzoom and maxzoom
+    among the COGs.
+    """
+    zooms = {}
+    for name in ("minzoom", "maxzoom"):
+        values = {feature["properties"][name] for feature in features}
+        if len(values) > 1:
+            warnings.warn(f"COGs have different {name} values: {sorted(values)}")
+        zooms[name] = max(values)
+
+    return MosaicJSON.from_features(features, quiet=True, **zooms)
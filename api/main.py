@@ -1,25 +1,56 @@
-import gzip
-import json
+import asyncio
 import logging
 import os
+import re
 import secrets
-import time
-from collections import defaultdict
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Annotated, Optional
 
 import gcsfs
-from cogeo_mosaic.backends import MosaicBackend
 from cogeo_mosaic.mosaic import MosaicJSON
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Body, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from geojson_pydantic import Feature, FeatureCollection
+from pydantic import Field
+from rasterio.errors import RasterioIOError
+from starlette.concurrency import run_in_threadpool
 from titiler.mosaic.factory import MosaicTilerFactory
 
+from api.backend import CachedMosaicBackend, configure_gdal_env, mosaic_cache
+from api.cache import TileCache, etag_matches, tile_cache_key
+from api.footprints import FootprintError, mosaic_from_footprints, read_cog_footprints
+from api.mosaic_store import (
+    GenerationMismatch,
+    encode_mosaic,
+    merge_features,
+    mosaic_versions,
+    read_mosaic,
+    write_mosaic,
+)
+from api.point_query import MAX_POINTS, query_points
+from api.rate_limit import RateLimiter, backend_from_url
+from api.validation import validate_mosaic_file
+from api.zonal_stats import MAX_FEATURES as ZONAL_STATS_MAX_FEATURES
+from api.zonal_stats import polygon_statistics
+
 RATE_LIMIT = 100  # requests
 RATE_WINDOW = 60  # seconds
 API_KEY = os.getenv("API_KEY")
 SUPPORTED_SENSORS = {"landsat", "sentinel2"}
+# Tile IDs as the pipeline names its outputs (clear_sky.format_satellite_tile_key).
+TILE_ID_PATTERNS = {
+    "landsat": re.compile(r"landsat_\d{3}_\d{3}"),
+    "sentinel2": re.compile(r"sentinel2_\d{2}[A-Z]{3}"),
+}
+# The name suffix of the pipeline's COGs and of the mosaics built from them. COGs
+# are multi-band uint16 since they gained the valid-observation count band, but the
+# legacy suffix is kept so existing COGs and the frontend's mosaic URLs still match.
+# It must stay in sync with run_tile.DEFAULT_OUTPUT_TEMPLATE.
+DEFAULT_GLOB_PATTERN = "uint8"
 PUBLIC_PATHS = {"/health", "/mosaicjson/sensors"}
+POLYGON_TYPES = {"Polygon", "MultiPolygon"}
+TILE_CACHE_MAX_AGE = int(os.getenv("TILE_CACHE_MAX_AGE", "3600"))  # seconds
 ALLOWED_ORIGINS = os.getenv(
     "ALLOWED_ORIGINS",
     "http://localhost:3001",  # default for local dev only
@@ -31,11 +62,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+Longitude = Annotated[float, Field(ge=-180, le=180)]
+Latitude = Annotated[float, Field(ge=-90, le=90)]
+
 os.environ["GS_NO_SIGN_REQUEST"] = "YES"
+configure_gdal_env()
+
+# One async filesystem, and so one aiohttp session and connection pool, shared by
+# every mosaic request handled by this worker.
+fs = gcsfs.GCSFileSystem(asynchronous=True)
 
-fs = gcsfs.GCSFileSystem()
 
-app = FastAPI(title="WRS2 Mosaic Server")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared GCS session on startup and close it on shutdown."""
+    await fs._set_session()
+    yield
+    await fs._session.close()
+    fs._session = None
+
+
+app = FastAPI(title="WRS2 Mosaic Server", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -43,6 +90,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Clear-sky products are static between mosaic regenerations. Cached tiles are keyed
+# on the mosaic's stored version, so a regeneration by any worker retires them.
+tile_cache = TileCache(
+    max_bytes=int(os.getenv("TILE_CACHE_MAX_BYTES", str(256 * 2**20))),
+    ttl=int(os.getenv("TILE_CACHE_TTL", "86400")),
+    directory=os.getenv("TILE_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("TILE_CACHE_DISK_MAX_BYTES", str(2**30))),
+)
+
+
+# Registered first so it runs inside the API key and rate limit middleware.
+@app.middleware("http")
+async def tile_cache_middleware(request: Request, call_next):
+    """Serve repeated tile requests from the tile cache, with ETag revalidation."""
+    cache_key = None
+    if request.method == "GET":
+        cache_key = tile_cache_key(request.url.path, request.query_params)
+    if cache_key is None:
+        return await call_next(request)
+
+    mosaic_url, key = cache_key
+    version = await run_in_threadpool(mosaic_versions.get, mosaic_url)
+    tile = await run_in_threadpool(tile_cache.get, mosaic_url, key, version)
+    status = "HIT"
+    if tile is None:
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        tile = await run_in_threadpool(
+            tile_cache.put, mosaic_url, key, body, dict(response.headers), version
+        )
+        status = "MISS"
+
+    cache_headers = {
+        "ETag": tile.etag,
+        "Cache-Control": f"private, max-age={TILE_CACHE_MAX_AGE}",
+        "X-Tile-Cache": status,
+    }
+    if etag_matches(request.headers.get("if-none-match"), tile.etag):
+        return Response(status_code=304, headers=cache_headers)
+    return Response(content=tile.body, headers={**tile.headers, **cache_headers})
+
 
 @app.middleware("http")
 async def api_key_middleware(request: Request, call_next):
@@ -62,8 +152,14 @@ async def api_key_middleware(request: Request, call_next):
     return await call_next(request)
 
 
-# Simple in-memory rate limiter
-rate_limit_storage: dict = defaultdict(list)
+# Per-process by default; RATE_LIMIT_BACKEND=sqlite:///PATH shares limits between
+# the uvicorn workers on a host.
+rate_limiter = RateLimiter(
+    RATE_LIMIT,
+    RATE_WINDOW,
+    backend=backend_from_url(os.getenv("RATE_LIMIT_BACKEND", "memory")),
+)
+rate_limit_storage = rate_limiter.backend
 
 
 @app.middleware("http")
@@ -72,27 +168,67 @@ async def rate_limit_middleware(request: Request, call_next):
     if request.url.path in PUBLIC_PATHS:
         return await call_next(request)
 
-    client_ip = request.client.host
-    now = time.time()
-
-    # Clean old requests
-    rate_limit_storage[client_ip] = [
-        req_time
-        for req_time in rate_limit_storage[client_ip]
-        if now - req_time < RATE_WINDOW
-    ]
-    if len(rate_limit_storage[client_ip]) >= RATE_LIMIT:
+    # The SQLite backend waits on a file lock, so counting runs off the event loop.
+    if not await run_in_threadpool(rate_limiter.allow, request.client.host):
         return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
-    rate_limit_storage[client_ip].append(now)
     return await call_next(request)
 
 
+def invalidate_mosaic(gcs_path: str) -> None:
+    """Drop the cached version, document and tiles of a mosaic that was just saved."""
+    mosaic_versions.invalidate(gcs_path)
+    mosaic_cache.invalidate(gcs_path)
+    tile_cache.invalidate(gcs_path)
+
+
+def check_sensor(sensor: str) -> None:
+    """Reject sensors without a frontend mosaic."""
+    if sensor not in SUPPORTED_SENSORS:
+        supported_sensors = ", ".join(sorted(SUPPORTED_SENSORS))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported sensor '{sensor}'. Use one of: {supported_sensors}",
+        )
+
+
+def tile_cog_urls(
+    cog_base_url: str, tile_ids: str, glob_pattern: str, sensor: str
+) -> list[str]:
+    """Build COG URLs from comma-separated tile IDs, rejecting malformed IDs."""
+    tile_ids_list = [t.strip() for t in tile_ids.split(",") if t.strip()]
+    pattern = TILE_ID_PATTERNS[sensor]
+    invalid = [t for t in tile_ids_list if not pattern.fullmatch(t)]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {sensor} tile ID(s): {', '.join(invalid)}. "
+            f"Tile IDs must match {pattern.pattern}",
+        )
+    return [f"{cog_base_url}/{t}_{glob_pattern}.tif" for t in tile_ids_list]
+
+
+def default_mosaic_path(cog_base_url: str, sensor: str, glob_pattern: str) -> str:
+    """Return where the frontend expects a sensor's mosaic."""
+    return f"{cog_base_url}/mosaics/mosaic_{sensor}_{glob_pattern}.json.gz"
+
+
+async def read_footprints(cog_urls: list[str]) -> list[dict]:
+    """Read COG footprints, reporting unreadable COGs as a bad gateway."""
+    if not cog_urls:
+        raise HTTPException(status_code=404, detail="No COGs found for the mosaic")
+
+    try:
+        return await read_cog_footprints(cog_urls, fs=fs)
+    except FootprintError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
 @app.post("/mosaicjson/generate")
-def generate_mosaic(
+async def generate_mosaic(
     tile_ids: Optional[str] = None,
     save_to_gcs: bool = False,
     gcs_path: Optional[str] = None,
-    glob_pattern: str = "uint8",
+    glob_pattern: str = DEFAULT_GLOB_PATTERN,
     sensor: str = "landsat",
 ):
     """
@@ -104,31 +240,25 @@ def generate_mosaic(
     if not COG_BASE_URL:
         return {"error": "COG_STORAGE_URL not configured"}
 
-    if sensor not in SUPPORTED_SENSORS:
-        supported_sensors = ", ".join(sorted(SUPPORTED_SENSORS))
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported sensor '{sensor}'. Use one of: {supported_sensors}",
-        )
+    check_sensor(sensor)
 
     if not tile_ids:
-        files = fs.glob(f"{COG_BASE_URL}/{sensor}_*_{glob_pattern}.tif")
+        files = await fs._glob(f"{COG_BASE_URL}/{sensor}_*_{glob_pattern}.tif")
         cog_urls = [f"gs://{f}" for f in files]
     else:
-        tile_ids_list = [t.strip() for t in tile_ids.split(",")]
-        cog_urls = [f"{COG_BASE_URL}/{t}_{glob_pattern}.tif" for t in tile_ids_list]
+        cog_urls = tile_cog_urls(COG_BASE_URL, tile_ids, glob_pattern, sensor)
 
     logger.info(f"Generating mosaic for COGS: {cog_urls}")
-    mosaic_json = MosaicJSON.from_urls(cog_urls)
+    features = await read_footprints(cog_urls)
+    mosaic_json = await run_in_threadpool(mosaic_from_footprints, features)
 
     if save_to_gcs:
         if not gcs_path:
-            gcs_path = f"{COG_BASE_URL}/mosaics/mosaic_{sensor}_{glob_pattern}.json.gz"
-        json_str = mosaic_json.model_dump_json(indent=2)
-        compressed_data = gzip.compress(json_str.encode("utf-8"))
+            gcs_path = default_mosaic_path(COG_BASE_URL, sensor, glob_pattern)
         try:
-            with fs.open(gcs_path, "wb") as f:
-                f.write(compressed_data)
+            data = await run_in_threadpool(encode_mosaic, mosaic_json, gcs_path)
+            await fs._pipe_file(gcs_path, data)
+            await run_in_threadpool(invalidate_mosaic, gcs_path)
             return {
                 "status": "success",
                 "mosaic": mosaic_json.model_dump(),
@@ -140,8 +270,70 @@ def generate_mosaic(
     return mosaic_json.model_dump()
 
 
+@app.post("/mosaicjson/update")
+async def update_mosaic(
+    tile_ids: str,
+    gcs_path: Optional[str] = None,
+    glob_pattern: str = DEFAULT_GLOB_PATTERN,
+    sensor: str = "landsat",
+    if_generation_match: Optional[int] = None,
+):
+    """
+    Add or replace tiles in a stored mosaic without regenerating it.
+
+    Only the given tiles' footprint sidecars are read, or their COG headers for COGs
+    without a sidecar. The mosaic is written back only if it was not changed since
+    it was read, so concurrent updates fail with 409 instead of overwriting each
+    other; the client should retry. Passing ``if_generation_match`` from a previous
+    response also rejects updates to a mosaic that changed since then.
+    """
+    COG_BASE_URL = os.getenv("COG_STORAGE_URL", "").rstrip("/")
+    if not COG_BASE_URL:
+        return {"error": "COG_STORAGE_URL not configured"}
+
+    check_sensor(sensor)
+    cog_urls = tile_cog_urls(COG_BASE_URL, tile_ids, glob_pattern, sensor)
+    if not gcs_path:
+        gcs_path = default_mosaic_path(COG_BASE_URL, sensor, glob_pattern)
+
+    try:
+        mosaic_json, generation = await read_mosaic(fs, gcs_path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Mosaic {gcs_path} not found; use /mosaicjson/generate first",
+        )
+
+    if if_generation_match is not None and if_generation_match != generation:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Mosaic is at generation {generation}, not {if_generation_match}",
+        )
+
+    logger.info(f"Updating mosaic {gcs_path} with COGS: {cog_urls}")
+    features = await read_footprints(cog_urls)
+    mosaic_json = await run_in_threadpool(merge_features, mosaic_json, features)
+
+    try:
+        new_generation = await write_mosaic(fs, gcs_path, mosaic_json, generation)
+    except GenerationMismatch as e:
+        raise HTTPException(status_code=409, detail=f"{e}; retry the update")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save: {str(e)}")
+    await run_in_threadpool(invalidate_mosaic, gcs_path)
+
+    return {
+        "status": "success",
+        "saved_to": gcs_path,
+        "generation": new_generation,
+        "version": mosaic_json.version,
+        "updated": cog_urls,
+        "tiles_count": len(mosaic_json.tiles),
+    }
+
+
 @app.get("/mosaicjson/sensors")
-def list_mosaic_sensors(glob_pattern: str = "uint8"):
+def list_mosaic_sensors(glob_pattern: str = DEFAULT_GLOB_PATTERN):
     """List supported frontend mosaic sensor options."""
     COG_BASE_URL = os.getenv("COG_STORAGE_URL", "").rstrip("/")
     if not COG_BASE_URL:
@@ -164,29 +356,154 @@ def list_mosaic_sensors(glob_pattern: str = "uint8"):
 
 
 @app.get("/mosaicjson/validate")
-def validate_mosaic(gcs_path: str):
-    """Validate a mosaic JSON file."""
+async def validate_mosaic(gcs_path: str, check_assets: bool = True):
+    """
+    Validate a mosaic JSON file.
+
+    The file is streamed in ranged reads, decompressed and parsed incrementally,
+    and checked for quadkey zoom consistency, bounds coverage and, optionally,
+    missing COGs.
+    """
     try:
-        with fs.open(gcs_path, "rb") as f:
-            data = f.read()
-
-        # Try to decompress
-        if gcs_path.endswith(".gz"):
-            decompressed = gzip.decompress(data)
-            json_data = json.loads(decompressed)
-        else:
-            json_data = json.loads(data)
-
-        return {
-            "valid": True,
-            "file_size": len(data),
-            "tiles_count": len(json_data.get("tiles", {})),
-        }
+        return await validate_mosaic_file(fs, gcs_path, check_assets=check_assets)
     except Exception as e:
         return {"valid": False, "error": str(e)}
 
 
-mosaic = MosaicTilerFactory(backend=MosaicBackend, router_prefix="/mosaicjson")
+async def get_query_mosaic(
+    url: Optional[str], sensor: str, glob_pattern: str
+) -> MosaicJSON:
+    """Return a cached mosaic, by default the sensor's frontend mosaic."""
+    if not url:
+        COG_BASE_URL = os.getenv("COG_STORAGE_URL", "").rstrip("/")
+        if not COG_BASE_URL:
+            raise HTTPException(
+                status_code=500, detail="COG_STORAGE_URL not configured"
+            )
+        check_sensor(sensor)
+        url = default_mosaic_path(COG_BASE_URL, sensor, glob_pattern)
+
+    try:
+        return await run_in_threadpool(mosaic_cache.get, url)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Mosaic {url} not found")
+
+
+async def clear_sky_at_points(
+    points: list[tuple[float, float]],
+    url: Optional[str],
+    sensor: str,
+    glob_pattern: str,
+) -> list[dict]:
+    """Look up clear-sky values at (lon, lat) points in a mosaic."""
+    mosaic_json = await get_query_mosaic(url, sensor, glob_pattern)
+    try:
+        values = await query_points(mosaic_json, points)
+    except RasterioIOError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to read COG: {e}")
+
+    results = []
+    for (lon, lat), value in zip(points, values):
+        percentage, count, asset = value if value is not None else (None,) * 3
+        results.append(
+            {
+                "lon": lon,
+                "lat": lat,
+                "clear_sky_percentage": percentage,
+                "valid_observations": count,
+                "cog": asset,
+            }
+        )
+    return results
+
+
+@app.get("/clear-sky/point")
+async def clear_sky_point(
+    lon: Annotated[float, Query(ge=-180, le=180)],
+    lat: Annotated[float, Query(ge=-90, le=90)],
+    url: Optional[str] = None,
+    sensor: str = "landsat",
+    glob_pattern: str = DEFAULT_GLOB_PATTERN,
+):
+    """
+    Return the clear-sky percentage and valid-observation count at a point.
+
+    ``url`` selects the mosaic; by default the sensor's frontend mosaic is used.
+    Values are null where no COG has data.
+    """
+    (result,) = await clear_sky_at_points([(lon, lat)], url, sensor, glob_pattern)
+    return result
+
+
+@app.post("/clear-sky/point")
+async def clear_sky_points(
+    points: Annotated[
+        list[tuple[Longitude, Latitude]],
+        Body(embed=True, min_length=1, max_length=MAX_POINTS),
+    ],
+    url: Optional[str] = None,
+    sensor: str = "landsat",
+    glob_pattern: str = DEFAULT_GLOB_PATTERN,
+):
+    """
+    Return clear-sky values at a batch of ``[lon, lat]`` points.
+
+    Points are grouped by COG and by COG block, so each block holding a point is
+    read once however many points fall in it.
+    """
+    return {"points": await clear_sky_at_points(points, url, sensor, glob_pattern)}
+
+
+@app.post("/clear-sky/zonal-stats")
+async def clear_sky_zonal_stats(
+    geojson: Annotated[FeatureCollection | Feature, Body()],
+    url: Optional[str] = None,
+    sensor: str = "landsat",
+    glob_pattern: str = DEFAULT_GLOB_PATTERN,
+):
+    """
+    Return clear-sky statistics over GeoJSON polygons.
+
+    Takes a Polygon or MultiPolygon Feature, or a FeatureCollection of up to
+    ``ZONAL_STATS_MAX_FEATURES`` of them, in WGS84. Each feature gets a
+    ``statistics`` property with the mean, min, max and histogram of the clear-sky
+    percentage over the pixels with valid observations. Large polygons are read
+    from COG overviews, so each is read on a grid of at most
+    ``ZONAL_STATS_MAX_SIZE`` pixels across.
+    """
+    features = geojson.features if isinstance(geojson, FeatureCollection) else [geojson]
+    if len(features) > ZONAL_STATS_MAX_FEATURES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {ZONAL_STATS_MAX_FEATURES} features per request",
+        )
+    for feature in features:
+        if feature.geometry is None or feature.geometry.type not in POLYGON_TYPES:
+            raise HTTPException(
+                status_code=400, detail="Features must be Polygons or MultiPolygons"
+            )
+
+    mosaic_json = await get_query_mosaic(url, sensor, glob_pattern)
+    try:
+        stats = await asyncio.gather(
+            *(
+                run_in_threadpool(
+                    polygon_statistics,
+                    mosaic_json,
+                    feature.geometry.model_dump(exclude_none=True),
+                )
+                for feature in features
+            )
+        )
+    except RasterioIOError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to read COG: {e}")
+
+    for feature, feature_stats in zip(features, stats):
+        feature.properties = {**(feature.properties or {}), "statistics": feature_stats}
+    return geojson
+
+
+mosaic = MosaicTilerFactory(backend=CachedMosaicBackend, router_prefix="/mosaicjson")
 app.include_router(mosaic.router, prefix="/mosaicjson")
 
 
@@ -0,0 +1,217 @@
+"""Versioned MosaicJSON reads, writes, version lookups and incremental tile merges."""
+
+import asyncio
+import gzip
+import os
+import threading
+import time
+from typing import Callable
+from urllib.parse import quote
+
+import fsspec
+from cogeo_mosaic.mosaic import MosaicJSON
+from cogeo_mosaic.utils import bbox_union
+
+# How long a looked-up mosaic version is trusted before storage is asked again.
+# This bounds how long a worker keeps serving a mosaic another worker rewrote.
+MOSAIC_VERSION_TTL = float(os.getenv("MOSAIC_VERSION_TTL", "5"))  # seconds
+# Object metadata that changes whenever a mosaic is rewritten: the GCS generation,
+# or the modification time on local and other filesystems.
+VERSION_FIELDS = ("generation", "mtime", "created")
+
+
+class GenerationMismatch(RuntimeError):
+    """Raised when a mosaic changed since it was read."""
+
+
+def encode_mosaic(mosaic: MosaicJSON, path: str) -> bytes:
+    """Serialize a mosaic, gzipping it when the path ends in ``.gz``."""
+    data = mosaic.model_dump_json(indent=2).encode("utf-8")
+    return gzip.compress(data) if path.endswith(".gz") else data
+
+
+def decode_mosaic(data: bytes, path: str) -> MosaicJSON:
+    """Parse a mosaic, gunzipping it when the path ends in ``.gz``."""
+    if path.endswith(".gz"):
+        data = gzip.decompress(data)
+    return MosaicJSON.model_validate_json(data)
+
+
+async def read_mosaic(fs, path: str) -> tuple[MosaicJSON, int]:
+    """
+    Read a mosaic and the GCS generation it was read at from an async gcsfs.
+
+    The generation is looked up before the contents, so if the object is replaced
+    in between, a conditional write against that generation fails instead of
+    overwriting the newer mosaic.
+
+    Raises:
+        FileNotFoundError: If the mosaic does not exist.
+    """
+    fs.invalidate_cache(path)
+    generation = int((await fs._info(path))["generation"])
+    data = await fs._cat_file(path)
+    return await asyncio.to_thread(decode_mosaic, data, path), generation
+
+
+async def write_mosaic(
+    fs, path: str, mosaic: MosaicJSON, if_generation_match: int
+) -> int:
+    """
+    Write a mosaic only if the stored object is still at the given generation.
+
+    Args:
+        fs: An async gcsfs filesystem.
+        path: The mosaic's GCS path.
+        mosaic: The mosaic to store.
+        if_generation_match: The generation the mosaic was read at; 0 requires
+            that the object does not exist yet.
+
+    Returns:
+        The generation of the written object.
+
+    Raises:
+        GenerationMismatch: If the object was changed by another writer.
+    """
+    bucket, key, _ = fs.split_path(path)
+    content_type = "application/gzip" if path.endswith(".gz") else "application/json"
+    data = await asyncio.to_thread(encode_mosaic, mosaic, path)
+    try:
+        response = await fs._call(
+            "POST",
+            f"{fs._location}/upload/storage/v1/b/{quote(bucket)}/o",
+            uploadType="media",
+            name=key,
+            ifGenerationMatch=str(if_generation_match),
+            headers={"Content-Type": content_type},
+            data=data,
+            json_out=True,
+        )
+    except FileExistsError:
+        # gcsfs reports a failed precondition (HTTP 412) as FileExistsError.
+        raise GenerationMismatch(
+            f"{path} changed since generation {if_generation_match}"
+        ) from None
+    finally:
+        fs.invalidate_cache(path)
+    return int(response["generation"])
+
+
+def stored_version(url: str) -> str | None:
+    """
+    Return the version of a stored mosaic from its object metadata.
+
+    Returns:
+        The first of VERSION_FIELDS the filesystem reports, or None if the mosaic
+        does not exist or has none of them.
+    """
+    fs, path = fsspec.core.url_to_fs(url)
+    fs.invalidate_cache(path)
+    try:
+        info = fs.info(path)
+    except FileNotFoundError:
+        return None
+    for field in VERSION_FIELDS:
+        if info.get(field) is not None:
+            return str(info[field])
+    return None
+
+
+class MosaicVersions:
+    """
+    Stored mosaic versions, looked up from storage and reused for ``ttl`` seconds.
+
+    Versions come from the stored object, so a mosaic rewritten by any worker or
+    host gets a new version everywhere once the reused lookup expires. Caches key
+    their entries on it, which invalidates them across workers.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MOSAIC_VERSION_TTL,
+        timer: Callable[[], float] = time.monotonic,
+        lookup: Callable[[str], str | None] = stored_version,
+    ):
+        """Look versions up with ``lookup`` and reuse them for ``ttl`` seconds."""
+        self.ttl = ttl
+        self.timer = timer
+        self.lookup = lookup
+        self._versions: dict[str, tuple[str | None, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> str | None:
+        """Return the version of the mosaic at ``url``, or None if it is missing."""
+        now = self.timer()
+        with self._lock:
+            version, expires = self._versions.get(url, (None, now))
+        if expires > now:
+            return version
+
+        version = self.lookup(url)
+        with self._lock:
+            self._versions[url] = (version, now + self.ttl)
+        return version
+
+    def invalidate(self, url: str) -> None:
+        """Look the version up again on next use, e.g. after the mosaic was saved."""
+        with self._lock:
+            self._versions.pop(url, None)
+
+    def clear(self) -> None:
+        """Forget every version."""
+        with self._lock:
+            self._versions.clear()
+
+
+mosaic_versions = MosaicVersions()
+
+
+def _bump_version(version: str) -> str:
+    """Increment the patch number of a mosaic version, as cogeo-mosaic does."""
+    major, minor, patch = (int(part) for part in version.split("."))
+    return f"{major}.{minor}.{patch + 1}"
+
+
+def merge_features(mosaic: MosaicJSON, features: list[dict]) -> MosaicJSON:
+    """
+    Add or replace COG footprints in a mosaic without rebuilding it.
+
+    Assets in ``features`` are first removed from every quadkey, so a replaced
+    COG whose footprint shrank leaves no stale entries, and are then listed first
+    in the quadkeys they cover so the newest data wins.
+
+    Args:
+        mosaic: The existing mosaic.
+        features: Footprints from read_cog_footprints().
+
+    Returns:
+        A new mosaic with the merged tiles, union bounds and a bumped version.
+    """
+    update = MosaicJSON.from_features(
+        features,
+        minzoom=mosaic.minzoom,
+        maxzoom=mosaic.maxzoom,
+        quadkey_zoom=mosaic.quadkey_zoom,
+        quiet=True,
+    )
+    paths = {feature["properties"]["path"] for feature in features}
+    tiles = {
+        quadkey: [asset for asset in assets if asset not in paths]
+        for quadkey, assets in mosaic.tiles.items()
+    }
+    for quadkey, assets in update.tiles.items():
+        tiles[quadkey] = [*assets, *tiles.get(quadkey, [])]
+
+    bounds = bbox_union(update.bounds, mosaic.bounds)
+    return mosaic.model_copy(
+        update={
+            "tiles": {quadkey: assets for quadkey, assets in tiles.items() if assets},
+            "bounds": bounds,
+            "center": (
+                (bounds[0] + bounds[2]) / 2,
+                (bounds[1] + bounds[3]) / 2,
+                mosaic.minzoom,
+            ),
+            "version": _bump_version(mosaic.version),
+        }
+    )
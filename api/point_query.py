@@ -0,0 +1,154 @@
+"""Clear-sky values at points, read block by block from a mosaic's COGs."""
+
+import asyncio
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import morecantile
+import numpy
+import rasterio
+import rasterio.warp
+from cogeo_mosaic.mosaic import MosaicJSON
+from rio_tiler.constants import WGS84_CRS
+
+# COG reads are network-bound, as for footprint header reads.
+MAX_THREADS = int(os.getenv("POINT_QUERY_MAX_THREADS", "16"))
+MAX_POINTS = int(os.getenv("POINT_QUERY_MAX_POINTS", "5000"))
+# Band descriptions written by data_pipeline.clear_sky.store_clear_sky_percentage.
+PERCENTAGE_BAND = "clear_sky_percentage"
+COUNT_BAND = "valid_observations"
+
+WEB_MERCATOR = morecantile.tms.get("WebMercatorQuad")
+
+
+class PointValue(NamedTuple):
+    """The clear-sky percentage and valid-observation count at a point."""
+
+    clear_sky_percentage: int
+    valid_observations: int | None
+    asset: str
+
+
+def point_assets(mosaic: MosaicJSON, lon: float, lat: float) -> list[str]:
+    """Return the COGs of the quadkey holding a point, in mosaic order."""
+    zoom = mosaic.quadkey_zoom if mosaic.quadkey_zoom is not None else mosaic.minzoom
+    quadkey = WEB_MERCATOR.quadkey(WEB_MERCATOR.tile(lon, lat, zoom))
+    return mosaic.tiles.get(quadkey, [])
+
+
+def band_indexes(src: rasterio.io.DatasetReader) -> tuple[int, int | None]:
+    """Return the percentage and count band indexes, falling back to band 1."""
+    descriptions = list(src.descriptions)
+    percentage = (
+        descriptions.index(PERCENTAGE_BAND) + 1
+        if PERCENTAGE_BAND in descriptions
+        else 1
+    )
+    count = descriptions.index(COUNT_BAND) + 1 if COUNT_BAND in descriptions else None
+    return percentage, count
+
+
+def sample_cog(url: str, points: list[tuple[float, float]]) -> list[PointValue | None]:
+    """
+    Read the clear-sky values of one COG at lon/lat points.
+
+    Points are grouped by the COG's internal blocks and each block holding a point
+    is read once, so the cost follows the number of distinct blocks rather than the
+    number of points.
+
+    Args:
+        url: The COG URL.
+        points: The (lon, lat) points.
+
+    Returns:
+        One value per point, or None where the point is outside the COG or has no
+        valid observations.
+    """
+    results: list[PointValue | None] = [None] * len(points)
+    with rasterio.open(url) as src:
+        percentage_band, count_band = band_indexes(src)
+        bands = (
+            [percentage_band] if count_band is None else [percentage_band, count_band]
+        )
+        lons, lats = zip(*points)
+        xs, ys = rasterio.warp.transform(WGS84_CRS, src.crs, lons, lats)
+        cols, rows = ~src.transform * (numpy.asarray(xs), numpy.asarray(ys))
+        rows = numpy.floor(rows).astype(int)
+        cols = numpy.floor(cols).astype(int)
+
+        block_height, block_width = src.block_shapes[percentage_band - 1]
+        blocks = defaultdict(list)
+        for i, (row, col) in enumerate(zip(rows, cols)):
+            if 0 <= row < src.height and 0 <= col < src.width:
+                blocks[row // block_height, col // block_width].append(i)
+
+        for (block_row, block_col), indexes in blocks.items():
+            window = src.block_window(percentage_band, block_row, block_col)
+            data = src.read(bands, window=window)
+            for i in indexes:
+                pixel = data[:, rows[i] - window.row_off, cols[i] - window.col_off]
+                percentage = int(pixel[0])
+                count = None if count_band is None else int(pixel[1])
+                # The percentage band's nodata is 0, so only the count tells a
+                # fully cloudy pixel apart from one without observations.
+                has_data = count > 0 if count is not None else percentage != src.nodata
+                if has_data:
+                    results[i] = PointValue(percentage, count, url)
+    return results
+
+
+async def query_points(
+    mosaic: MosaicJSON,
+    points: list[tuple[float, float]],
+    max_threads: int = MAX_THREADS,
+) -> list[PointValue | None]:
+    """
+    Look up clear-sky values at points through a mosaic's quadkey index.
+
+    Points are grouped by COG, and each COG is read once with sample_cog() in a
+    worker thread. Points without data in their first COG fall through to the next
+    one of their quadkey, as the tiler's first-valid pixel selection does.
+
+    Args:
+        mosaic: The mosaic whose COGs are read.
+        points: The (lon, lat) points.
+        max_threads: The maximum number of COGs read concurrently.
+
+    Returns:
+        One value per point, or None where no COG has data.
+    """
+    loop = asyncio.get_running_loop()
+    results: list[PointValue | None] = [None] * len(points)
+    candidates = [point_assets(mosaic, lon, lat) for lon, lat in points]
+    pending = [i for i, assets in enumerate(candidates) if assets]
+
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        depth = 0
+        while pending:
+            by_asset = defaultdict(list)
+            for i in pending:
+                by_asset[candidates[i][depth]].append(i)
+
+            assets = list(by_asset)
+            samples = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        executor,
+                        sample_cog,
+                        asset,
+                        [points[i] for i in by_asset[asset]],
+                    )
+                    for asset in assets
+                )
+            )
+            for asset, values in zip(assets, samples):
+                for i, value in zip(by_asset[asset], values):
+                    results[i] = value
+
+            depth += 1
+            pending = [
+                i for i in pending if results[i] is None and depth < len(candidates[i])
+            ]
+    return results
@@ -0,0 +1,208 @@
+"""Sliding-window-counter rate limiting with pluggable storage backends."""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Protocol
+
+# Idle clients are evicted least recently used first once this many are tracked.
+MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+# The SQLite backend purges expired clients once every this many requests.
+SQLITE_PURGE_INTERVAL = 1000
+
+
+class WindowState(NamedTuple):
+    """Request counts of a client in the current and previous fixed windows."""
+
+    window: int
+    current: int
+    previous: int
+
+
+def advance(
+    state: WindowState | None, now: float, limit: int, window: float
+) -> tuple[WindowState, bool]:
+    """
+    Count one request against a sliding-window-counter limit.
+
+    The number of requests in the last ``window`` seconds is estimated from the
+    current fixed window's count plus the previous window's count weighted by how
+    much of it the sliding window still overlaps. Rejected requests are not
+    counted.
+
+    Args:
+        state: The client's stored state, or None for a new client.
+        now: The current time in seconds.
+        limit: The maximum number of requests per window.
+        window: The window length in seconds.
+
+    Returns:
+        The new state and whether the request is allowed.
+    """
+    index = math.floor(now / window)
+    if state is None or state.window < index - 1:
+        state = WindowState(index, 0, 0)
+    elif state.window == index - 1:
+        state = WindowState(index, 0, state.current)
+
+    overlap = 1 - (now / window - index)
+    if state.previous * overlap + state.current >= limit:
+        return state, False
+    return state._replace(current=state.current + 1), True
+
+
+class RateLimitBackend(Protocol):
+    """Storage of per-client window state."""
+
+    def hit(self, key: str, now: float, limit: int, window: float) -> bool:
+        """Atomically count a request for ``key`` and return whether it is allowed."""
+
+    def clear(self) -> None:
+        """Forget every client."""
+
+
+class MemoryBackend:
+    """
+    In-process backend with LRU eviction of idle clients.
+
+    Clients idle for two windows have a zero count and are dropped as they reach
+    the front of the LRU order; the least recently seen clients are evicted
+    beyond ``max_clients``. Limits are per process.
+    """
+
+    def __init__(self, max_clients: int = MAX_CLIENTS):
+        """Track at most ``max_clients`` clients."""
+        self.max_clients = max_clients
+        self._states: OrderedDict[str, WindowState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of tracked clients."""
+        return len(self._states)
+
+    def hit(self, key: str, now: float, limit: int, window: float) -> bool:
+        """Count a request for ``key`` and evict idle clients."""
+        with self._lock:
+            state, allowed = advance(self._states.get(key), now, limit, window)
+            self._states[key] = state
+            self._states.move_to_end(key)
+
+            index = math.floor(now / window)
+            while self._states:
+                oldest = next(iter(self._states.values()))
+                if len(self._states) <= self.max_clients and oldest.window >= index - 1:
+                    break
+                self._states.popitem(last=False)
+            return allowed
+
+    def clear(self) -> None:
+        """Forget every client."""
+        with self._lock:
+            self._states.clear()
+
+
+class SQLiteBackend:
+    """
+    SQLite backend shared by every worker process on a host.
+
+    Each request is counted in an immediate transaction, so concurrent uvicorn
+    workers see one consistent count per client. Expired clients are purged
+    periodically.
+    """
+
+    def __init__(self, path: str, purge_interval: int = SQLITE_PURGE_INTERVAL):
+        """Store state in the database at ``path``, opened lazily per thread."""
+        self.path = path
+        self.purge_interval = purge_interval
+        self._hits = 0
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the table on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, window INTEGER, current INTEGER, "
+                "previous INTEGER)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, now: float, limit: int, window: float) -> bool:
+        """
+        Count a request for ``key`` in an immediate transaction.
+
+        This blocks while another worker holds the database lock, so async callers
+        should run it in a thread.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window, current, previous FROM rate_limits WHERE key = ?",
+                (key,),
+            ).fetchone()
+            state, allowed = advance(
+                None if row is None else WindowState(*row), now, limit, window
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?)",
+                (key, *state),
+            )
+            self._hits += 1
+            if self._hits % self.purge_interval == 0:
+                conn.execute(
+                    "DELETE FROM rate_limits WHERE window < ?", (state.window - 1,)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def clear(self) -> None:
+        """Forget every client."""
+        self._connect().execute("DELETE FROM rate_limits")
+
+
+def backend_from_url(url: str) -> RateLimitBackend:
+    """
+    Create a backend from a URL: ``memory`` or ``sqlite:///path/to/file.db``.
+
+    Raises:
+        ValueError: If the URL scheme is unsupported.
+    """
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url.removeprefix("sqlite:///"))
+    raise ValueError(
+        f"Unsupported rate limit backend '{url}'; use memory or sqlite:///PATH"
+    )
+
+
+class RateLimiter:
+    """Limit each client to ``limit`` requests per ``window`` seconds."""
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        backend: RateLimitBackend,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Count requests in ``backend``, timed by ``clock``."""
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        self.clock = clock
+
+    def allow(self, key: str) -> bool:
+        """Count a request from ``key`` and return whether it is within the limit."""
+        return self.backend.hit(key, self.clock(), self.limit, self.window)
@@ -0,0 +1,264 @@
+"""Streaming MosaicJSON validation in bounded memory."""
+
+import asyncio
+import posixpath
+import zlib
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import ijson
+import morecantile
+
+# Bytes per ranged read, and the most decompressed bytes parsed at once.
+CHUNK_SIZE = 1 << 20
+# Offending quadkeys or COGs listed per failed check.
+MAX_EXAMPLES = 5
+REQUIRED_FIELDS = ("mosaicjson", "minzoom", "maxzoom", "bounds", "tiles")
+SCALAR_FIELDS = {"mosaicjson", "version", "minzoom", "maxzoom", "quadkey_zoom"}
+QUADKEY_DIGITS = set("0123")
+# Bounds are compared in degrees, as written by cogeo-mosaic.
+BOUNDS_TOLERANCE = 1e-6
+
+WEB_MERCATOR = morecantile.tms.get("WebMercatorQuad")
+
+
+class MosaicValidator:
+    """
+    Incremental structural checks of a (optionally gzipped) MosaicJSON document.
+
+    Bytes are decompressed and parsed as they are written, and only counts of
+    quadkeys per zoom, the union of the quadkeys' bounds and the unique COG URLs
+    are kept, so memory does not grow with the number of quadkeys or with how
+    often a COG is referenced.
+    """
+
+    def __init__(self, gzipped: bool = False, chunk_size: int = CHUNK_SIZE):
+        """Parse gzip members if ``gzipped``, at most ``chunk_size`` bytes at a time."""
+        self.chunk_size = chunk_size
+        self.decompressor = zlib.decompressobj(wbits=31) if gzipped else None
+        self.events = ijson.sendable_list()
+        self.parser = ijson.parse_coro(self.events, use_float=True)
+
+        self.keys: set[str] = set()
+        self.fields: dict = {}
+        self.bounds: list[float] = []
+        self.tiles_count = 0
+        self.assets: set[str] = set()
+        self.quadkey_zooms: Counter[int] = Counter()
+        self.quadkey_examples: dict[int, str] = {}
+        self.invalid_quadkeys: list[str] = []
+        self.invalid_quadkeys_count = 0
+        self.tiles_bounds: list[float] | None = None
+
+    def write(self, data: bytes) -> None:
+        """Decompress and check the next bytes of the document."""
+        if self.decompressor is None:
+            self._parse(data)
+            return
+
+        # Bound the decompressed size of each step, however well the data packs.
+        while data:
+            self._parse(self.decompressor.decompress(data, self.chunk_size))
+            data = self.decompressor.unconsumed_tail
+
+    def close(self) -> None:
+        """
+        Finish parsing.
+
+        Raises:
+            ValueError: If the document is truncated.
+        """
+        if self.decompressor is not None:
+            self._parse(self.decompressor.flush())
+            if not self.decompressor.eof:
+                raise ValueError("Truncated gzip stream")
+        try:
+            self.parser.close()
+        except ijson.IncompleteJSONError as e:
+            raise ValueError(f"Truncated JSON document: {e}") from None
+        self._check_events()
+
+    def _parse(self, data: bytes) -> None:
+        if data:
+            self.parser.send(data)
+            self._check_events()
+
+    def _check_events(self) -> None:
+        for prefix, event, value in self.events:
+            if prefix == "" and event == "map_key":
+                self.keys.add(value)
+            elif prefix in SCALAR_FIELDS:
+                self.fields[prefix] = value
+            elif prefix == "bounds.item":
+                self.bounds.append(value)
+            elif prefix == "tiles" and event == "map_key":
+                self._check_quadkey(value)
+            elif prefix.startswith("tiles.") and event == "string":
+                self.assets.add(value)
+        del self.events[:]
+
+    def _check_quadkey(self, quadkey: str) -> None:
+        self.tiles_count += 1
+        if not quadkey or not set(quadkey) <= QUADKEY_DIGITS:
+            self.invalid_quadkeys_count += 1
+            if len(self.invalid_quadkeys) < MAX_EXAMPLES:
+                self.invalid_quadkeys.append(quadkey)
+            return
+
+        self.quadkey_zooms[len(quadkey)] += 1
+        self.quadkey_examples.setdefault(len(quadkey), quadkey)
+        west, south, east, north = WEB_MERCATOR.bounds(
+            WEB_MERCATOR.quadkey_to_tile(quadkey)
+        )
+        if self.tiles_bounds is None:
+            self.tiles_bounds = [west, south, east, north]
+        else:
+            self.tiles_bounds = [
+                min(self.tiles_bounds[0], west),
+                min(self.tiles_bounds[1], south),
+                max(self.tiles_bounds[2], east),
+                max(self.tiles_bounds[3], north),
+            ]
+
+    @property
+    def quadkey_zoom(self) -> int | None:
+        """The declared quadkey zoom, which defaults to minzoom."""
+        zoom = self.fields.get("quadkey_zoom")
+        return self.fields.get("minzoom") if zoom is None else zoom
+
+    def errors(self, missing_assets: list[str] | None = None) -> list[str]:
+        """Describe every failed check."""
+        errors = []
+        missing_fields = [name for name in REQUIRED_FIELDS if name not in self.keys]
+        if missing_fields:
+            errors.append(f"Missing required fields: {', '.join(missing_fields)}")
+
+        if self.invalid_quadkeys_count:
+            errors.append(
+                f"{self.invalid_quadkeys_count} invalid quadkey(s), "
+                f"e.g. {self.invalid_quadkeys}"
+            )
+
+        zoom = self.quadkey_zoom
+        wrong_zooms = {z: n for z, n in self.quadkey_zooms.items() if z != zoom}
+        if zoom is not None and wrong_zooms:
+            examples = [self.quadkey_examples[z] for z in sorted(wrong_zooms)]
+            errors.append(
+                f"{sum(wrong_zooms.values())} quadkey(s) not at quadkey zoom {zoom}, "
+                f"e.g. {examples[:MAX_EXAMPLES]}"
+            )
+
+        if len(self.bounds) != 4:
+            if "bounds" in self.keys:
+                errors.append(f"bounds must have 4 values, not {len(self.bounds)}")
+        elif self.tiles_bounds is not None and not _covers(
+            self.tiles_bounds, self.bounds
+        ):
+            errors.append(
+                f"Tiles cover {self.tiles_bounds}, not the mosaic bounds {self.bounds}"
+            )
+
+        if missing_assets:
+            errors.append(
+                f"{len(missing_assets)} referenced COG(s) not found, "
+                f"e.g. {missing_assets[:MAX_EXAMPLES]}"
+            )
+        return errors
+
+
+def _covers(tiles_bounds: list[float], bounds: list[float]) -> bool:
+    """Return whether the tiles' bounds contain ``bounds``, within the tolerance."""
+    west, south, east, north = tiles_bounds
+    return (
+        bounds[0] >= west - BOUNDS_TOLERANCE
+        and bounds[1] >= south - BOUNDS_TOLERANCE
+        and bounds[2] <= east + BOUNDS_TOLERANCE
+        and bounds[3] <= north + BOUNDS_TOLERANCE
+    )
+
+
+def _object_name(url: str) -> str:
+    """Return a URL's bucket and key, as listed by fsspec filesystems."""
+    return url.split("://", 1)[-1].strip("/")
+
+
+async def find_missing_assets(fs, mosaic_path: str, assets: set[str]) -> list[str]:
+    """
+    Return the COGs of a mosaic that do not exist.
+
+    Each directory holding COGs is listed once instead of checking every COG.
+    Only COGs on the same storage as the mosaic are checked.
+    """
+    scheme = urlsplit(mosaic_path).scheme
+    assets_by_directory = defaultdict(list)
+    for asset in assets:
+        if urlsplit(asset).scheme == scheme:
+            assets_by_directory[posixpath.dirname(asset)].append(asset)
+
+    async def list_names(directory: str) -> set[str]:
+        try:
+            names = await fs._ls(directory, detail=False)
+        except FileNotFoundError:
+            return set()
+        return {_object_name(name) for name in names}
+
+    directories = list(assets_by_directory)
+    listings = await asyncio.gather(*(list_names(d) for d in directories))
+    return sorted(
+        asset
+        for directory, names in zip(directories, listings)
+        for asset in assets_by_directory[directory]
+        if _object_name(asset) not in names
+    )
+
+
+async def validate_mosaic_file(
+    fs, path: str, check_assets: bool = True, chunk_size: int = CHUNK_SIZE
+) -> dict:
+    """
+    Validate a stored mosaic, reading it in ranges of ``chunk_size`` bytes.
+
+    Args:
+        fs: An async filesystem, e.g. gcsfs with ``asynchronous=True``.
+        path: The mosaic path; ``.gz`` paths are gunzipped.
+        check_assets: Whether to check that every referenced COG exists.
+        chunk_size: Bytes per ranged read.
+
+    Returns:
+        The validation report; ``valid`` is False if any check failed.
+
+    Raises:
+        FileNotFoundError: If the mosaic does not exist.
+        ValueError: If the mosaic is not valid gzip or JSON.
+    """
+    size = (await fs._info(path))["size"]
+    validator = MosaicValidator(gzipped=path.endswith(".gz"), chunk_size=chunk_size)
+    try:
+        for start in range(0, size, chunk_size):
+            end = min(start + chunk_size, size)
+            data = await fs._cat_file(path, start=start, end=end)
+            # Decompressing and parsing are CPU-bound; keep the event loop free.
+            await asyncio.to_thread(validator.write, data)
+        await asyncio.to_thread(validator.close)
+    except (zlib.error, ijson.JSONError) as e:
+        raise ValueError(f"Invalid mosaic document: {e}") from None
+
+    missing_assets = None
+    if check_assets:
+        missing_assets = await find_missing_assets(fs, path, validator.assets)
+
+    errors = validator.errors(missing_assets)
+    return {
+        "valid": not errors,
+        "file_size": size,
+        "tiles_count": validator.tiles_count,
+        "assets_count": len(validator.assets),
+        "minzoom": validator.fields.get("minzoom"),
+        "maxzoom": validator.fields.get("maxzoom"),
+        "quadkey_zoom": validator.quadkey_zoom,
+        "quadkey_zooms": dict(sorted(validator.quadkey_zooms.items())),
+        "bounds": validator.bounds,
+        "tiles_bounds": validator.tiles_bounds,
+        "missing_assets": (missing_assets or [])[:MAX_EXAMPLES],
+        "errors": errors,
+    }
@@ -0,0 +1,242 @@
+"""Clear-sky statistics over polygons, read from a mosaic's COGs."""
+
+import math
+import os
+from typing import Any
+
+import numpy
+import rasterio
+import rasterio.features
+from affine import Affine
+from cogeo_mosaic.mosaic import MosaicJSON
+from rasterio.enums import Resampling
+from rasterio.errors import WindowError
+from rasterio.transform import from_origin
+from rasterio.warp import reproject, transform_bounds, transform_geom
+from rasterio.windows import Window, from_bounds
+from rio_tiler.constants import WGS84_CRS
+
+from api.point_query import WEB_MERCATOR, band_indexes
+
+# The longest side of a polygon's grid, in pixels. Larger polygons are read from
+# the COG overview closest to the resolution this allows.
+MAX_SIZE = int(os.getenv("ZONAL_STATS_MAX_SIZE", "1024"))
+MAX_FEATURES = int(os.getenv("ZONAL_STATS_MAX_FEATURES", "500"))
+HISTOGRAM_BINS = 10
+
+
+def polygon_assets(mosaic: MosaicJSON, geometry: dict) -> list[str]:
+    """Return the COGs of the quadkeys intersecting a polygon's bounds, in order."""
+    zoom = mosaic.quadkey_zoom if mosaic.quadkey_zoom is not None else mosaic.minzoom
+    west, south, east, north = rasterio.features.bounds(geometry)
+    assets: dict[str, None] = {}
+    for tile in WEB_MERCATOR.tiles(west, south, east, north, [zoom]):
+        for asset in mosaic.tiles.get(WEB_MERCATOR.quadkey(tile), []):
+            assets.setdefault(asset, None)
+    return list(assets)
+
+
+def overview_level(src: rasterio.io.DatasetReader, resolution: float) -> int | None:
+    """
+    Return the coarsest overview level at least as fine as ``resolution``.
+
+    Returns None when the full-resolution image is needed.
+    """
+    level = None
+    for i, factor in enumerate(src.overviews(1)):
+        if src.res[0] * factor <= resolution:
+            level = i
+    return level
+
+
+class PolygonGrid:
+    """
+    A grid covering a polygon, in the CRS of the first COG that holds it.
+
+    Its resolution is the COG's native resolution, coarsened so the longest side
+    has at most ``max_size`` pixels.
+    """
+
+    def __init__(self, geometry: dict, src: rasterio.io.DatasetReader, max_size: int):
+        """Lay the grid over a WGS84 geometry, on the CRS and resolution of ``src``."""
+        self.crs = src.crs
+        self.geometry = transform_geom(WGS84_CRS, self.crs, geometry)
+        self.bounds = rasterio.features.bounds(self.geometry)
+        west, south, east, north = self.bounds
+        self.resolution = max(src.res[0], max(east - west, north - south) / max_size)
+        self.width = max(1, math.ceil((east - west) / self.resolution))
+        self.height = max(1, math.ceil((north - south) / self.resolution))
+        self.transform = from_origin(west, north, self.resolution, self.resolution)
+
+    def inside(self) -> numpy.ndarray:
+        """Return the mask of pixels whose centers are inside the polygon."""
+        shape = (self.height, self.width)
+        inside = rasterio.features.geometry_mask(
+            [self.geometry], shape, self.transform, invert=True
+        )
+        if not inside.any():
+            # Polygons smaller than a pixel still get the pixels they touch.
+            inside = rasterio.features.geometry_mask(
+                [self.geometry], shape, self.transform, invert=True, all_touched=True
+            )
+        return inside
+
+    def read(
+        self, src: rasterio.io.DatasetReader
+    ) -> tuple[numpy.ndarray, numpy.ndarray | None, numpy.ndarray]:
+        """
+        Read an open COG onto the grid.
+
+        The COG window under the grid is read at the resolution of the overview
+        closest to the grid's, so GDAL serves it from that overview, and is then
+        reprojected onto the grid.
+
+        Returns:
+            The percentage, the valid-observation count (None if the COG does not
+            store it) and the mask of pixels with valid observations.
+        """
+        percentage_band, count_band = band_indexes(src)
+        bands = (
+            [percentage_band] if count_band is None else [percentage_band, count_band]
+        )
+        nodata = src.nodata if src.nodata is not None else 0
+        data = numpy.full(
+            (len(bands), self.height, self.width), nodata, dtype=src.dtypes[0]
+        )
+
+        self._reproject(src, bands, nodata, data)
+
+        if count_band is None:
+            return data[0], None, data[0] != nodata
+        return data[0], data[1], data[1] > 0
+
+    def _reproject(
+        self,
+        src: rasterio.io.DatasetReader,
+        bands: list[int],
+        nodata: float,
+        data: numpy.ndarray,
+    ) -> None:
+        """Reproject the COG window under the grid into ``data``, if they overlap."""
+        bounds = transform_bounds(self.crs, src.crs, *self.bounds, densify_pts=21)
+        window = (
+            from_bounds(*bounds, transform=src.transform)
+            .round_offsets(op="floor")
+            .round_lengths(op="ceil")
+        )
+        try:
+            window = window.intersection(Window(0, 0, src.width, src.height))
+        except WindowError:
+            return
+
+        level = overview_level(src, self.resolution)
+        factor = 1 if level is None else src.overviews(1)[level]
+        out_shape = (
+            len(bands),
+            max(1, math.ceil(window.height / factor)),
+            max(1, math.ceil(window.width / factor)),
+        )
+        source = src.read(bands, window=window, out_shape=out_shape)
+        source_transform = src.window_transform(window) * Affine.scale(
+            window.width / out_shape[2], window.height / out_shape[1]
+        )
+        reproject(
+            source,
+            data,
+            src_transform=source_transform,
+            src_crs=src.crs,
+            src_nodata=nodata,
+            dst_transform=self.transform,
+            dst_crs=self.crs,
+            dst_nodata=nodata,
+            resampling=Resampling.nearest,
+        )
+
+
+def polygon_statistics(
+    mosaic: MosaicJSON, geometry: dict, max_size: int = MAX_SIZE
+) -> dict[str, Any]:
+    """
+    Compute clear-sky statistics over a polygon.
+
+    The polygon's COGs are each opened once and warped onto one grid (see
+    PolygonGrid), reading only the blocks and the overview the grid needs. Pixels
+    take the first COG with valid observations, as the tiler's first-valid pixel
+    selection does, and COGs are no longer read once every pixel in the polygon has
+    a value.
+
+    Args:
+        mosaic: The mosaic whose COGs are read.
+        geometry: A GeoJSON Polygon or MultiPolygon in WGS84.
+        max_size: The longest side of the polygon's grid, in pixels.
+
+    Returns:
+        The pixel counts, coverage, mean, min, max and histogram of the clear-sky
+        percentage, and the mean valid-observation count when the COGs store it.
+        Statistics are None when no pixel has observations.
+    """
+    stats: dict[str, Any] = {
+        "pixels": 0,
+        "valid_pixels": 0,
+        "coverage": 0.0,
+        "resolution": None,
+        "mean": None,
+        "min": None,
+        "max": None,
+        "histogram": None,
+        "valid_observations_mean": None,
+        "assets": [],
+    }
+    urls = polygon_assets(mosaic, geometry)
+    if not urls:
+        return stats
+
+    used_assets: list[str] = []
+    grid = None
+    for url in urls:
+        with rasterio.open(url) as src:
+            if grid is None:
+                grid = PolygonGrid(geometry, src, max_size)
+                inside = grid.inside()
+                percentage = numpy.zeros(inside.shape, dtype="uint16")
+                count = numpy.zeros(inside.shape, dtype="uint16")
+                valid = numpy.zeros(inside.shape, dtype=bool)
+                has_counts = True
+            asset_percentage, asset_count, asset_valid = grid.read(src)
+        new = asset_valid & inside & ~valid
+        if new.any():
+            used_assets.append(url)
+            percentage[new] = asset_percentage[new]
+            if asset_count is None:
+                has_counts = False
+            else:
+                count[new] = asset_count[new]
+            valid |= new
+        if not (inside & ~valid).any():
+            break
+
+    assert grid is not None  # urls is not empty, so the first COG built the grid
+    values = percentage[valid]
+    pixels = int(inside.sum())
+    stats.update(
+        {
+            "pixels": pixels,
+            "valid_pixels": int(values.size),
+            "coverage": values.size / pixels,
+            "resolution": grid.resolution,
+            "assets": used_assets,
+        }
+    )
+    if values.size:
+        counts, edges = numpy.histogram(values, bins=HISTOGRAM_BINS, range=(0, 100))
+        stats.update(
+            {
+                "mean": float(values.mean()),
+                "min": int(values.min()),
+                "max": int(values.max()),
+                "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+            }
+        )
+        if has_counts:
+            stats["valid_observations_mean"] = float(count[valid].mean())
+    return stats
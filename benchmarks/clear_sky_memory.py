@@ -0,0 +1,127 @@
+"""
+Compare peak memory of the legacy and compact clear-sky reductions.
+
+A synthetic one-year Landsat QA_PIXEL cube is generated in a fresh process for each
+implementation, and the peak resident set size added on top of the cube itself is
+reported. Run it from the repository root:
+
+    python -m benchmarks.clear_sky_memory --scenes 46 --size 2048
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from data_pipeline.clear_sky import (
+    LANDSAT_CLEAR_SKY_QA_FLAGS,
+    compute_clear_sky_percentage,
+)
+
+# Typical QA_PIXEL values: clear, water, cloud, cloud shadow, fill.
+SYNTHETIC_QA_VALUES = np.array([21824, 21888, 22280, 23888, 1], dtype=np.uint16)
+SYNTHETIC_QA_WEIGHTS = [0.45, 0.05, 0.35, 0.1, 0.05]
+# Each value repeated in proportion to its weight, so a uniform uint8 draw indexes
+# a value with the right probability.
+SYNTHETIC_QA_TABLE = np.repeat(
+    SYNTHETIC_QA_VALUES, np.round(np.array(SYNTHETIC_QA_WEIGHTS) * 100).astype(int)
+)
+
+
+def make_synthetic_tile(scenes: int, size: int, seed: int = 0) -> xr.DataArray:
+    """
+    Build a random (time, y, x) uint16 QA_PIXEL cube for one year.
+
+    Scenes are drawn one at a time as uint8 table indexes, so generating the cube
+    needs little memory beyond the cube itself and does not raise the peak RSS
+    the benchmark measures against.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.empty((scenes, size, size), dtype=np.uint16)
+    for i in range(scenes):
+        indexes = rng.integers(
+            0, len(SYNTHETIC_QA_TABLE), size=(size, size), dtype=np.uint8
+        )
+        np.take(SYNTHETIC_QA_TABLE, indexes, out=data[i])
+    return xr.DataArray(
+        data,
+        dims=("time", "y", "x"),
+        coords={
+            "time": pd.date_range("2020-01-01", periods=scenes, freq="8D"),
+            "y": np.arange(size),
+            "x": np.arange(size),
+        },
+        attrs={"sensor": "landsat"},
+    )
+
+
+def legacy_clear_sky_percentage(da_ls: xr.DataArray) -> xr.DataArray:
+    """Reproduce the original isin/int64/float64 reduction and uint8 quantization."""
+    clear_sky = da_ls.isin(LANDSAT_CLEAR_SKY_QA_FLAGS)
+    fraction = clear_sky.astype(int).sum(dim="time") / len(da_ls.time)
+    return (fraction.where(fraction > 0) * 100).fillna(0).astype("uint8")
+
+
+def compact_clear_sky_percentage(da_ls: xr.DataArray) -> xr.DataArray:
+    """Run the current bool/uint16/uint8 reduction."""
+    return compute_clear_sky_percentage(da_ls)
+
+
+IMPLEMENTATIONS = {
+    "legacy": legacy_clear_sky_percentage,
+    "compact": compact_clear_sky_percentage,
+}
+
+
+def _peak_rss_mb() -> float:
+    """Return this process's peak resident set size in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _measure(name: str, scenes: int, size: int, queue) -> None:
+    """Generate the tile, run one implementation and report memory to the parent."""
+    da_ls = make_synthetic_tile(scenes, size)
+    baseline = _peak_rss_mb()
+    IMPLEMENTATIONS[name](da_ls).values
+    queue.put((name, baseline, _peak_rss_mb()))
+
+
+def main(argv=None) -> int:
+    """Run the benchmark and print a summary table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenes", type=int, default=46, help="Scenes per year.")
+    parser.add_argument("--size", type=int, default=2048, help="Tile width in pixels.")
+    args = parser.parse_args(argv)
+
+    cube_mb = args.scenes * args.size * args.size * 2 / 2**20
+    shape = f"{args.scenes} x {args.size} x {args.size}"
+    print(f"Synthetic tile: {shape} ({cube_mb:.0f} MiB)")
+    print(f"{'implementation':<16}{'peak RSS (MiB)':>16}{'above cube (MiB)':>18}")
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in IMPLEMENTATIONS:
+        queue = context.Queue()
+        process = context.Process(
+            target=_measure, args=(name, args.scenes, args.size, queue)
+        )
+        process.start()
+        _, baseline, peak = queue.get()
+        process.join()
+        results[name] = peak - baseline
+        print(f"{name:<16}{peak:>16.0f}{peak - baseline:>18.0f}")
+
+    if results["compact"] > 0:
+        ratio = results["legacy"] / results["compact"]
+        print(f"Reduction overhead: {ratio:.1f}x lower")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,16 +1,28 @@
 """Fetch satellite data and compute clear-sky percentages."""
 
+import calendar
+import datetime
+import functools
+import json
 import logging
-from typing import Any, List, Literal
+import os
+from typing import Any, Iterable, List, Literal, Mapping
 
+import dask.array
 import geopandas
+import numpy
 import odc.stac
 import planetary_computer
+import pystac
 import pystac_client
+import rasterio.enums
+import rasterio.errors
+import rasterio.features
 import rioxarray  # noqa: F401
 import shapely
 import xarray
 
+from data_pipeline import cog, stac_cache, water_mask
 from data_pipeline.shapefiles import get_mgrs_tile, get_wrs2_tile
 
 LANDSAT_CLEAR_SKY_QA_FLAGS = [
@@ -28,8 +40,48 @@ SENTINEL2_CLEAR_SKY_SCL_CLASSES = [
     11,  # snow/ice
 ]
 CLEAR_SKY_QA_FLAGS = LANDSAT_CLEAR_SKY_QA_FLAGS
+
+# Landsat Collection 2 QA_PIXEL single-bit flags.
+LANDSAT_QA_FILL_BIT = 0
+LANDSAT_QA_CLOUD_BIT = 3
+LANDSAT_QA_CLOUD_SHADOW_BIT = 4
+LANDSAT_QA_SNOW_BIT = 5
+LANDSAT_QA_CLEAR_BIT = 6
+LANDSAT_QA_WATER_BIT = 7
+# Landsat Collection 2 QA_PIXEL two-bit confidence fields (lowest bit offset).
+# Confidence values are 0 = none, 1 = low, 2 = medium, 3 = high.
+LANDSAT_QA_CLOUD_CONFIDENCE_BIT = 8
+LANDSAT_QA_CLOUD_SHADOW_CONFIDENCE_BIT = 10
+QA_LOOKUP_TABLE_SIZE = 2**16
+
+# Item pruning defaults. Scenes at or above FULLY_CLOUDY_COVER percent scene-level
+# cloud cover are counted as cloudy observations without reading their pixels, and
+# scenes covering less than MIN_AOI_OVERLAP of the AOI are not loaded at all.
+FULLY_CLOUDY_COVER = 99.0
+MIN_AOI_OVERLAP = 0.05
+# JRC Global Surface Water occurrence (percent) at or above which a pixel is water.
+WATER_OCCURRENCE_THRESHOLD = 90
+
+# DataArray attributes carried from the satellite cube to clear-sky outputs.
+OUTPUT_ATTRS = ("sensor", "aoi_wkt", "aoi_crs")
+# Clear-sky counters are stored next to each output COG, with this suffix replacing
+# the output extension, for incremental updates.
+COUNTS_SUFFIX = "_counts.tif"
+COUNT_MAX = numpy.iinfo(numpy.uint16).max
+# Counters are read back whole and never served as tiles, so they skip overviews.
+COUNTS_COG_PROFILE = {"profile": "deflate", "overviews": "NONE", "min_zoom": None}
+# Meteorological seasons used by group="season".
+SEASON_MONTHS = {
+    "DJF": (12, 1, 2),
+    "MAM": (3, 4, 5),
+    "JJA": (6, 7, 8),
+    "SON": (9, 10, 11),
+}
+
 PLANETARY_COMPUTER_CATALOG_URL = "https://planetarycomputer.microsoft.com/api/stac/v1"
 Sensor = Literal["landsat", "sentinel2"]
+# Period grouping: calendar months, seasons, or custom bins of months by label.
+PeriodGroup = Literal["month", "season"] | Mapping[str, Iterable[int]]
 
 SENSOR_CONFIGS: dict[Sensor, dict[str, Any]] = {
     "landsat": {
@@ -61,6 +113,12 @@ def get_satellite_data(
     bands: List[str] | None = None,
     chunks: dict = {"x": 512, "y": 512},
     mask_water: bool = True,
+    prune_items: bool = False,
+    max_cloud_cover: float = FULLY_CLOUDY_COVER,
+    min_aoi_overlap: float = MIN_AOI_OVERLAP,
+    items: Iterable[Any] | None = None,
+    like: "xarray.DataArray | None" = None,
+    clip_buffer: int | None = None,
 ) -> "xarray.DataArray":
     """
     Fetch satellite data from the Microsoft Planetary Computer.
@@ -77,37 +135,196 @@ def get_satellite_data(
         bands: A list of band names to fetch.
         chunks: A dictionary specifying the chunk sizes for the xarray Dataset.
         mask_water: A boolean indicating whether to mask out water pixels based on the JRC Global Surface Water dataset.
+        prune_items: Whether to prune STAC items before loading pixels. See
+            prune_stac_items(). Footprints and acquisition times of fully cloudy
+            scenes are stored in the ``"cloudy_footprints_wkt"`` and
+            ``"cloudy_datetimes"`` attributes so compute_clear_sky_counts() can
+            count them as cloudy observations.
+        max_cloud_cover: Scene cloud cover (percent) at or above which a scene is
+            treated as fully cloudy when pruning.
+        min_aoi_overlap: Minimum fraction of the AOI a scene must cover to be kept
+            when pruning.
+        items: STAC items to load instead of searching the catalog, e.g. the
+            unseen items of an incremental update.
+        like: A raster whose grid the data is loaded onto instead of the grid
+            derived from the AOI, e.g. stored clear-sky counters.
+        clip_buffer: When set, restrict the cube to the AOI buffered by this many
+            metres (the clip geometry of store_clear_sky_percentage()) before any
+            pixel is read. See restrict_to_footprint().
 
     Returns:
-        An xarray DataArray containing the requested classification band.
+        An xarray DataArray containing the requested classification band. The IDs
+        of the searched (or given) items are stored in the ``"stac_item_ids"``
+        attribute.
 
     Raises:
         ValueError: If the sensor is unsupported, or if Landsat is requested without
             a path and row.
     """
-    if sensor not in SENSOR_CONFIGS:
-        supported_sensors = ", ".join(SENSOR_CONFIGS)
-        raise ValueError(
-            f"Unsupported sensor '{sensor}'. Use one of: {supported_sensors}"
-        )
-
-    if sensor == "landsat" and (path is None or row is None):
-        raise ValueError("path and row are required when sensor='landsat'")
+    _check_tile_args(sensor, path, row)
 
     config = SENSOR_CONFIGS[sensor]
     bands = bands or config["default_bands"]
     data_band = config["data_band"]
+
+    if items is None:
+        items = search_satellite_items(
+            shp=shp,
+            path=path,
+            row=row,
+            tile_id=tile_id,
+            sensor=sensor,
+            time_range=time_range,
+        )
+    items = list(items)
+    item_ids = [item.id for item in items]
+
+    cloudy_items: list[pystac.Item] = []
+    if prune_items:
+        items, cloudy_items = prune_stac_items(
+            items,
+            aoi=shp.to_crs("EPSG:4326").union_all(),
+            sensor=sensor,
+            max_cloud_cover=max_cloud_cover,
+            min_aoi_overlap=min_aoi_overlap,
+        )
+
+    grid = {"intersects": shp.union_all()} if like is None else {"like": like}
+    da_sat = odc.stac.stac_load(
+        items,
+        bands=bands,
+        chunks=chunks,
+        nodata=config["nodata"],
+        **grid,
+    )[data_band]
+
+    if clip_buffer is not None:
+        da_sat = restrict_to_footprint(
+            da_sat,
+            _make_clip_geometry(shp, da_sat.rio.crs, clip_buffer),
+            config["nodata"],
+            crop=like is None,
+        )
+
+    if mask_water:
+        # Fill water with nodata rather than NaN so the cube stays integer.
+        da_water = get_water_mask(shp, da_sat, chunks=chunks)
+        da_sat = da_sat.where(~da_water, config["nodata"])
+
+    da_sat.attrs["sensor"] = sensor
+    da_sat.attrs["clear_sky_flags"] = config["clear_sky_flags"]
+    da_sat.attrs["nodata"] = config["nodata"]
+    da_sat.attrs["aoi_wkt"] = shp.union_all().wkt
+    da_sat.attrs["aoi_crs"] = str(shp.crs)
+    da_sat.attrs["stac_item_ids"] = item_ids
+    if cloudy_items:
+        da_sat.attrs["cloudy_footprints_wkt"] = [
+            shapely.geometry.shape(item.geometry).wkt for item in cloudy_items
+        ]
+        da_sat.attrs["cloudy_datetimes"] = [
+            item.datetime.isoformat() for item in cloudy_items
+        ]
+
+    return da_sat
+
+
+def restrict_to_footprint(
+    da_sat: "xarray.DataArray",
+    footprint: Any,
+    nodata: int,
+    crop: bool = True,
+) -> "xarray.DataArray":
+    """
+    Restrict a lazily loaded cube to a footprint polygon before pixels are read.
+
+    The cube is cropped to the footprint bounds, and observations outside the
+    footprint are set to ``nodata`` so they count toward neither total. Dask blocks
+    entirely outside the footprint are replaced by constant blocks, so their reads
+    are dropped from the task graph; partially covered blocks are masked. Bytes
+    read and reduced then scale with the footprint area rather than with its
+    bounding box, which matters for rotated WRS-2 footprints.
+
+    Args:
+        da_sat: A (time, y, x) satellite cube, typically backed by Dask.
+        footprint: A shapely polygon in the cube CRS.
+        nodata: The value assigned outside the footprint.
+        crop: Whether to crop the grid to the footprint bounds. Disable it when
+            the grid must not change, e.g. to match stored counters.
+
+    Returns:
+        The restricted cube, with the attributes of ``da_sat``.
+    """
+    if crop:
+        da_sat = da_sat.rio.clip_box(*footprint.bounds, crs=da_sat.rio.crs)
+
+    # Same pixel-center rule as the final rio.clip() of the stored COG.
+    inside = rasterio.features.geometry_mask(
+        [footprint],
+        out_shape=(da_sat.sizes["y"], da_sat.sizes["x"]),
+        transform=da_sat.rio.transform(),
+        invert=True,
+    )
+    if da_sat.chunks is None:
+        return da_sat.copy(data=numpy.where(inside, da_sat.values, nodata))
+
+    data = da_sat.data
+    y_edges = numpy.cumsum((0,) + data.chunks[-2])
+    x_edges = numpy.cumsum((0,) + data.chunks[-1])
+    rows = []
+    n_skipped = 0
+    for y0, y1 in zip(y_edges[:-1], y_edges[1:]):
+        row = []
+        for x0, x1 in zip(x_edges[:-1], x_edges[1:]):
+            block = data[..., y0:y1, x0:x1]
+            block_inside = inside[y0:y1, x0:x1]
+            if not block_inside.any():
+                block = dask.array.full(
+                    block.shape, nodata, dtype=data.dtype, chunks=block.chunks
+                )
+                n_skipped += 1
+            elif not block_inside.all():
+                block = dask.array.where(block_inside, block, nodata).astype(data.dtype)
+            row.append(block)
+        rows.append(row)
+
+    n_blocks = (len(y_edges) - 1) * (len(x_edges) - 1)
+    logging.info(f"Skipping {n_skipped} of {n_blocks} chunks outside the footprint")
+    return da_sat.copy(data=dask.array.block([rows]))
+
+
+def search_satellite_items(
+    shp: "geopandas.GeoDataFrame",
+    path: int | None = None,
+    row: int | None = None,
+    tile_id: str | None = None,
+    sensor: Sensor = "landsat",
+    time_range: str = "2020-01-01/2020-12-31",
+    refresh: bool = False,
+) -> "pystac.ItemCollection":
+    """
+    Search the STAC items of one tile and time range.
+
+    Args:
+        shp: A GeoDataFrame containing the geometry of the area of interest.
+        path: The WRS-2 path number. Required for Landsat.
+        row: The WRS-2 row number. Required for Landsat.
+        tile_id: The Sentinel-2 MGRS tile ID. Optional for Sentinel-2.
+        sensor: The satellite sensor. Supported values are "landsat" and "sentinel2".
+        time_range: The time range to search, in the format "YYYY-MM-DD/YYYY-MM-DD".
+        refresh: Whether to bypass cached search results. See search_stac_items().
+
+    Returns:
+        The matching items with signed asset URLs.
+    """
+    _check_tile_args(sensor, path, row)
+
+    config = SENSOR_CONFIGS[sensor]
     normalized_tile_id = (
         _normalize_sentinel2_tile_id(tile_id)
         if sensor == "sentinel2" and tile_id is not None
         else None
     )
 
-    catalog = pystac_client.Client.open(
-        PLANETARY_COMPUTER_CATALOG_URL,
-        modifier=planetary_computer.sign_inplace,
-    )
-
     query = None
     if sensor == "landsat":
         query = {
@@ -118,38 +335,248 @@ def get_satellite_data(
     elif normalized_tile_id is not None:
         query = {"s2:mgrs_tile": {"eq": normalized_tile_id}}
 
-    search = catalog.search(
+    items = search_stac_items(
         collections=[config["collection"]],
         intersects=shp.union_all(),
         datetime=time_range,
         query=query,
+        refresh=refresh,
     )
-
-    items = search.item_collection()
     tile_message = _format_tile_message(path=path, row=row, tile_id=normalized_tile_id)
     logging.info(
         f"Found {len(items)} {config['display_name']} items{tile_message} in time range {time_range}"
     )
+    return items
 
-    da_sat = odc.stac.stac_load(
-        items,
-        bands=bands,
-        intersects=shp.union_all(),
-        chunks=chunks,
-        nodata=config["nodata"],
-    )[data_band]
 
-    if mask_water:
-        da_sw = get_jrc_surface_water(shp, chunks=chunks)["occurrence"]
-        da_sw = da_sw.rio.reproject_match(da_sat).squeeze()
-        da_sat = da_sat.where(da_sw < 90)
+def _check_tile_args(sensor: Sensor, path: int | None, row: int | None) -> None:
+    """Validate the sensor and Landsat tile identifiers."""
+    if sensor not in SENSOR_CONFIGS:
+        supported_sensors = ", ".join(SENSOR_CONFIGS)
+        raise ValueError(
+            f"Unsupported sensor '{sensor}'. Use one of: {supported_sensors}"
+        )
 
-    da_sat.attrs["sensor"] = sensor
-    da_sat.attrs["clear_sky_flags"] = config["clear_sky_flags"]
-    da_sat.attrs["aoi_wkt"] = shp.union_all().wkt
-    da_sat.attrs["aoi_crs"] = str(shp.crs)
+    if sensor == "landsat" and (path is None or row is None):
+        raise ValueError("path and row are required when sensor='landsat'")
+
+
+def get_water_mask(
+    shp: "geopandas.GeoDataFrame",
+    da_sat: "xarray.DataArray",
+    chunks: dict = {"x": 512, "y": 512},
+) -> "xarray.DataArray":
+    """
+    Return a boolean water mask on the grid of a satellite cube.
+
+    Pixels are water when their JRC Global Surface Water occurrence is at least
+    ``WATER_OCCURRENCE_THRESHOLD`` percent, or unknown. The JRC layer is static, so
+    when ``WATER_MASK_CACHE_DIR`` is set the mask is stored per output grid and
+    later runs skip the JRC search, load and reprojection entirely; local cached
+    masks are memory-mapped.
+
+    Args:
+        shp: A GeoDataFrame containing the geometry of the area of interest.
+        da_sat: The satellite cube whose (y, x) grid the mask must match.
+        chunks: A dictionary specifying the chunk sizes for the JRC data.
+
+    Returns:
+        A boolean (y, x) xarray DataArray that is True over water.
+    """
+    cache_dir = water_mask.get_cache_dir()
+    if cache_dir is None:
+        return _compute_water_mask(shp, da_sat, chunks)
+
+    key = water_mask.make_grid_key(
+        da_sat.rio.crs.to_wkt(),
+        tuple(da_sat.rio.transform()),
+        (da_sat.sizes["y"], da_sat.sizes["x"]),
+    )
+    water = water_mask.load_water_mask(cache_dir, key)
+    if water is None:
+        da_water = _compute_water_mask(shp, da_sat, chunks).compute()
+        water_mask.save_water_mask(cache_dir, key, da_water.values)
+        logging.info(f"Stored water mask {key} in {cache_dir}")
+        return da_water
+
+    logging.info(f"Loaded water mask {key} from {cache_dir}")
+    if da_sat.chunks is not None:
+        water = dask.array.from_array(water, chunks=da_sat.chunks[-2:])
+    return xarray.DataArray(
+        water,
+        dims=("y", "x"),
+        coords={"y": da_sat["y"], "x": da_sat["x"]},
+    )
 
-    return da_sat
+
+def _compute_water_mask(
+    shp: "geopandas.GeoDataFrame", da_sat: "xarray.DataArray", chunks: dict
+) -> "xarray.DataArray":
+    """Fetch JRC occurrence and reproject it into a water mask on the cube grid."""
+    da_sw = get_jrc_surface_water(shp, chunks=chunks)["occurrence"]
+    da_sw = da_sw.rio.reproject_match(da_sat).squeeze()
+    return ~(da_sw < WATER_OCCURRENCE_THRESHOLD)
+
+
+def prune_stac_items(
+    items: Iterable[Any],
+    aoi: Any,
+    sensor: Sensor,
+    max_cloud_cover: float = FULLY_CLOUDY_COVER,
+    min_aoi_overlap: float = MIN_AOI_OVERLAP,
+) -> tuple[list[Any], list[Any]]:
+    """
+    Drop STAC items that cannot change the clear-sky result enough to be worth reading.
+
+    Pruning runs in three steps:
+    1. Duplicate scenes of the same tile and acquisition day are collapsed: Landsat
+       8/9 same-day pairs keep the least cloudy scene, and Sentinel-2 reprocessing
+       baselines keep the newest baseline.
+    2. Scenes whose footprint covers less than ``min_aoi_overlap`` of the AOI are
+       dropped.
+    3. Scenes at or above ``max_cloud_cover`` are set aside as fully cloudy. Their
+       pixels are never read; they only count as cloudy observations.
+
+    At least one scene is always returned for loading, so the output grid can be
+    built even when every scene is cloudy.
+
+    Args:
+        items: STAC items returned by the catalog search.
+        aoi: The area of interest as a shapely geometry in EPSG:4326.
+        sensor: The satellite sensor. Supported values are "landsat" and "sentinel2".
+        max_cloud_cover: Scene cloud cover (percent) at or above which a scene is
+            treated as fully cloudy.
+        min_aoi_overlap: Minimum fraction of the AOI area a scene must cover.
+
+    Returns:
+        A tuple of the items to load and the fully cloudy items.
+    """
+    items = list(items)
+    n_items = len(items)
+    items = _deduplicate_scenes(items, sensor)
+
+    if aoi.area > 0 and min_aoi_overlap > 0:
+        items = [item for item in items if _aoi_overlap(item, aoi) >= min_aoi_overlap]
+
+    to_load = [item for item in items if _cloud_cover(item) < max_cloud_cover]
+    cloudy = [item for item in items if _cloud_cover(item) >= max_cloud_cover]
+    if not to_load and cloudy:
+        cloudy.sort(key=_cloud_cover)
+        to_load.append(cloudy.pop(0))
+
+    logging.info(
+        f"Pruned {n_items} items to {len(to_load)} to load "
+        f"and {len(cloudy)} fully cloudy"
+    )
+    return to_load, cloudy
+
+
+def _aoi_overlap(item: Any, aoi: Any) -> float:
+    """Return the fraction of the AOI area covered by a STAC item's footprint."""
+    return shapely.geometry.shape(item.geometry).intersection(aoi).area / aoi.area
+
+
+def _cloud_cover(item: Any) -> float:
+    """Return a STAC item's scene cloud cover, treating a missing value as clear."""
+    cloud_cover = item.properties.get("eo:cloud_cover")
+    return 0.0 if cloud_cover is None else float(cloud_cover)
+
+
+def _deduplicate_scenes(items: list[Any], sensor: Sensor) -> list[Any]:
+    """Keep one STAC item per tile and acquisition day."""
+    tile_keys: tuple[str, ...]
+    if sensor == "landsat":
+        tile_keys = ("landsat:wrs_path", "landsat:wrs_row")
+    else:
+        tile_keys = ("s2:mgrs_tile",)
+
+    def preference(item: Any) -> tuple:
+        # Newer Sentinel-2 processing baselines first, then the least cloudy scene.
+        baseline = str(item.properties.get("s2:processing_baseline", ""))
+        return (baseline, -_cloud_cover(item))
+
+    best: dict[tuple, Any] = {}
+    for item in items:
+        key = tuple(item.properties.get(k) for k in tile_keys) + (item.datetime.date(),)
+        if key not in best or preference(item) > preference(best[key]):
+            best[key] = item
+
+    return list(best.values())
+
+
+def _cloudy_scene_counts(
+    da_ls: "xarray.DataArray", footprints_wkt: list[str]
+) -> "numpy.ndarray":
+    """Rasterize fully cloudy scene footprints into per-pixel observation counts."""
+    out_shape = (da_ls.sizes["y"], da_ls.sizes["x"])
+    if not footprints_wkt:
+        return numpy.zeros(out_shape, dtype="uint16")
+
+    footprints = geopandas.GeoSeries.from_wkt(footprints_wkt, crs="EPSG:4326").to_crs(
+        da_ls.rio.crs
+    )
+
+    return rasterio.features.rasterize(
+        ((geom, 1) for geom in footprints),
+        out_shape=out_shape,
+        transform=da_ls.rio.transform(),
+        fill=0,
+        merge_alg=rasterio.enums.MergeAlg.add,
+        dtype="uint16",
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def open_catalog() -> "pystac_client.Client":
+    """
+    Open the Planetary Computer STAC catalog once per process.
+
+    The client is reused by every search in the process, so batch runs pay for the
+    catalog landing-page round-trip once instead of once per tile.
+    """
+    return pystac_client.Client.open(
+        PLANETARY_COMPUTER_CATALOG_URL,
+        modifier=planetary_computer.sign_inplace,
+    )
+
+
+def search_stac_items(
+    refresh: bool = False, **search_kwargs: Any
+) -> "pystac.ItemCollection":
+    """
+    Search the Planetary Computer STAC catalog, reusing cached results if enabled.
+
+    When the ``STAC_CACHE_DIR`` environment variable is set, results are cached on
+    disk keyed by the search arguments and reused for ``STAC_CACHE_TTL`` seconds
+    (one week by default), so reruns skip the catalog round-trip. Cached asset
+    URLs are signed again when loaded.
+
+    Args:
+        refresh: Whether to search the catalog even if results are cached, and
+            replace the cache entry with the new results. Searches for newly
+            published scenes need this.
+        **search_kwargs: Keyword arguments passed to ``Client.search``.
+
+    Returns:
+        The matching items with signed asset URLs.
+    """
+    cache_dir = stac_cache.get_cache_dir()
+    if cache_dir is not None:
+        key = stac_cache.make_cache_key(**search_kwargs)
+        if not refresh:
+            items = stac_cache.load_cached_items(
+                cache_dir, key, ttl=stac_cache.get_cache_ttl()
+            )
+            if items is not None:
+                logging.info(f"Loaded {len(items)} items from STAC cache entry {key}")
+                return items
+
+    items = open_catalog().search(**search_kwargs).item_collection()
+
+    if cache_dir is not None:
+        stac_cache.save_cached_items(cache_dir, key, items)
+
+    return items
 
 
 def _format_tile_message(path: int | None, row: int | None, tile_id: str | None) -> str:
@@ -230,6 +657,199 @@ def _make_clip_geometry(
     return clip_shp.union_all().simplify(tolerance=1000).buffer(buffer)
 
 
+def _qa_bits(values: "numpy.ndarray", bit: int, width: int = 1) -> "numpy.ndarray":
+    """Extract a ``width``-bit field starting at ``bit`` from packed QA values."""
+    return (values >> bit) & ((1 << width) - 1)
+
+
+@functools.lru_cache(maxsize=None)
+def build_landsat_clear_sky_lut() -> "numpy.ndarray":
+    """
+    Build a lookup table of clear-sky Landsat Collection 2 QA_PIXEL values.
+
+    Every possible 16-bit QA_PIXEL value is decoded from its bit fields. A value is
+    clear sky when it is not fill, has neither the cloud nor the cloud shadow bit set,
+    has at most low cloud and cloud shadow confidence, and is flagged as clear, water
+    or snow/ice.
+
+    The dilated cloud and cirrus bits and the cirrus and snow/ice confidence fields
+    are intentionally not decoded. ``LANDSAT_CLEAR_SKY_QA_FLAGS`` counts dilated
+    cloud and high confidence cirrus (54596) as clear sky, and snow/ice is clear at
+    any confidence, so ignoring them keeps every legacy value classified as before.
+
+    Returns:
+        A read-only boolean array of length 65536 indexed by QA_PIXEL value.
+    """
+    qa = numpy.arange(QA_LOOKUP_TABLE_SIZE, dtype=numpy.uint32)
+    lut = (
+        (_qa_bits(qa, LANDSAT_QA_FILL_BIT) == 0)
+        & (_qa_bits(qa, LANDSAT_QA_CLOUD_BIT) == 0)
+        & (_qa_bits(qa, LANDSAT_QA_CLOUD_SHADOW_BIT) == 0)
+        & (_qa_bits(qa, LANDSAT_QA_CLOUD_CONFIDENCE_BIT, width=2) <= 1)
+        & (_qa_bits(qa, LANDSAT_QA_CLOUD_SHADOW_CONFIDENCE_BIT, width=2) <= 1)
+        & (
+            (_qa_bits(qa, LANDSAT_QA_CLEAR_BIT) == 1)
+            | (_qa_bits(qa, LANDSAT_QA_WATER_BIT) == 1)
+            | (_qa_bits(qa, LANDSAT_QA_SNOW_BIT) == 1)
+        )
+    )
+    lut.setflags(write=False)
+    return lut
+
+
+@functools.lru_cache(maxsize=None)
+def build_flag_lut(flags: tuple[int, ...]) -> "numpy.ndarray":
+    """
+    Build a lookup table that matches an explicit set of classification values.
+
+    Args:
+        flags: Classification values that indicate clear sky conditions.
+
+    Returns:
+        A read-only boolean array of length 65536 that is True at each flag value.
+    """
+    lut = numpy.zeros(QA_LOOKUP_TABLE_SIZE, dtype=bool)
+    lut[list(flags)] = True
+    lut.setflags(write=False)
+    return lut
+
+
+def get_clear_sky_lut(sensor: Sensor) -> "numpy.ndarray":
+    """
+    Return the cached clear-sky lookup table for a supported sensor.
+
+    Landsat QA_PIXEL values are decoded bit by bit, while Sentinel-2 SCL classes are
+    matched against ``SENTINEL2_CLEAR_SKY_SCL_CLASSES``.
+
+    Raises:
+        ValueError: If the sensor is unsupported.
+    """
+    if sensor == "landsat":
+        return build_landsat_clear_sky_lut()
+
+    if sensor in SENSOR_CONFIGS:
+        return build_flag_lut(tuple(SENSOR_CONFIGS[sensor]["clear_sky_flags"]))
+
+    supported_sensors = ", ".join(SENSOR_CONFIGS)
+    raise ValueError(f"Unsupported sensor '{sensor}'. Use one of: {supported_sensors}")
+
+
+@functools.lru_cache(maxsize=None)
+def build_valid_lut(
+    sensor: Sensor | None = None, nodata: int | None = None
+) -> "numpy.ndarray":
+    """
+    Build a lookup table of classification values that are valid observations.
+
+    Landsat QA_PIXEL values are invalid when the fill bit is set, which covers both
+    the Collection 2 fill value and the 65535 nodata used outside scene footprints.
+    Other sensors are invalid only at their nodata value.
+
+    Args:
+        sensor: The satellite sensor, or None for a generic classification band.
+        nodata: The nodata value to reject. Defaults to the sensor's nodata value.
+
+    Returns:
+        A read-only boolean array of length 65536 indexed by classification value.
+    """
+    if sensor == "landsat":
+        qa = numpy.arange(QA_LOOKUP_TABLE_SIZE, dtype=numpy.uint32)
+        lut = _qa_bits(qa, LANDSAT_QA_FILL_BIT) == 0
+    else:
+        lut = numpy.ones(QA_LOOKUP_TABLE_SIZE, dtype=bool)
+
+    if nodata is None and sensor in SENSOR_CONFIGS:
+        nodata = SENSOR_CONFIGS[sensor]["nodata"]
+    if nodata is not None:
+        lut[nodata] = False
+
+    lut.setflags(write=False)
+    return lut
+
+
+def _apply_lut(values: "numpy.ndarray", lut: "numpy.ndarray") -> "numpy.ndarray":
+    """Gather lookup table entries for a block of classification values."""
+    if numpy.issubdtype(values.dtype, numpy.floating):
+        # Masked pixels (e.g. from the water mask) are NaN and never match.
+        finite = numpy.isfinite(values)
+        index = numpy.where(finite, values, 0).astype(numpy.uint16)
+        return lut[index] & finite
+
+    return lut[values.astype(numpy.uint16, copy=False)]
+
+
+def decode_clear_sky(
+    da_ls: "xarray.DataArray", lut: "numpy.ndarray"
+) -> "xarray.DataArray":
+    """
+    Classify every pixel of a classification band as clear sky or not.
+
+    The lookup table is applied with a single gather per chunk, so classification
+    costs one memory access per pixel regardless of how many values are clear.
+
+    Args:
+        da_ls: An xarray DataArray containing a satellite classification band.
+        lut: A boolean lookup table indexed by classification value.
+
+    Returns:
+        A boolean xarray DataArray with the same shape as ``da_ls``.
+    """
+    return _gather(da_ls, lut)
+
+
+def _gather(da: "xarray.DataArray", lut: "numpy.ndarray") -> "xarray.DataArray":
+    """Apply a boolean lookup table to every pixel of a DataArray, chunk by chunk."""
+    return xarray.apply_ufunc(
+        _apply_lut,
+        da,
+        kwargs={"lut": lut},
+        dask="parallelized",
+        output_dtypes=[bool],
+    )
+
+
+def _resolve_clear_sky_lut(
+    da_ls: "xarray.DataArray", clear_sky_qa_flags: List[int] | None
+) -> "numpy.ndarray":
+    """
+    Pick the clear-sky lookup table for a classification band.
+
+    Resolution order:
+    1. Explicit ``clear_sky_qa_flags``, matched exactly.
+    2. The bit-level table of the ``"sensor"`` attribute set by get_satellite_data().
+    3. ``"clear_sky_flags"`` attribute values, matched exactly.
+    4. The Landsat bit-level table.
+    """
+    if clear_sky_qa_flags is not None:
+        return build_flag_lut(tuple(clear_sky_qa_flags))
+    if "sensor" in da_ls.attrs:
+        return get_clear_sky_lut(da_ls.attrs["sensor"])
+    if "clear_sky_flags" in da_ls.attrs:
+        return build_flag_lut(tuple(da_ls.attrs["clear_sky_flags"]))
+    return get_clear_sky_lut("landsat")
+
+
+def _resolve_valid_lut(
+    da_ls: "xarray.DataArray", clear_sky_qa_flags: List[int] | None
+) -> "numpy.ndarray":
+    """
+    Pick the valid-observation lookup table for a classification band.
+
+    The ``"sensor"`` attribute takes priority. Bands classified with explicit or
+    attribute flags only reject their ``"nodata"`` attribute, and bare bands fall
+    back to Landsat fill-bit decoding, mirroring _resolve_clear_sky_lut().
+    """
+    if "sensor" in da_ls.attrs:
+        return build_valid_lut(da_ls.attrs["sensor"])
+    if clear_sky_qa_flags is None and "clear_sky_flags" not in da_ls.attrs:
+        return build_valid_lut("landsat")
+
+    nodata = da_ls.attrs.get("nodata")
+    if nodata is None or not 0 <= nodata < QA_LOOKUP_TABLE_SIZE:
+        return build_valid_lut()
+    return build_valid_lut(nodata=int(nodata))
+
+
 def get_landsat_data(
     shp: "geopandas.GeoDataFrame",
     path: int,
@@ -257,7 +877,10 @@ def get_landsat_data(
 
 
 def compute_clear_sky_percentage(
-    da_ls: "xarray.DataArray", clear_sky_qa_flags: List[int] | None = None
+    da_ls: "xarray.DataArray",
+    clear_sky_qa_flags: List[int] | None = None,
+    time_batch_size: int | None = None,
+    group: PeriodGroup | None = None,
 ) -> "xarray.DataArray":
     """
     Compute the percentage of clear-sky pixels in a satellite classification band.
@@ -265,23 +888,271 @@ def compute_clear_sky_percentage(
     Args:
         da_ls: An xarray DataArray containing a satellite classification band.
         clear_sky_qa_flags: Classification values that indicate clear sky conditions.
-            Defaults to values stored by get_satellite_data(), or Landsat QA flags.
+            When omitted, the QA bit fields of the sensor recorded by
+            get_satellite_data() are decoded, falling back to the
+            ``"clear_sky_flags"`` attribute and then to Landsat QA decoding.
+        time_batch_size: When set, stream the time axis in batches of this many
+            scenes instead of building one lazy reduction over the whole cube.
+            See compute_clear_sky_counts().
+        group: Compute one percentage per period instead of one over the whole
+            time range: ``"month"``, ``"season"`` or a mapping of labels to
+            months. See get_period_bins().
 
     Returns:
-        An xarray DataArray containing the percentage of clear sky pixels for each spatial location.
+        A uint8 xarray DataArray containing the integer-rounded percentage (0-100)
+        of clear sky observations for each spatial location, relative to its valid
+        observations. The per-pixel uint16 valid-observation count is attached as
+        the ``"valid_count"`` coordinate. Pixels without valid observations are 0.
+        With ``group``, both have a leading ``"period"`` dimension.
 
     Raises:
         ValueError: If the input DataArray has no time observations.
     """
+    ds_counts = compute_clear_sky_counts(
+        da_ls, clear_sky_qa_flags, time_batch_size=time_batch_size, group=group
+    )
+    return clear_sky_percentage_from_counts(ds_counts)
+
+
+def clear_sky_percentage_from_counts(
+    ds_counts: "xarray.Dataset",
+) -> "xarray.DataArray":
+    """
+    Convert clear-sky and valid observation counts into a uint8 percentage.
+
+    The percentage is rounded half up with integer arithmetic, so no floating-point
+    temporaries are created.
+
+    Args:
+        ds_counts: An xarray Dataset with ``"clear"`` and ``"valid"`` counts, as
+            returned by compute_clear_sky_counts().
+
+    Returns:
+        A uint8 xarray DataArray with the ``"valid_count"`` coordinate attached.
+    """
+    valid = ds_counts["valid"]
+    has_obs = valid > 0
+    clear = ds_counts["clear"].astype("uint32")
+    percent = (clear * 100 + valid // 2) // valid.where(has_obs, 1)
+    da_csp = percent.where(has_obs, 0).astype("uint8").assign_coords(valid_count=valid)
+    da_csp.attrs.update(ds_counts.attrs)
+    return da_csp
+
+
+def compute_clear_sky_counts(
+    da_ls: "xarray.DataArray",
+    clear_sky_qa_flags: List[int] | None = None,
+    time_batch_size: int | None = None,
+    group: PeriodGroup | None = None,
+) -> "xarray.Dataset":
+    """
+    Count clear-sky and valid observations per pixel in one pass over the time axis.
+
+    Observations at the nodata value, outside a scene footprint, or masked by the
+    water mask (NaN) are not valid and count toward neither total. Both counts are
+    derived from the same chunks, so computing them together reads the cube once.
+
+    By default the counts are a lazy reduction over the whole cube. With
+    ``time_batch_size``, scenes are loaded ``time_batch_size`` at a time, added to
+    in-memory counters and discarded, so peak memory depends on the spatial window
+    rather than on the number of scenes.
+
+    With ``group``, observations are counted per period along a new ``"period"``
+    dimension. Every scene falls in at most one period, so all periods are still
+    counted in a single read of the cube.
+
+    Args:
+        da_ls: An xarray DataArray containing a satellite classification band.
+        clear_sky_qa_flags: Classification values that indicate clear sky
+            conditions. See compute_clear_sky_percentage().
+        time_batch_size: Number of scenes to load per batch when streaming.
+        group: Optional period grouping. See get_period_bins().
+
+    Returns:
+        An xarray Dataset with ``"clear"`` and ``"valid"`` count variables.
+
+    Raises:
+        ValueError: If the input DataArray has no time observations, or if
+            ``time_batch_size`` is not positive.
+    """
     if len(da_ls.time) == 0:
         raise ValueError("Cannot compute clear sky percentage from empty data")
 
-    if clear_sky_qa_flags is None:
-        clear_sky_qa_flags = da_ls.attrs.get("clear_sky_flags", CLEAR_SKY_QA_FLAGS)
-    clear_sky = da_ls.isin(clear_sky_qa_flags)
-    _sum = clear_sky.astype(int).sum(dim="time")
+    clear_lut = _resolve_clear_sky_lut(da_ls, clear_sky_qa_flags)
+    valid_lut = _resolve_valid_lut(da_ls, clear_sky_qa_flags)
+    bins = None if group is None else get_period_bins(group)
+
+    if time_batch_size is None:
+        ds_counts = _count_observations(da_ls, clear_lut, valid_lut, bins)
+    else:
+        ds_counts = _stream_observations(
+            da_ls, clear_lut, valid_lut, time_batch_size, bins
+        )
+
+    if da_ls.attrs.get("cloudy_footprints_wkt"):
+        # Fully cloudy scenes pruned before loading add valid, never clear,
+        # observations. Pixels with no loaded valid observation (e.g. water) are
+        # left untouched.
+        cloudy = _cloudy_counts(da_ls, bins)
+        valid = ds_counts["valid"]
+        ds_counts["valid"] = valid + cloudy.where(valid > 0, 0).astype("uint16")
+
+    ds_counts.attrs = _output_attrs(da_ls)
+    return ds_counts
+
 
-    return _sum / len(da_ls.time)
+def get_period_bins(group: PeriodGroup) -> dict[str, tuple[int, ...]]:
+    """
+    Resolve a period grouping into labelled bins of calendar months.
+
+    Args:
+        group: ``"month"`` for one period per calendar month (labelled "Jan" to
+            "Dec"), ``"season"`` for meteorological seasons (DJF, MAM, JJA, SON),
+            or a mapping of custom labels to months, e.g.
+            ``{"wet": [5, 6, 7, 8], "dry": [11, 12, 1, 2]}``. Months that fall in
+            no custom bin are ignored.
+
+    Returns:
+        An ordered mapping of period labels to months (1-12).
+
+    Raises:
+        ValueError: If the grouping is unknown, or if custom bins contain invalid
+            or repeated months.
+    """
+    if group == "month":
+        return {calendar.month_abbr[month]: (month,) for month in range(1, 13)}
+    if group == "season":
+        return dict(SEASON_MONTHS)
+    if not isinstance(group, Mapping):
+        raise ValueError(
+            f"Unsupported group '{group}'. Use 'month', 'season' or a mapping of "
+            "labels to months"
+        )
+
+    bins = {
+        str(label): tuple(int(month) for month in months)
+        for label, months in group.items()
+    }
+    months = [month for bin_months in bins.values() for month in bin_months]
+    if not bins or any(month < 1 or month > 12 for month in months):
+        raise ValueError("Custom period bins must contain months between 1 and 12")
+    if len(months) != len(set(months)):
+        raise ValueError("Custom period bins must not share months")
+    return bins
+
+
+def _period_positions(
+    months: Iterable[int], bins: dict[str, tuple[int, ...]]
+) -> dict[str, list[int]]:
+    """Map each period label to the positions of the scenes acquired in it."""
+    month_period = {month: label for label, months in bins.items() for month in months}
+    positions: dict[str, list[int]] = {label: [] for label in bins}
+    for position, month in enumerate(months):
+        label = month_period.get(int(month))
+        if label is not None:
+            positions[label].append(position)
+    return positions
+
+
+def _count_observations(
+    da_ls: "xarray.DataArray",
+    clear_lut: "numpy.ndarray",
+    valid_lut: "numpy.ndarray",
+    bins: dict[str, tuple[int, ...]] | None = None,
+) -> "xarray.Dataset":
+    """Reduce a classification band to clear-sky and valid observation counts."""
+    valid = _gather(da_ls, valid_lut)
+    clear_sky = decode_clear_sky(da_ls, clear_lut) & valid
+
+    if bins is not None:
+        positions = _period_positions(da_ls["time"].dt.month.values, bins)
+        return xarray.Dataset(
+            {
+                "clear": _sum_periods(clear_sky, positions),
+                "valid": _sum_periods(valid, positions),
+            }
+        )
+
+    # Boolean masks summed straight into uint16 counters: no int64 temporaries.
+    return xarray.Dataset(
+        {
+            "clear": clear_sky.sum(dim="time", dtype="uint16"),
+            "valid": valid.sum(dim="time", dtype="uint16"),
+        }
+    )
+
+
+def _sum_periods(
+    mask: "xarray.DataArray", positions: dict[str, list[int]]
+) -> "xarray.DataArray":
+    """Sum a boolean mask over the scenes of each period into uint16 counters."""
+    # Periods partition the scenes, so each chunk is still read once; periods
+    # without scenes sum to zero.
+    sums = [
+        mask.isel(time=scenes).sum(dim="time", dtype="uint16")
+        for scenes in positions.values()
+    ]
+    return xarray.concat(sums, dim="period").assign_coords(period=list(positions))
+
+
+def _cloudy_counts(
+    da_ls: "xarray.DataArray", bins: dict[str, tuple[int, ...]] | None
+) -> "xarray.DataArray":
+    """Count fully cloudy pruned scenes per pixel, per period when grouping."""
+    coords = {"y": da_ls["y"], "x": da_ls["x"]}
+    footprints_wkt = da_ls.attrs["cloudy_footprints_wkt"]
+    if bins is None:
+        return xarray.DataArray(
+            _cloudy_scene_counts(da_ls, footprints_wkt),
+            dims=("y", "x"),
+            coords=coords,
+        )
+
+    months = [
+        datetime.datetime.fromisoformat(value).month
+        for value in da_ls.attrs["cloudy_datetimes"]
+    ]
+    positions = _period_positions(months, bins)
+    counts = [
+        _cloudy_scene_counts(da_ls, [footprints_wkt[i] for i in scenes])
+        for scenes in positions.values()
+    ]
+    return xarray.DataArray(
+        numpy.stack(counts),
+        dims=("period", "y", "x"),
+        coords={"period": list(positions), **coords},
+    )
+
+
+def _stream_observations(
+    da_ls: "xarray.DataArray",
+    clear_lut: "numpy.ndarray",
+    valid_lut: "numpy.ndarray",
+    time_batch_size: int,
+    bins: dict[str, tuple[int, ...]] | None = None,
+) -> "xarray.Dataset":
+    """Accumulate observation counts over the time axis one batch at a time."""
+    if time_batch_size < 1:
+        raise ValueError("time_batch_size must be a positive integer")
+
+    n_scenes = len(da_ls.time)
+    ds_counts = None
+    for start in range(0, n_scenes, time_batch_size):
+        stop = min(start + time_batch_size, n_scenes)
+        batch = da_ls.isel(time=slice(start, stop))
+        ds_batch = _count_observations(batch, clear_lut, valid_lut, bins).compute()
+        if ds_counts is None:
+            ds_counts = ds_batch
+        else:
+            ds_counts += ds_batch
+        logging.debug(f"Accumulated scenes {start + 1}-{stop} of {n_scenes}")
+
+    return ds_counts
+
+
+def _output_attrs(da_ls: "xarray.DataArray") -> dict[str, Any]:
+    """Select the attributes that reductions must carry through to storage."""
+    return {key: da_ls.attrs[key] for key in OUTPUT_ATTRS if key in da_ls.attrs}
 
 
 def store_clear_sky_percentage(
@@ -292,6 +1163,7 @@ def store_clear_sky_percentage(
     sensor: Sensor = "landsat",
     output_template: str = "{tile_key}.tif",
     buffer: int = -500,
+    cog_profile: str | Mapping[str, Any] = cog.DEFAULT_COG_PROFILE,
 ) -> str:
     """
     Store clear sky percentage data as a Cloud Optimized GeoTIFF (COG) file.
@@ -301,10 +1173,24 @@ def store_clear_sky_percentage(
     AOI that was used to fetch the data is therefore always used to clip the
     output, shrunk inward by ``buffer`` metres.
 
+    When ``da_csp`` carries the ``"valid_count"`` coordinate set by
+    :func:`compute_clear_sky_percentage`, the COG gets two uint16 bands: the
+    clear sky percentage and the number of valid observations.
+
+    A ``"period"`` dimension (see the ``group`` option of
+    :func:`compute_clear_sky_percentage`) is written as one band per period: all
+    percentages first, then all valid counts. Band descriptions name the layer
+    and period, e.g. ``clear_sky_percentage_DJF``.
+
+    A footprint sidecar (``*_footprint.json``) with the COG's bounds, CRS, zoom
+    range and checksum is stored next to it, so the API builds mosaics without
+    reading COG headers. See cog.write_footprint().
+
     Args:
-        da_csp: An xarray DataArray containing the percentage of clear sky pixels
-            for each spatial location. Must carry ``aoi_wkt`` and ``aoi_crs``
-            attributes set by :func:`get_satellite_data`.
+        da_csp: A uint8 xarray DataArray containing the percentage (0-100) of clear
+            sky pixels for each spatial location, as returned by
+            :func:`compute_clear_sky_percentage`. Must carry ``aoi_wkt`` and
+            ``aoi_crs`` attributes set by :func:`get_satellite_data`.
         path: The WRS-2 path number. Required for Landsat.
         row: The WRS-2 row number. Required for Landsat.
         tile_id: The Sentinel-2 MGRS tile ID. Required for Sentinel-2.
@@ -312,27 +1198,71 @@ def store_clear_sky_percentage(
         output_template: A template string for the output file name. Supports
             placeholders for tile_key, sensor, path, row, and tile_id.
         buffer: The distance in metres to buffer the clipping geometry inward.
+        cog_profile: The COG compression, block size and overview profile. See
+            cog.resolve_cog_profile(). Remote outputs are written locally and
+            uploaded in one transfer.
 
     Returns:
         The output file name or path.
     """
-    tile_key = format_satellite_tile_key(
-        sensor=sensor,
-        path=path,
-        row=row,
-        tile_id=tile_id,
-    )
+    fname = format_output_path(output_template, sensor, path, row, tile_id)
     aoi_geom = shapely.from_wkt(da_csp.attrs["aoi_wkt"])
     clip_shp = geopandas.GeoDataFrame(geometry=[aoi_geom], crs=da_csp.attrs["aoi_crs"])
-    da_csp = (da_csp.where(da_csp > 0) * 100).fillna(0)
-    da_csp = da_csp.astype("uint8").rio.write_nodata(0)
+    raster_crs = da_csp.rio.crs
+    valid_count = da_csp.coords.get("valid_count")
+    da_csp = da_csp.drop_vars("valid_count", errors="ignore")
+
+    periods = da_csp["period"].values if "period" in da_csp.dims else [None]
+    if valid_count is None and periods[0] is None:
+        da_csp = da_csp.astype("uint8")
+    else:
+        layers = {"clear_sky_percentage": da_csp}
+        if valid_count is not None:
+            # A coordinate's DataArray carries itself as a coordinate; drop it so
+            # per-period bands can be concatenated.
+            layers["valid_observations"] = valid_count.drop_vars("valid_count")
+        # GeoTIFF bands share one dtype, so the percentage is widened to uint16
+        # when it is stored next to counts.
+        dtype = "uint8" if valid_count is None else "uint16"
+        bands, names = [], []
+        for name, layer in layers.items():
+            for period in periods:
+                if period is None:
+                    bands.append(layer.astype(dtype))
+                    names.append(name)
+                else:
+                    bands.append(layer.sel(period=period, drop=True).astype(dtype))
+                    names.append(f"{name}_{period}")
+        da_csp = xarray.concat(bands, dim="band").assign_coords(
+            band=list(range(1, len(bands) + 1))
+        )
+        da_csp.attrs["long_name"] = tuple(names)
+        da_csp = da_csp.transpose("band", ...).rio.write_crs(raster_crs)
+
+    da_csp = da_csp.rio.write_nodata(0)
 
     poly = _make_clip_geometry(clip_shp, da_csp.rio.crs, buffer)
 
     da_csp = da_csp.rio.clip([poly], da_csp.rio.crs, drop=True)
 
-    fname = output_template.format(
-        tile_key=tile_key,
+    cog.write_cog(da_csp, fname, cog_profile, footprint=True)
+
+    logging.info(f"Clear sky percentage stored at {fname}")
+    return fname
+
+
+def format_output_path(
+    output_template: str,
+    sensor: Sensor,
+    path: int | None = None,
+    row: int | None = None,
+    tile_id: str | None = None,
+) -> str:
+    """Fill an output template with the identifiers of one tile."""
+    return output_template.format(
+        tile_key=format_satellite_tile_key(
+            sensor=sensor, path=path, row=row, tile_id=tile_id
+        ),
         sensor=sensor,
         path=path,
         row=row,
@@ -340,10 +1270,116 @@ def store_clear_sky_percentage(
         if sensor == "sentinel2" and tile_id is not None
         else tile_id,
     )
-    da_csp.rio.to_raster(fname, driver="COG")
 
-    logging.info(f"Clear sky percentage stored at {fname}")
-    return fname
+
+def get_counts_path(fname: str) -> str:
+    """Return the path of the clear-sky counters stored next to an output COG."""
+    return f"{os.path.splitext(fname)[0]}{COUNTS_SUFFIX}"
+
+
+def store_clear_sky_counts(
+    ds_counts: "xarray.Dataset", fname: str, item_ids: Iterable[str]
+) -> str:
+    """
+    Store clear-sky counters next to an output COG for incremental updates.
+
+    The counters are written unclipped, on the grid the scenes were loaded on, as a
+    two-band uint16 COG (clear and valid observations). The IDs of the STAC items
+    already counted are stored in the same file's tags, so counters and item IDs
+    are always replaced together.
+
+    Args:
+        ds_counts: An xarray Dataset with ``"clear"`` and ``"valid"`` counts, as
+            returned by compute_clear_sky_counts().
+        fname: The path of the output COG the counters belong to.
+        item_ids: The IDs of the STAC items included in the counts.
+
+    Returns:
+        The path of the stored counters.
+    """
+    counts_path = get_counts_path(fname)
+    raster_crs = ds_counts["valid"].rio.crs
+    da_counts = xarray.concat(
+        [ds_counts["clear"], ds_counts["valid"]], dim="band"
+    ).assign_coords(band=[1, 2])
+    da_counts.attrs = {
+        "long_name": ("clear_observations", "valid_observations"),
+        "sensor": ds_counts.attrs.get("sensor", ""),
+        "stac_item_ids": json.dumps(sorted(item_ids)),
+    }
+    da_counts = da_counts.transpose("band", ...).rio.write_crs(raster_crs)
+    cog.write_cog(da_counts, counts_path, COUNTS_COG_PROFILE)
+    logging.info(f"Clear sky counters stored at {counts_path}")
+    return counts_path
+
+
+def load_clear_sky_counts(
+    fname: str, chunks: dict | None = None
+) -> "tuple[xarray.Dataset, set[str]] | None":
+    """
+    Load the clear-sky counters stored next to an output COG.
+
+    Args:
+        fname: The path of the output COG the counters belong to.
+        chunks: Optional Dask chunk sizes for reading the counters lazily.
+
+    Returns:
+        The counters as an xarray Dataset with ``"clear"`` and ``"valid"`` counts,
+        and the IDs of the STAC items already counted, or None if no counters
+        are stored.
+    """
+    counts_path = get_counts_path(fname)
+    try:
+        da_counts = rioxarray.open_rasterio(counts_path, chunks=chunks)
+    except rasterio.errors.RasterioIOError:
+        return None
+
+    item_ids = set(json.loads(da_counts.attrs["stac_item_ids"]))
+    ds_counts = xarray.Dataset(
+        {
+            "clear": da_counts.sel(band=1, drop=True),
+            "valid": da_counts.sel(band=2, drop=True),
+        },
+        attrs={"sensor": da_counts.attrs.get("sensor")},
+    )
+    for name in ds_counts.data_vars:
+        ds_counts[name].attrs = {}
+    return ds_counts, item_ids
+
+
+def add_clear_sky_counts(
+    ds_counts: "xarray.Dataset", ds_new: "xarray.Dataset"
+) -> "xarray.Dataset":
+    """
+    Add new observation counts to stored counters on the same grid.
+
+    Sums saturate at the uint16 maximum instead of wrapping around.
+
+    Args:
+        ds_counts: Stored counters, as returned by load_clear_sky_counts().
+        ds_new: Counts of newly acquired scenes loaded onto the stored grid.
+
+    Returns:
+        The combined counts with the coordinates and attributes of ``ds_new``.
+
+    Raises:
+        ValueError: If the two grids differ in shape.
+    """
+    if ds_counts["valid"].shape != ds_new["valid"].shape:
+        raise ValueError(
+            f"Stored counters have shape {ds_counts['valid'].shape}, but new counts "
+            f"have shape {ds_new['valid'].shape}"
+        )
+
+    # Grids match pixel for pixel; adding raw arrays skips float coordinate
+    # alignment between the stored GeoTIFF and the freshly loaded grid.
+    ds_total = ds_new.copy()
+    for name in ("clear", "valid"):
+        total = ds_counts[name].data.astype("uint32") + ds_new[name].data
+        ds_total[name] = ds_new[name].copy(
+            data=numpy.minimum(total, COUNT_MAX).astype("uint16")
+        )
+    return ds_total
 
 
 def _load_aoi(
@@ -385,10 +1421,22 @@ def run_clear_sky_pipeline(
     mask_water: bool = True,
     output_template: str = "{tile_key}.tif",
     buffer: int = -500,
+    time_batch_size: int | None = None,
+    prune_items: bool = False,
+    store_counts: bool = False,
+    update: bool = False,
+    group: PeriodGroup | None = None,
+    cog_profile: str | Mapping[str, Any] = cog.DEFAULT_COG_PROFILE,
 ) -> str:
     """
     Fetch satellite data, compute clear sky percentage, and store it as a COG.
 
+    With ``store_counts``, the per-pixel clear and valid counters and the IDs of
+    the items counted are stored next to the COG (see store_clear_sky_counts()).
+    With ``update``, stored counters are reused: only items not counted yet are
+    loaded, added to the counters, and the percentage is rewritten. Without
+    stored counters, an update processes the whole time range and stores them.
+
     Args:
         path: The WRS-2 path number. Required for Landsat.
         row: The WRS-2 row number. Required for Landsat.
@@ -404,10 +1452,25 @@ def run_clear_sky_pipeline(
         output_template: A template string for the output file name. Supports
             placeholders for tile_key, sensor, path, row, and tile_id.
         buffer: The distance in meters to buffer the clipping geometry.
+        time_batch_size: When set, stream scenes through the reduction in batches
+            of this size to bound peak memory. See compute_clear_sky_counts().
+        prune_items: Whether to drop duplicate, barely overlapping and fully
+            cloudy scenes before reading pixels. See prune_stac_items().
+        store_counts: Whether to store the clear-sky counters next to the COG.
+        update: Whether to update stored counters with unseen items only.
+        group: Store one percentage band per month, season or custom bin of
+            months, computed in a single read. See get_period_bins().
+        cog_profile: The output COG profile. See cog.resolve_cog_profile().
 
     Returns:
         The output file name or path.
+
+    Raises:
+        ValueError: If ``group`` is combined with ``store_counts`` or ``update``.
     """
+    if group is not None and (store_counts or update):
+        raise ValueError("group cannot be combined with store_counts or update")
+
     shp = _load_aoi(
         sensor=sensor,
         path=path,
@@ -415,6 +1478,113 @@ def run_clear_sky_pipeline(
         tile_id=tile_id,
         aoi_geojson=aoi_geojson,
     )
+    if update:
+        fname = format_output_path(output_template, sensor, path, row, tile_id)
+        stored = load_clear_sky_counts(fname, chunks=chunks)
+        if stored is not None:
+            return _update_clear_sky_outputs(
+                shp,
+                stored,
+                path=path,
+                row=row,
+                tile_id=tile_id,
+                sensor=sensor,
+                time_range=time_range,
+                bands=bands,
+                chunks=chunks,
+                mask_water=mask_water,
+                output_template=output_template,
+                buffer=buffer,
+                time_batch_size=time_batch_size,
+                prune_items=prune_items,
+                cog_profile=cog_profile,
+            )
+        logging.info(f"No clear sky counters stored for {fname}; processing all items")
+
+    da_sat = get_satellite_data(
+        shp=shp,
+        path=path,
+        row=row,
+        tile_id=tile_id,
+        sensor=sensor,
+        time_range=time_range,
+        bands=bands,
+        chunks=chunks,
+        mask_water=mask_water,
+        prune_items=prune_items,
+        clip_buffer=buffer,
+    )
+    if not (store_counts or update):
+        da_csp = compute_clear_sky_percentage(
+            da_sat, time_batch_size=time_batch_size, group=group
+        )
+        return store_clear_sky_percentage(
+            da_csp=da_csp,
+            path=path,
+            row=row,
+            tile_id=tile_id,
+            sensor=sensor,
+            output_template=output_template,
+            buffer=buffer,
+            cog_profile=cog_profile,
+        )
+
+    ds_counts = compute_clear_sky_counts(da_sat, time_batch_size=time_batch_size)
+    return _store_clear_sky_outputs(
+        ds_counts,
+        da_sat.attrs["stac_item_ids"],
+        path=path,
+        row=row,
+        tile_id=tile_id,
+        sensor=sensor,
+        output_template=output_template,
+        buffer=buffer,
+        cog_profile=cog_profile,
+    )
+
+
+def _update_clear_sky_outputs(
+    shp: "geopandas.GeoDataFrame",
+    stored: "tuple[xarray.Dataset, set[str]]",
+    path: int | None,
+    row: int | None,
+    tile_id: str | None,
+    sensor: Sensor,
+    time_range: str,
+    bands: List[str] | None,
+    chunks: dict,
+    mask_water: bool,
+    output_template: str,
+    buffer: int,
+    time_batch_size: int | None,
+    prune_items: bool,
+    cog_profile: str | Mapping[str, Any],
+) -> str:
+    """Add the counts of unseen items to stored counters and rewrite the outputs."""
+    ds_stored, seen_ids = stored
+    fname = format_output_path(output_template, sensor, path, row, tile_id)
+    if ds_stored.attrs.get("sensor") != sensor:
+        raise ValueError(
+            f"Clear sky counters for {fname} were computed for sensor "
+            f"'{ds_stored.attrs.get('sensor')}', not '{sensor}'"
+        )
+
+    items = search_satellite_items(
+        shp=shp,
+        path=path,
+        row=row,
+        tile_id=tile_id,
+        sensor=sensor,
+        time_range=time_range,
+        # Cached results would hide the scenes published since they were cached.
+        refresh=True,
+    )
+    new_items = [item for item in items if item.id not in seen_ids]
+    if not new_items:
+        logging.info(f"No new items for {fname}; outputs are up to date")
+        return fname
+
+    logging.info(f"Adding {len(new_items)} new items to the counters of {fname}")
     da_sat = get_satellite_data(
         shp=shp,
         path=path,
@@ -425,19 +1595,56 @@ def run_clear_sky_pipeline(
         bands=bands,
         chunks=chunks,
         mask_water=mask_water,
+        prune_items=prune_items,
+        items=new_items,
+        like=ds_stored["valid"],
+        clip_buffer=buffer,
     )
-    da_csp = compute_clear_sky_percentage(da_sat)
-    return store_clear_sky_percentage(
-        da_csp=da_csp,
+    ds_new = compute_clear_sky_counts(da_sat, time_batch_size=time_batch_size)
+    return _store_clear_sky_outputs(
+        add_clear_sky_counts(ds_stored, ds_new),
+        seen_ids | set(da_sat.attrs["stac_item_ids"]),
         path=path,
         row=row,
         tile_id=tile_id,
         sensor=sensor,
         output_template=output_template,
         buffer=buffer,
+        cog_profile=cog_profile,
     )
 
 
+def _store_clear_sky_outputs(
+    ds_counts: "xarray.Dataset",
+    item_ids: Iterable[str],
+    path: int | None,
+    row: int | None,
+    tile_id: str | None,
+    sensor: Sensor,
+    output_template: str,
+    buffer: int,
+    cog_profile: str | Mapping[str, Any],
+) -> str:
+    """Store the percentage COG and the counters it was derived from."""
+    # Both outputs read the counters, which may be read lazily from the file being
+    # replaced, so they are computed once before anything is written.
+    ds_counts = ds_counts.persist()
+    fname = store_clear_sky_percentage(
+        da_csp=clear_sky_percentage_from_counts(ds_counts),
+        path=path,
+        row=row,
+        tile_id=tile_id,
+        sensor=sensor,
+        output_template=output_template,
+        buffer=buffer,
+        cog_profile=cog_profile,
+    )
+    # Written last: if the run stops before this, the next update recounts the
+    # new items instead of counting them twice.
+    store_clear_sky_counts(ds_counts, fname, item_ids)
+    return fname
+
+
 def get_jrc_surface_water(
     shp: "geopandas.GeoDataFrame",
     bands: List[str] = ["occurrence"],
@@ -455,17 +1662,10 @@ def get_jrc_surface_water(
     Returns:
         An xarray Dataset containing the requested JRC Global Surface Water data.
     """
-    catalog = pystac_client.Client.open(
-        PLANETARY_COMPUTER_CATALOG_URL,
-        modifier=planetary_computer.sign_inplace,
-    )
-
-    search = catalog.search(
+    items = search_stac_items(
         collections=["jrc-gsw"],
         intersects=shp.union_all(),
     )
-
-    items = search.item_collection()
     logging.info(f"Found {len(items)} JRC items")
 
     return odc.stac.stac_load(
@@ -0,0 +1,282 @@
+"""Cloud Optimized GeoTIFF creation profiles and writer."""
+
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+from typing import Any, Mapping
+
+import fsspec
+import rasterio
+import rasterio.warp
+import rioxarray  # noqa: F401
+import xarray
+
+# Ground resolution (m/px) of Web Mercator zoom 0 at the equator, for 256 px tiles.
+WEB_MERCATOR_ZOOM0_RESOLUTION = 156543.03392804097
+# The frontend opens at zoom 5, so overviews go down to that zoom by default.
+DEFAULT_MIN_ZOOM = 5
+DEFAULT_COG_PROFILE = "deflate"
+COG_BLOCK_SIZES = (256, 512)
+# Footprint sidecars are stored next to each COG, with this suffix replacing the
+# extension, so mosaics can be built without reading COG headers.
+FOOTPRINT_SUFFIX = "_footprint.json"
+TILE_SIZE = 256
+MAX_ZOOM = 24
+CHECKSUM_BLOCK_SIZE = 2**20
+
+# Options shared by every profile. Lower-case keys are passed to GDAL's COG driver
+# as creation options; min_zoom is turned into an overview count.
+COMMON_COG_OPTIONS: dict[str, Any] = {
+    "blocksize": 512,
+    "overview_resampling": "average",
+    "min_zoom": DEFAULT_MIN_ZOOM,
+    "bigtiff": "IF_SAFER",
+    "num_threads": "ALL_CPUS",
+}
+COG_PROFILES: dict[str, dict[str, Any]] = {
+    "deflate": {"compress": "DEFLATE", "level": 6, "predictor": "YES"},
+    "zstd": {"compress": "ZSTD", "level": 9, "predictor": "YES"},
+    # LERC with a zero error bound is lossless for integer bands.
+    "lerc": {"compress": "LERC_ZSTD", "max_z_error": 0},
+}
+
+
+def resolve_cog_profile(profile: str | Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Resolve a COG profile name or mapping into writer options.
+
+    Args:
+        profile: A name from COG_PROFILES, or a mapping of option overrides. A
+            mapping may name its base profile under ``"profile"``; otherwise it
+            extends DEFAULT_COG_PROFILE. Overrides set to None remove the option.
+
+    Returns:
+        The merged options, including ``min_zoom``.
+
+    Raises:
+        ValueError: If the profile is unknown or the block size is unsupported.
+    """
+    overrides = {} if isinstance(profile, str) else dict(profile)
+    name = profile if isinstance(profile, str) else overrides.pop("profile", None)
+    name = name or DEFAULT_COG_PROFILE
+    if name not in COG_PROFILES:
+        supported_profiles = ", ".join(COG_PROFILES)
+        raise ValueError(
+            f"Unsupported COG profile '{name}'. Use one of: {supported_profiles}"
+        )
+
+    options = {**COMMON_COG_OPTIONS, **COG_PROFILES[name], **overrides}
+    options = {key: value for key, value in options.items() if value is not None}
+    if int(options.get("blocksize", 512)) not in COG_BLOCK_SIZES:
+        raise ValueError(f"COG block size must be one of {COG_BLOCK_SIZES}")
+    return options
+
+
+def overview_count_for_zoom(resolution: float, min_zoom: int) -> int:
+    """
+    Return the number of overview levels needed to serve tiles down to a zoom.
+
+    Each overview halves the resolution; levels are added until one is about as
+    coarse as a Web Mercator tile at ``min_zoom``, so TiTiler never reads the full
+    resolution image for low-zoom tiles and no level is coarser than needed.
+
+    Args:
+        resolution: The native pixel size in metres.
+        min_zoom: The lowest zoom level that will be requested.
+    """
+    zoom_resolution = WEB_MERCATOR_ZOOM0_RESOLUTION / 2**min_zoom
+    return max(0, math.floor(math.log2(zoom_resolution / resolution)))
+
+
+def cog_creation_options(
+    profile: str | Mapping[str, Any] = DEFAULT_COG_PROFILE,
+    resolution: float | None = None,
+) -> dict[str, Any]:
+    """
+    Build GDAL COG driver creation options for a profile.
+
+    Args:
+        profile: A COG profile. See resolve_cog_profile().
+        resolution: The native pixel size in metres, used to derive the overview
+            count from ``min_zoom``. When None, GDAL picks the overview count.
+
+    Returns:
+        Keyword arguments for ``rio.to_raster(..., driver="COG")``.
+    """
+    options = resolve_cog_profile(profile)
+    min_zoom = options.pop("min_zoom", None)
+    if min_zoom is not None and resolution and "overviews" not in options:
+        overview_count = overview_count_for_zoom(resolution, int(min_zoom))
+        if overview_count == 0:
+            options["overviews"] = "NONE"
+        else:
+            options["overview_count"] = overview_count
+    return options
+
+
+def zoom_for_resolution(resolution: float) -> int:
+    """
+    Return the Web Mercator zoom level matching a pixel size in metres.
+
+    Like rio-tiler, this picks the first zoom at least as fine as ``resolution``,
+    or the one before it when that is closer.
+    """
+    for zoom in range(MAX_ZOOM + 1):
+        zoom_resolution = WEB_MERCATOR_ZOOM0_RESOLUTION / 2**zoom
+        if resolution >= zoom_resolution * (1 - 1e-8):
+            break
+    if zoom > 0 and not math.isclose(resolution, zoom_resolution, rel_tol=1e-8):
+        if (zoom_resolution * 2) / resolution < resolution / zoom_resolution:
+            zoom -= 1
+    return zoom
+
+
+def cog_zoom_range(src: "rasterio.io.DatasetReader") -> tuple[int, int]:
+    """
+    Return the Web Mercator zoom range a raster is served at.
+
+    Mirrors rio-tiler's Reader.minzoom and Reader.maxzoom: the maximum zoom
+    matches the native resolution and the minimum zoom that of the coarsest
+    overview still at least one tile wide.
+    """
+    transform, width, height = rasterio.warp.calculate_default_transform(
+        src.crs, "EPSG:3857", src.width, src.height, *src.bounds
+    )
+    resolution = max(abs(transform.a), abs(transform.e))
+    overview_level = 0
+    while min(width, height) // 2**overview_level > TILE_SIZE:
+        overview_level += 1
+    return (
+        zoom_for_resolution(resolution * 2**overview_level),
+        zoom_for_resolution(resolution),
+    )
+
+
+def is_local(path: str) -> bool:
+    """Return whether a path points at the local filesystem."""
+    return "://" not in path or path.startswith("file://")
+
+
+def compute_checksum(path: str) -> str | None:
+    """
+    Compute the SHA-256 checksum of a local file or fsspec URI.
+
+    Returns:
+        The checksum as ``"sha256:<hex>"``, or None if the file does not exist.
+    """
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    if not fs.exists(fs_path):
+        return None
+
+    digest = hashlib.sha256()
+    with fs.open(fs_path, "rb") as f:
+        while block := f.read(CHECKSUM_BLOCK_SIZE):
+            digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def get_footprint_path(fname: str) -> str:
+    """Return the footprint sidecar path of a COG."""
+    return os.path.splitext(fname)[0] + FOOTPRINT_SUFFIX
+
+
+def read_footprint(local_path: str, fname: str) -> dict[str, Any]:
+    """
+    Describe a written COG as a GeoJSON feature.
+
+    The geometry is the WGS84 bounding box. Properties hold the published path,
+    the native CRS and bounds, the zoom range, the file checksum and the creation
+    time, as expected by the mosaic API.
+
+    Args:
+        local_path: The COG on the local filesystem.
+        fname: The path or URI the COG is published at.
+    """
+    with rasterio.open(local_path) as src:
+        minx, miny, maxx, maxy = rasterio.warp.transform_bounds(
+            src.crs, "EPSG:4326", *src.bounds, densify_pts=21
+        )
+        minzoom, maxzoom = cog_zoom_range(src)
+        crs = src.crs.to_string()
+        bounds = list(src.bounds)
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [
+                [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+            ],
+        },
+        "properties": {
+            "path": fname,
+            "crs": crs,
+            "bounds": bounds,
+            "minzoom": minzoom,
+            "maxzoom": maxzoom,
+            "checksum": compute_checksum(local_path),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+    }
+
+
+def write_footprint(local_path: str, fname: str) -> str:
+    """
+    Store the footprint sidecar of a COG. See read_footprint().
+
+    Returns:
+        The sidecar path or URI.
+    """
+    footprint = read_footprint(local_path, fname)
+    footprint_path = get_footprint_path(fname)
+    with fsspec.open(footprint_path, "w", encoding="utf-8") as f:
+        json.dump(footprint, f)
+    return footprint_path
+
+
+def write_cog(
+    da: "xarray.DataArray",
+    fname: str,
+    profile: str | Mapping[str, Any] = DEFAULT_COG_PROFILE,
+    footprint: bool = False,
+) -> str:
+    """
+    Write a DataArray as a COG to a local path or fsspec URI.
+
+    Remote outputs (e.g. ``gs://``) are written to a local temporary file first
+    and then uploaded in one transfer, instead of through GDAL's network writer.
+
+    Args:
+        da: The raster to write, with CRS and transform set.
+        fname: A local path or fsspec URI.
+        profile: A COG profile. See resolve_cog_profile().
+        footprint: Whether to store a footprint sidecar next to the COG, after
+            the COG itself. See write_footprint().
+
+    Returns:
+        The output path or URI.
+    """
+    crs = da.rio.crs
+    resolution = abs(da.rio.resolution()[0]) if crs and crs.is_projected else None
+    options = cog_creation_options(profile, resolution=resolution)
+
+    if is_local(fname):
+        local_path = fname.removeprefix("file://")
+        da.rio.to_raster(local_path, driver="COG", **options)
+        if footprint:
+            write_footprint(local_path, fname)
+        return fname
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, os.path.basename(fname))
+        da.rio.to_raster(tmp_path, driver="COG", **options)
+        fs, fs_path = fsspec.core.url_to_fs(fname)
+        fs.put_file(tmp_path, fs_path)
+        logging.debug(f"Uploaded {tmp_path} to {fname}")
+        if footprint:
+            write_footprint(tmp_path, fname)
+    return fname
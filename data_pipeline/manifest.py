@@ -0,0 +1,161 @@
+"""Run manifest recording completed tile outputs for resumable batch runs."""
+
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any
+
+import fsspec
+
+from data_pipeline.clear_sky import SENSOR_CONFIGS, Sensor
+from data_pipeline.cog import compute_checksum, is_local
+
+MANIFEST_VERSION = 1
+# Pipeline arguments that change the contents of a tile output. Chunking and time
+# batching only change how the result is computed, so they are left out.
+RESULT_PARAMS = (
+    "sensor",
+    "time_range",
+    "bands",
+    "mask_water",
+    "buffer",
+    "prune_items",
+    "output_template",
+    "store_counts",
+    "group",
+    "cog_profile",
+)
+# Object metadata that changes whenever a remote output is rewritten, in order of
+# preference: content hashes (GCS md5Hash and crc32c, S3 ETag), then the GCS
+# generation of objects stored without a hash.
+REMOTE_CHECKSUM_FIELDS = ("md5Hash", "crc32c", "ETag", "generation")
+
+
+def make_params_hash(pipeline_kwargs: dict[str, Any]) -> str:
+    """
+    Hash the pipeline arguments that determine a tile's output.
+
+    Args:
+        pipeline_kwargs: Keyword arguments passed to run_clear_sky_pipeline().
+
+    Returns:
+        A short hexadecimal digest.
+    """
+    params = {name: pipeline_kwargs.get(name) for name in RESULT_PARAMS}
+    # run_clear_sky_pipeline() defaults to Landsat when no sensor is given.
+    sensor: Sensor = pipeline_kwargs.get("sensor") or "landsat"
+    sensor_config = SENSOR_CONFIGS.get(sensor, {})
+    params["clear_sky_flags"] = sensor_config.get("clear_sky_flags")
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def output_checksum(path: str) -> str | None:
+    """
+    Identify the current contents of a tile output.
+
+    Local files are hashed with compute_checksum(). Remote objects (e.g. ``gs://``)
+    are identified by the metadata in REMOTE_CHECKSUM_FIELDS, so checking whether a
+    tile is up to date does not download its COG. Objects without any of these
+    fields are hashed in full.
+
+    Returns:
+        The checksum as ``"<kind>:<value>"``, or None if the file does not exist.
+    """
+    if is_local(path):
+        return compute_checksum(path)
+
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    try:
+        info = fs.info(fs_path)
+    except FileNotFoundError:
+        return None
+    for field in REMOTE_CHECKSUM_FIELDS:
+        if info.get(field):
+            return f"{field}:{info[field]}"
+    return compute_checksum(path)
+
+
+def load_manifest(path: str) -> dict[str, Any]:
+    """
+    Load a run manifest, or return an empty one if it does not exist yet.
+
+    Args:
+        path: A local path or fsspec URI.
+    """
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    if not fs.exists(fs_path):
+        return {"version": MANIFEST_VERSION, "tiles": {}}
+
+    with fs.open(fs_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(
+            f"Unsupported manifest version {manifest.get('version')} in {path}"
+        )
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict[str, Any]) -> str:
+    """
+    Store a run manifest. Local manifests are replaced atomically.
+
+    Args:
+        path: A local path or fsspec URI.
+        manifest: The manifest to store.
+
+    Returns:
+        The path or URI of the stored manifest.
+    """
+    if is_local(path):
+        path = path.removeprefix("file://")
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return path
+
+    with fsspec.open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return path
+
+
+def is_up_to_date(manifest: dict[str, Any], tile_key: str, params_hash: str) -> bool:
+    """
+    Return whether a tile's recorded output can be reused.
+
+    A tile is up to date when it was completed with the same parameters and its
+    output still exists with the recorded checksum. See output_checksum().
+    """
+    entry = manifest["tiles"].get(tile_key)
+    if entry is None or entry["params_hash"] != params_hash:
+        return False
+    return output_checksum(entry["output"]) == entry["checksum"]
+
+
+def record_tile(
+    manifest: dict[str, Any],
+    tile_key: str,
+    params_hash: str,
+    output: str,
+    checksum: str,
+) -> dict[str, Any]:
+    """
+    Record a completed tile output in the manifest.
+
+    Returns:
+        The new manifest entry.
+    """
+    entry = {
+        "params_hash": params_hash,
+        "output": output,
+        "checksum": checksum,
+        "completed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    manifest["tiles"][tile_key] = entry
+    return entry
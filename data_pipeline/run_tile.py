@@ -1,17 +1,72 @@
-"""Command-line entry point for running a clear-sky pipeline job for one tile."""
+"""Command-line entry point for clear-sky pipeline jobs on one or more tiles."""
 
 from __future__ import annotations
 
 import argparse
 import logging
 import os
+import time
+from collections import Counter
 from collections.abc import Sequence
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from typing import Any
 
-from data_pipeline.clear_sky import run_clear_sky_pipeline
+import geopandas
+
+from data_pipeline import cog, manifest
+from data_pipeline.clear_sky import format_satellite_tile_key, run_clear_sky_pipeline
+from data_pipeline.shapefiles import (
+    build_grid_store,
+    get_intersecting_mgrs_tiles,
+    get_intersecting_wrs2_tiles,
+)
 
 DEFAULT_TIME_RANGE = "2020-01-01/2020-12-31"
+# COGs are multi-band uint16 (percentage and valid-observation count), but keep the
+# legacy "_uint8" suffix: existing outputs and mosaics use it, and the API finds COGs
+# by it (api.main.DEFAULT_GLOB_PATTERN).
 DEFAULT_OUTPUT_TEMPLATE = "gs://my-bucket/cogs/{tile_key}_uint8.tif"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+
+def parse_group(value: str) -> str | dict[str, list[int]]:
+    """
+    Parse a --group value into a run_clear_sky_pipeline() period grouping.
+
+    Accepts "month", "season", or custom bins of months such as
+    "wet=5,6,7,8;dry=11,12,1,2".
+    """
+    if value in ("month", "season"):
+        return value
+
+    bins = {}
+    for part in value.split(";"):
+        label, separator, months = part.partition("=")
+        try:
+            if not separator or not label.strip():
+                raise ValueError(part)
+            bins[label.strip()] = [int(month) for month in months.split(",")]
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"Invalid group '{value}'; use month, season or LABEL=M,M;LABEL=M,M"
+            ) from None
+    return bins
+
+
+def parse_cog_option(value: str) -> tuple[str, Any]:
+    """Parse a --cog-option KEY=VALUE pair, converting integer values."""
+    key, separator, option = value.partition("=")
+    if not separator or not key.strip():
+        raise argparse.ArgumentTypeError(
+            f"Invalid COG option '{value}'; expected KEY=VALUE, e.g. blocksize=256"
+        )
+    option = option.strip()
+    return key.strip().lower(), int(option) if option.isdigit() else option
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -67,11 +122,113 @@ def build_parser() -> argparse.ArgumentParser:
         default=512,
         help="Dask chunk size for the y dimension.",
     )
+    parser.add_argument(
+        "--time-batch-size",
+        type=int,
+        help=(
+            "Stream scenes through the reduction in batches of this size so peak "
+            "memory does not grow with the number of scenes."
+        ),
+    )
+    parser.add_argument(
+        "--prune-items",
+        action="store_true",
+        help=(
+            "Drop duplicate and barely overlapping scenes, and count fully cloudy "
+            "scenes as cloudy without reading their pixels."
+        ),
+    )
+    parser.add_argument(
+        "--group",
+        type=parse_group,
+        help=(
+            "Store one clear-sky band per period, computed in a single read: month, "
+            "season, or custom bins of months such as 'wet=5,6,7,8;dry=11,12,1,2'."
+        ),
+    )
+    parser.add_argument(
+        "--store-counts",
+        action="store_true",
+        help=(
+            "Store per-pixel clear and valid counters and the counted STAC item IDs "
+            "next to the output, so later runs can use --update."
+        ),
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help=(
+            "Load only STAC items not counted yet, add them to the stored counters "
+            "and rewrite the output. Tiles without stored counters are processed "
+            "in full."
+        ),
+    )
+    parser.add_argument(
+        "--cog-profile",
+        choices=list(cog.COG_PROFILES),
+        default=cog.DEFAULT_COG_PROFILE,
+        help="Output COG compression profile.",
+    )
+    parser.add_argument(
+        "--cog-option",
+        type=parse_cog_option,
+        action="append",
+        default=[],
+        help=(
+            "Override a COG profile option, e.g. blocksize=256, level=12, "
+            "predictor=NO or min_zoom=7. May be repeated."
+        ),
+    )
     parser.add_argument(
         "--no-mask-water",
         action="store_true",
         help="Disable JRC surface-water masking.",
     )
+    batch = parser.add_argument_group(
+        "batch mode",
+        "Process many tiles in one invocation. Any of these options enables batch "
+        "mode, in which --path, --row, --tile-id and --aoi-geojson are ignored and "
+        "each tile is clipped to its own footprint.",
+    )
+    batch.add_argument(
+        "--tiles",
+        help=(
+            "Comma-separated tiles: PATH/ROW for Landsat (e.g. 233/087,233/088) or "
+            "MGRS IDs for Sentinel-2 (e.g. T19HCD,T19HCC)."
+        ),
+    )
+    batch.add_argument(
+        "--tiles-file",
+        help="Text file with one tile per line, in the same format as --tiles.",
+    )
+    batch.add_argument(
+        "--tiles-aoi",
+        help="AOI path readable by GeoPandas; process every tile intersecting it.",
+    )
+    batch.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of tiles processed concurrently.",
+    )
+    batch.add_argument(
+        "--executor",
+        choices=["process", "dask"],
+        default="process",
+        help=(
+            "Run tiles in local worker processes, or in threads sharing one Dask "
+            "client connected through DASK_SCHEDULER_ADDRESS."
+        ),
+    )
+    batch.add_argument(
+        "--manifest",
+        help=(
+            "Run manifest path or URI. Completed tiles are recorded with a parameter "
+            "hash and output checksum; tiles whose output still matches are skipped, "
+            "so an interrupted run resumes where it stopped. With --update, tiles are "
+            "never skipped."
+        ),
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -81,8 +238,22 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def is_batch(args: argparse.Namespace) -> bool:
+    """Return whether the arguments request batch mode."""
+    return bool(args.tiles or args.tiles_file or args.tiles_aoi)
+
+
 def validate_args(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
     """Validate sensor-specific arguments."""
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.group is not None and (args.store_counts or args.update):
+        parser.error("--group cannot be combined with --store-counts or --update")
+
+    if is_batch(args):
+        return
+
     if args.sensor == "landsat" and (args.path is None or args.row is None):
         parser.error("--path and --row are required when --sensor=landsat")
 
@@ -103,12 +274,37 @@ def connect_dask_from_env() -> Any | None:
     return Client(scheduler_address)
 
 
+def pipeline_kwargs(args: argparse.Namespace) -> dict[str, Any]:
+    """Build run_clear_sky_pipeline() arguments shared by every tile."""
+    return {
+        "sensor": args.sensor,
+        "time_range": args.time_range,
+        "bands": None,
+        "chunks": {"x": args.chunk_x, "y": args.chunk_y},
+        "mask_water": not args.no_mask_water,
+        "output_template": args.output_template,
+        "buffer": args.buffer,
+        "time_batch_size": args.time_batch_size,
+        "prune_items": args.prune_items,
+        "store_counts": args.store_counts,
+        "update": args.update,
+        "group": args.group,
+        "cog_profile": (
+            {"profile": args.cog_profile, **dict(args.cog_option)}
+            if args.cog_option
+            else args.cog_profile
+        ),
+    }
+
+
+def configure_logging(log_level: str) -> None:
+    """Configure process-wide logging for pipeline jobs."""
+    logging.basicConfig(level=getattr(logging, log_level), format=LOG_FORMAT)
+
+
 def run_from_args(args: argparse.Namespace) -> str:
     """Run the pipeline from parsed CLI arguments."""
-    logging.basicConfig(
-        level=getattr(logging, args.log_level),
-        format="%(asctime)s %(levelname)s %(message)s",
-    )
+    configure_logging(args.log_level)
 
     client = connect_dask_from_env()
     try:
@@ -116,14 +312,8 @@ def run_from_args(args: argparse.Namespace) -> str:
             path=args.path,
             row=args.row,
             tile_id=args.tile_id,
-            sensor=args.sensor,
             aoi_geojson=args.aoi_geojson,
-            time_range=args.time_range,
-            bands=None,
-            chunks={"x": args.chunk_x, "y": args.chunk_y},
-            mask_water=not args.no_mask_water,
-            output_template=args.output_template,
-            buffer=args.buffer,
+            **pipeline_kwargs(args),
         )
         logging.info("Pipeline completed: %s", output_path)
         return output_path
@@ -132,11 +322,224 @@ def run_from_args(args: argparse.Namespace) -> str:
             client.close()
 
 
+def parse_tile(sensor: str, value: str) -> dict[str, Any]:
+    """
+    Parse one tile identifier into run_clear_sky_pipeline() tile arguments.
+
+    Landsat tiles are written as PATH/ROW or PATH_ROW, and Sentinel-2 tiles as MGRS
+    IDs with or without the leading "T".
+
+    Raises:
+        ValueError: If a Landsat tile is not a PATH/ROW pair.
+    """
+    value = value.strip()
+    if sensor == "landsat":
+        parts = value.replace("_", "/").split("/")
+        if len(parts) != 2 or not all(part.strip().isdigit() for part in parts):
+            raise ValueError(
+                f"Invalid Landsat tile '{value}'; expected PATH/ROW, e.g. 233/087"
+            )
+        return {"path": int(parts[0]), "row": int(parts[1]), "tile_id": None}
+
+    return {"path": None, "row": None, "tile_id": value}
+
+
+def resolve_batch_tiles(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Collect the tiles requested by --tiles, --tiles-file and --tiles-aoi."""
+    values = args.tiles.split(",") if args.tiles else []
+    if args.tiles_file:
+        with open(args.tiles_file) as f:
+            values.extend(line for line in f if not line.lstrip().startswith("#"))
+
+    tiles = [parse_tile(args.sensor, value) for value in values if value.strip()]
+
+    if args.tiles_aoi:
+        aoi = geopandas.read_file(args.tiles_aoi)
+        if args.sensor == "landsat":
+            grid = get_intersecting_wrs2_tiles(aoi)
+            tiles.extend(
+                {"path": int(path), "row": int(row), "tile_id": None}
+                for path, row in zip(grid["PATH"], grid["ROW"])
+            )
+        else:
+            grid = get_intersecting_mgrs_tiles(aoi)
+            tiles.extend(
+                {"path": None, "row": None, "tile_id": tile_id}
+                for tile_id in grid["Name"]
+            )
+
+    unique_tiles: dict[str, dict[str, Any]] = {}
+    for tile in tiles:
+        unique_tiles.setdefault(format_satellite_tile_key(args.sensor, **tile), tile)
+    return list(unique_tiles.values())
+
+
+def run_tile_job(
+    tile: dict[str, Any], kwargs: dict[str, Any], checksum: bool = False
+) -> dict[str, Any]:
+    """
+    Run the pipeline for one tile and report the outcome instead of raising.
+
+    Args:
+        tile: The tile arguments from parse_tile().
+        kwargs: Pipeline arguments from pipeline_kwargs().
+        checksum: Whether to checksum the output, for recording in a manifest.
+
+    Returns:
+        A result record with the tile key, status ("ok" or "failed"), elapsed
+        seconds, the output path or error message, and the output checksum.
+    """
+    tile_key = format_satellite_tile_key(kwargs["sensor"], **tile)
+    start = time.perf_counter()
+    output_checksum = None
+    try:
+        detail = run_clear_sky_pipeline(aoi_geojson=None, **tile, **kwargs)
+        if checksum:
+            output_checksum = manifest.output_checksum(detail)
+        status = "ok"
+    except Exception as e:
+        logging.exception("Tile %s failed", tile_key)
+        detail = str(e)
+        status = "failed"
+
+    return {
+        "tile_key": tile_key,
+        "status": status,
+        "seconds": time.perf_counter() - start,
+        "detail": detail,
+        "checksum": output_checksum,
+    }
+
+
+def _make_executor(args: argparse.Namespace) -> Executor:
+    """Create the tile executor selected on the command line."""
+    if args.executor == "dask":
+        # Threads share the process-wide Dask client, catalog client and grid index.
+        return ThreadPoolExecutor(max_workers=args.workers)
+
+    return ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=configure_logging,
+        initargs=(args.log_level,),
+    )
+
+
+def run_batch(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """
+    Run the pipeline for every requested tile and collect per-tile results.
+
+    With --manifest, tiles whose recorded output is up to date are skipped, and
+    every completed tile is recorded as soon as it finishes.
+    """
+    configure_logging(args.log_level)
+    tiles = resolve_batch_tiles(args)
+    kwargs = pipeline_kwargs(args)
+    tile_keys = [format_satellite_tile_key(args.sensor, **tile) for tile in tiles]
+
+    run_manifest = manifest.load_manifest(args.manifest) if args.manifest else None
+    params_hash = manifest.make_params_hash(kwargs)
+    results = []
+    pending = []
+    for tile, tile_key in zip(tiles, tile_keys):
+        # Updates look for new scenes, so an up-to-date output is not a reason to skip.
+        if (
+            run_manifest is not None
+            and not args.update
+            and manifest.is_up_to_date(run_manifest, tile_key, params_hash)
+        ):
+            logging.info("Skipping %s; recorded output is up to date", tile_key)
+            output = run_manifest["tiles"][tile_key]["output"]
+            results.append(_skipped_result(tile_key, output))
+        else:
+            pending.append(tile)
+    logging.info(
+        "Processing %d %s tiles (%d up to date)",
+        len(pending),
+        args.sensor,
+        len(results),
+    )
+
+    def record(result: dict[str, Any]) -> None:
+        results.append(result)
+        if run_manifest is not None and result["status"] == "ok":
+            manifest.record_tile(
+                run_manifest,
+                result["tile_key"],
+                params_hash,
+                result["detail"],
+                result["checksum"],
+            )
+            manifest.save_manifest(args.manifest, run_manifest)
+
+    # Build the on-disk grid store once so workers only read it.
+    build_grid_store()
+
+    checksum = run_manifest is not None
+    client = connect_dask_from_env() if args.executor == "dask" else None
+    try:
+        if args.workers == 1:
+            for tile in pending:
+                record(run_tile_job(tile, kwargs, checksum))
+        else:
+            with _make_executor(args) as executor:
+                futures = [
+                    executor.submit(run_tile_job, tile, kwargs, checksum)
+                    for tile in pending
+                ]
+                for future in as_completed(futures):
+                    record(future.result())
+    finally:
+        if client is not None:
+            client.close()
+
+    order = {tile_key: i for i, tile_key in enumerate(tile_keys)}
+    return sorted(results, key=lambda result: order[result["tile_key"]])
+
+
+def _skipped_result(tile_key: str, output: str) -> dict[str, Any]:
+    """Build the result record of a tile skipped by the manifest."""
+    return {
+        "tile_key": tile_key,
+        "status": "skipped",
+        "seconds": 0.0,
+        "detail": output,
+        "checksum": None,
+    }
+
+
+def format_summary(results: Sequence[dict[str, Any]]) -> str:
+    """Format per-tile batch results as a plain-text table."""
+    headers = ("tile", "status", "seconds", "output / error")
+    rows = [
+        (r["tile_key"], r["status"], f"{r['seconds']:.1f}", str(r["detail"]))
+        for r in results
+    ]
+    widths = [max(len(value) for value in column) for column in zip(headers, *rows)]
+
+    def format_row(row: Sequence[str]) -> str:
+        return "  ".join(value.ljust(width) for value, width in zip(row, widths))
+
+    lines = [format_row(headers), format_row(["-" * width for width in widths])]
+    lines.extend(format_row(row) for row in rows)
+    counts = Counter(r["status"] for r in results)
+    lines.append(
+        f"{counts['ok']} succeeded, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed"
+    )
+    return "\n".join(line.rstrip() for line in lines)
+
+
 def main(argv: Sequence[str] | None = None) -> int:
     """Run the CLI."""
     parser = build_parser()
     args = parser.parse_args(argv)
     validate_args(args, parser)
+
+    if is_batch(args):
+        results = run_batch(args)
+        print(format_summary(results))
+        return 1 if any(r["status"] == "failed" for r in results) else 0
+
     run_from_args(args)
     return 0
 
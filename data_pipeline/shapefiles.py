@@ -2,6 +2,7 @@
 Sentinel-2 MGRS tiling grid, and the boundary of Chile.
 """
 
+import functools
 import io
 import os
 import zipfile
@@ -24,6 +25,12 @@ MGRS_TILE_ID_COLUMN = "Name"
 # KML layer that contains the 100 km × 100 km Sentinel-2 tiles.
 MGRS_KML_LAYER = "Features"
 
+# Local GeoParquet store for the tiling grids, overridable for batch workers.
+GRID_CACHE_DIR_ENV = "PARCELAS_GRID_CACHE_DIR"
+DEFAULT_GRID_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "parcelas")
+WRS2_STORE_NAME = "wrs2_descending"
+MGRS_STORE_NAME = "mgrs_s2"
+
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -33,9 +40,64 @@ HEADERS = {
 }
 
 
+def get_grid_cache_dir() -> str:
+    """Returns the directory of the local tile-grid store."""
+    return os.environ.get(GRID_CACHE_DIR_ENV) or DEFAULT_GRID_CACHE_DIR
+
+
+def _load_grid_store(name: str, download) -> gpd.GeoDataFrame:
+    """
+    Loads a tiling grid from the local GeoParquet store, building it on first use.
+
+    Args:
+        name: The store name, used as the GeoParquet file name.
+        download: A callable that downloads and parses the grid.
+
+    Returns:
+        A GeoDataFrame containing the grid.
+    """
+    path = os.path.join(get_grid_cache_dir(), f"{name}.parquet")
+    if os.path.exists(path):
+        return gpd.read_parquet(path)
+
+    gdf = download()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    gdf.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return gdf
+
+
+def clear_grid_cache() -> None:
+    """Drops the in-process tile-grid indexes, e.g. after rebuilding the store."""
+    _wrs2_index.cache_clear()
+    _mgrs_index.cache_clear()
+
+
+def build_grid_store() -> None:
+    """Builds the local WRS-2 and MGRS grid stores and warms the in-process indexes."""
+    _wrs2_index()
+    _mgrs_index()
+
+
 def get_wrs2_grid():
-    """Returns a GeoDataFrame containing the WRS-2 grid."""
-    return gpd.read_file(URL_WRS2_GRID)
+    """
+    Returns a GeoDataFrame containing the WRS-2 grid.
+
+    The grid is downloaded once and kept in the local GeoParquet store.
+    """
+    return _load_grid_store(WRS2_STORE_NAME, lambda: gpd.read_file(URL_WRS2_GRID))
+
+
+@functools.lru_cache(maxsize=None)
+def _wrs2_index() -> tuple[gpd.GeoDataFrame, dict[tuple[int, int], int]]:
+    """Returns the WRS-2 grid with a (PATH, ROW) to row-position index."""
+    grid = get_wrs2_grid()
+    index = {
+        (int(path), int(row)): pos
+        for pos, (path, row) in enumerate(zip(grid["PATH"], grid["ROW"]))
+    }
+    return grid, index
 
 
 def download_wrs2_grid(output_file: str = "wrs2_descending.geojson") -> None:
@@ -123,6 +185,38 @@ def get_chile_wrs2_tiles() -> gpd.GeoDataFrame:
     return wrs2_tiles[intersects]
 
 
+def get_intersecting_wrs2_tiles(aoi: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Returns a GeoDataFrame containing the WRS-2 tiles that intersect an area of
+    interest.
+
+    Args:
+        aoi: A GeoDataFrame containing the area of interest.
+
+    Returns:
+        A GeoDataFrame containing the intersecting WRS-2 tiles.
+    """
+    wrs2_tiles = get_wrs2_grid()
+    aoi_geom = aoi.to_crs(wrs2_tiles.crs).union_all()
+    return wrs2_tiles[wrs2_tiles.intersects(aoi_geom)]
+
+
+def get_intersecting_mgrs_tiles(aoi: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Returns a GeoDataFrame containing the Sentinel-2 MGRS tiles that intersect an
+    area of interest.
+
+    Args:
+        aoi: A GeoDataFrame containing the area of interest.
+
+    Returns:
+        A GeoDataFrame containing the intersecting MGRS tiles.
+    """
+    mgrs_tiles = get_mgrs_grid()
+    aoi_geom = aoi.to_crs(mgrs_tiles.crs).union_all()
+    return mgrs_tiles[mgrs_tiles.intersects(aoi_geom)]
+
+
 def get_wrs2_tile(path: int, row: int) -> gpd.GeoDataFrame:
     """
     Returns a GeoDataFrame containing the WRS-2 tile that corresponds to the given path
@@ -135,8 +229,9 @@ def get_wrs2_tile(path: int, row: int) -> gpd.GeoDataFrame:
     Returns:
         A GeoDataFrame containing the WRS-2 tile that corresponds to the given path and row.
     """
-    wrs2_tiles = get_wrs2_grid()
-    return wrs2_tiles[(wrs2_tiles["PATH"] == path) & (wrs2_tiles["ROW"] == row)]
+    wrs2_tiles, index = _wrs2_index()
+    pos = index.get((path, row))
+    return wrs2_tiles.iloc[[] if pos is None else [pos]]
 
 
 def _extract_mgrs_geometry(geom):
@@ -161,14 +256,19 @@ def get_mgrs_grid() -> gpd.GeoDataFrame:
     Returns a GeoDataFrame containing the Sentinel-2 MGRS tiling grid.
 
     The grid is downloaded from the NASA HLS tiling-system page (the official
-    ESA Sentinel-2 KML). The file is fetched with ``requests`` to avoid GDAL
-    network-parsing issues, and each tile's geometry is normalised to a plain
-    2-D ``Polygon`` or ``MultiPolygon``.
+    ESA Sentinel-2 KML) once and kept in the local GeoParquet store. The file is
+    fetched with ``requests`` to avoid GDAL network-parsing issues, and each
+    tile's geometry is normalised to a plain 2-D ``Polygon`` or ``MultiPolygon``.
 
     Returns:
         A GeoDataFrame with one row per 100 km × 100 km Sentinel-2 tile. The
         tile ID is stored in the ``"Name"`` column (e.g. ``"19HCD"``).
     """
+    return _load_grid_store(MGRS_STORE_NAME, _download_mgrs_grid)
+
+
+def _download_mgrs_grid() -> gpd.GeoDataFrame:
+    """Downloads and parses the Sentinel-2 MGRS KML."""
     response = requests.get(URL_MGRS_GRID, headers=HEADERS)
     response.raise_for_status()
     gdf = gpd.read_file(
@@ -205,5 +305,15 @@ def get_mgrs_tile(tile_id: str) -> gpd.GeoDataFrame:
     if not normalized:
         raise ValueError("tile_id must not be empty")
 
-    mgrs_tiles = get_mgrs_grid()
-    return mgrs_tiles[mgrs_tiles[MGRS_TILE_ID_COLUMN] == normalized]
+    mgrs_tiles, index = _mgrs_index()
+    return mgrs_tiles.iloc[index.get(normalized, [])]
+
+
+@functools.lru_cache(maxsize=None)
+def _mgrs_index() -> tuple[gpd.GeoDataFrame, dict[str, list[int]]]:
+    """Returns the MGRS grid with a tile ID to row-positions index."""
+    grid = get_mgrs_grid()
+    index: dict[str, list[int]] = {}
+    for pos, tile_id in enumerate(grid[MGRS_TILE_ID_COLUMN]):
+        index.setdefault(tile_id, []).append(pos)
+    return grid, index
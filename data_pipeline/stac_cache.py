@@ -0,0 +1,114 @@
+"""Persistent on-disk cache for STAC search results."""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+
+import planetary_computer
+import pystac
+
+# Environment variables that enable and tune the cache.
+STAC_CACHE_DIR_ENV = "STAC_CACHE_DIR"
+STAC_CACHE_TTL_ENV = "STAC_CACHE_TTL"
+# Search results are reused for a week by default; new scenes appear daily, but
+# reruns and parameter sweeps over a past year see the same catalog.
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def get_cache_dir() -> str | None:
+    """Return the configured cache directory, or None when caching is disabled."""
+    return os.environ.get(STAC_CACHE_DIR_ENV) or None
+
+
+def get_cache_ttl() -> float:
+    """Return the configured cache time-to-live in seconds."""
+    return float(os.environ.get(STAC_CACHE_TTL_ENV, DEFAULT_TTL))
+
+
+def make_cache_key(**search_kwargs: Any) -> str:
+    """
+    Build a stable cache key from STAC search arguments.
+
+    Geometries passed as ``intersects`` are reduced to a hash of their WKT, so the
+    key only depends on the collection, query, AOI and datetime actually searched.
+
+    Args:
+        **search_kwargs: Keyword arguments passed to ``Client.search``.
+
+    Returns:
+        A hexadecimal SHA-256 digest.
+    """
+    normalized = dict(search_kwargs)
+    intersects = normalized.get("intersects")
+    if intersects is not None and hasattr(intersects, "wkt"):
+        normalized["intersects"] = hashlib.sha256(
+            intersects.wkt.encode("utf-8")
+        ).hexdigest()
+
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    """Return the file that stores the search results for a cache key."""
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_cached_items(
+    cache_dir: str, key: str, ttl: float = DEFAULT_TTL
+) -> "pystac.ItemCollection | None":
+    """
+    Load cached search results and sign their asset URLs.
+
+    Args:
+        cache_dir: The local cache directory.
+        key: A cache key from make_cache_key().
+        ttl: Maximum age of a cache entry in seconds.
+
+    Returns:
+        A signed ItemCollection, or None when the entry is missing or expired.
+    """
+    path = _cache_path(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+
+    if time.time() - os.path.getmtime(path) > ttl:
+        logging.info(f"STAC cache entry {key} expired")
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        items = pystac.ItemCollection.from_dict(json.load(f))
+
+    return planetary_computer.sign(items)
+
+
+def save_cached_items(cache_dir: str, key: str, items: "pystac.ItemCollection") -> str:
+    """
+    Store search results with their SAS tokens stripped.
+
+    Tokens expire long before the cache entry does, so assets are saved unsigned
+    and signed again by load_cached_items().
+
+    Args:
+        cache_dir: The local cache directory. It is created if needed.
+        key: A cache key from make_cache_key().
+        items: The search results to store.
+
+    Returns:
+        The path of the cache file.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    unsigned = items.clone()
+    for item in unsigned:
+        for asset in item.assets.values():
+            asset.href = asset.href.split("?", 1)[0]
+
+    path = _cache_path(cache_dir, key)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(unsigned.to_dict(), f)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,97 @@
+"""Cache JRC water masks on the output grid of each tile."""
+
+import hashlib
+import os
+import tempfile
+
+import fsspec
+import numpy
+
+from data_pipeline.cog import is_local
+
+WATER_MASK_CACHE_DIR_ENV = "WATER_MASK_CACHE_DIR"
+
+
+def get_cache_dir() -> str | None:
+    """Return the configured cache directory or URI, or None when disabled."""
+    return os.environ.get(WATER_MASK_CACHE_DIR_ENV) or None
+
+
+def make_grid_key(crs_wkt: str, transform: tuple, shape: tuple[int, int]) -> str:
+    """
+    Build a cache key that identifies a raster grid.
+
+    Args:
+        crs_wkt: The grid CRS as WKT.
+        transform: The affine transform coefficients of the grid.
+        shape: The grid shape as (rows, columns).
+
+    Returns:
+        A short hexadecimal digest.
+    """
+    payload = f"{crs_wkt}|{tuple(transform)}|{tuple(shape)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _mask_path(cache_dir: str, key: str) -> str:
+    """Return the path or URI of the mask file for a grid key."""
+    return f"{cache_dir.rstrip('/')}/water_{key}.npy"
+
+
+def load_water_mask(cache_dir: str, key: str) -> "numpy.ndarray | None":
+    """
+    Load a cached boolean water mask.
+
+    Local masks are memory-mapped, so only the pages that a computation touches are
+    ever read. Remote masks (e.g. ``gs://``) are downloaded in full.
+
+    Args:
+        cache_dir: A local directory or fsspec URI.
+        key: A grid key from make_grid_key().
+
+    Returns:
+        A (rows, columns) boolean array that is True over water, or None if the
+        mask is not cached.
+    """
+    path = _mask_path(cache_dir, key)
+    if is_local(path):
+        path = path.removeprefix("file://")
+        if not os.path.exists(path):
+            return None
+        return numpy.load(path, mmap_mode="r")
+
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    if not fs.exists(fs_path):
+        return None
+    with fs.open(fs_path, "rb") as f:
+        return numpy.load(f)
+
+
+def save_water_mask(cache_dir: str, key: str, water: "numpy.ndarray") -> str:
+    """
+    Store a boolean water mask for later runs on the same grid.
+
+    Args:
+        cache_dir: A local directory or fsspec URI.
+        key: A grid key from make_grid_key().
+        water: A (rows, columns) boolean array that is True over water.
+
+    Returns:
+        The path or URI of the stored mask.
+    """
+    path = _mask_path(cache_dir, key)
+    water = numpy.ascontiguousarray(water, dtype=bool)
+
+    if is_local(path):
+        path = path.removeprefix("file://")
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            numpy.save(f, water)
+        os.replace(tmp_path, path)
+        return path
+
+    with fsspec.open(path, "wb") as f:
+        numpy.save(f, water)
+    return path
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+
+@pytest.fixture
+def reset_caches():
+    """Clear the API's rate limit and its mosaic and tile caches around a test."""
+    # Imported here so pipeline tests run without the API's dependencies.
+    from api.backend import mosaic_cache
+    from api.main import rate_limit_storage, tile_cache
+
+    rate_limit_storage.clear()
+    mosaic_cache.clear()
+    tile_cache.clear()
+    yield
+    mosaic_cache.clear()
+    tile_cache.clear()
+
+
+@pytest.fixture
+def cog_transform():
+    """The grid of the test COGs: 30 m pixels in UTM 19S near Santiago."""
+    return from_origin(340000, 6310000, 30, 30)
+
+
+@pytest.fixture
+def write_cog(cog_transform):
+    """Return a writer of 512 x 512 clear-sky COGs in 256 x 256 blocks."""
+
+    def write(path, percentage, count=None):
+        """Write a clear-sky COG with the bands written by the data pipeline."""
+        bands = [percentage] if count is None else [percentage, count]
+        profile = {
+            "driver": "COG",
+            "width": 512,
+            "height": 512,
+            "count": len(bands),
+            "dtype": "uint8" if count is None else "uint16",
+            "crs": "EPSG:32719",
+            "transform": cog_transform,
+            "nodata": 0,
+            "blocksize": 256,
+            "overview_resampling": "nearest",
+        }
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(np.stack(bands).astype(profile["dtype"]))
+            if count is not None:
+                dst.descriptions = ("clear_sky_percentage", "valid_observations")
+        return str(path)
+
+    return write
@@ -1,9 +1,30 @@
-from unittest.mock import patch
+import asyncio
+import json
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
+import fsspec
 import pytest
+from cogeo_mosaic.mosaic import MosaicJSON
 from fastapi.testclient import TestClient
+from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+from starlette.datastructures import QueryParams
 
-from api.main import app, rate_limit_storage
+from api.cache import tile_cache_key
+from api.footprints import (
+    FootprintError,
+    mosaic_from_footprints,
+    read_cog_footprints,
+)
+from api.main import app, fs, rate_limit_storage, rate_limiter, tile_cache
+from api.mosaic_store import (
+    GenerationMismatch,
+    MosaicVersions,
+    merge_features,
+    stored_version,
+    write_mosaic,
+)
 
 client = TestClient(app)
 
@@ -12,7 +33,9 @@ client = TestClient(app)
 @pytest.fixture(autouse=True)
 def reset_rate_limit():
     rate_limit_storage.clear()
-    yield
+    # Keep every request in one rate limit window.
+    with patch.object(rate_limiter, "clock", return_value=0.0):
+        yield
     rate_limit_storage.clear()
 
 
@@ -47,13 +70,13 @@ def test_generate_mosaic_filters_by_sensor():
     with (
         patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
         patch(
-            "api.main.fs.glob",
+            "api.main.fs._glob",
             return_value=["bucket/cogs/sentinel2_19HCD_uint8.tif"],
         ) as mock_glob,
-        patch("api.main.MosaicJSON") as mock_mosaic_json,
+        patch("api.main.read_cog_footprints", return_value=["feature"]) as mock_read,
+        patch("api.main.mosaic_from_footprints") as mock_mosaic,
     ):
-        mock_mosaic = mock_mosaic_json.from_urls.return_value
-        mock_mosaic.model_dump.return_value = {"tiles": {}}
+        mock_mosaic.return_value.model_dump.return_value = {"tiles": {}}
 
         response = client.post(
             "/mosaicjson/generate?sensor=sentinel2",
@@ -63,9 +86,118 @@ def test_generate_mosaic_filters_by_sensor():
         assert response.status_code == 200
         assert response.json() == {"tiles": {}}
         mock_glob.assert_called_once_with("gs://bucket/cogs/sentinel2_*_uint8.tif")
-        mock_mosaic_json.from_urls.assert_called_once_with(
-            ["gs://bucket/cogs/sentinel2_19HCD_uint8.tif"]
+        mock_read.assert_called_once_with(
+            ["gs://bucket/cogs/sentinel2_19HCD_uint8.tif"], fs=fs
         )
+        mock_mosaic.assert_called_once_with(["feature"])
+
+
+def test_generate_mosaic_reports_unreadable_cogs():
+    failures = {"gs://bucket/cogs/landsat_233_087_uint8.tif": "not found"}
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.read_cog_footprints", side_effect=FootprintError(failures)),
+    ):
+        response = client.post(
+            "/mosaicjson/generate?tile_ids=landsat_233_087",
+            headers={"X-API-Key": "test-key"},
+        )
+
+    assert response.status_code == 502
+    assert "landsat_233_087_uint8.tif" in response.json()["detail"]
+
+
+def test_generate_mosaic_without_cogs():
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.fs._glob", return_value=[]),
+    ):
+        response = client.post(
+            "/mosaicjson/generate", headers={"X-API-Key": "test-key"}
+        )
+
+    assert response.status_code == 404
+
+
+class SlowReader:
+    """Stand-in for rio_tiler's Reader with a fixed header read latency."""
+
+    def __init__(self, url):
+        self.url = url
+        self.minzoom = 7
+        self.maxzoom = 12 if url.endswith("b.tif") else 11
+
+    def __enter__(self):
+        time.sleep(0.2)
+        return self
+
+    def get_geographic_bounds(self, crs):
+        return (-71.0, -33.0, -70.0, -32.0)
+
+    def __exit__(self, *args):
+        return False
+
+
+def test_read_cog_footprints_reads_concurrently():
+    urls = [f"gs://bucket/{name}.tif" for name in "acdefghijk"]
+    with patch("api.footprints.Reader", SlowReader):
+        start = time.perf_counter()
+        features = asyncio.run(read_cog_footprints(urls, max_threads=10))
+        elapsed = time.perf_counter() - start
+
+    # Ten sequential reads would take two seconds.
+    assert elapsed < 1.0
+    assert [f["properties"]["path"] for f in features] == urls
+    assert features[0]["geometry"]["coordinates"][0][0] == [-71.0, -33.0]
+
+
+def test_read_cog_footprints_collects_failures():
+    def reader(url):
+        if "missing" in url:
+            raise OSError("not found")
+        return SlowReader(url)
+
+    with patch("api.footprints.Reader", side_effect=reader):
+        with pytest.raises(FootprintError) as excinfo:
+            asyncio.run(
+                read_cog_footprints(["gs://bucket/a.tif", "gs://bucket/missing.tif"])
+            )
+
+    assert excinfo.value.failures == {"gs://bucket/missing.tif": "not found"}
+
+
+def test_read_cog_footprints_prefers_sidecars():
+    memory_fs = fsspec.filesystem("memory")
+    sidecar = footprint("gs://old/a.tif", (-72.0, -34.0, -71.0, -33.0))
+    memory_fs.pipe_file("/cogs/a_footprint.json", json.dumps(sidecar).encode())
+    urls = ["memory://cogs/a.tif", "memory://cogs/b.tif"]
+
+    with patch("api.footprints.Reader", side_effect=SlowReader) as mock_reader:
+        features = asyncio.run(
+            read_cog_footprints(urls, fs=AsyncFileSystemWrapper(memory_fs))
+        )
+
+    # Only the COG without a sidecar is opened.
+    mock_reader.assert_called_once_with("memory://cogs/b.tif")
+    assert features[0]["geometry"] == sidecar["geometry"]
+    assert [f["properties"]["path"] for f in features] == urls
+
+
+def test_mosaic_from_footprints_uses_highest_zooms():
+    with patch("api.footprints.Reader", SlowReader):
+        features = asyncio.run(
+            read_cog_footprints(["gs://bucket/a.tif", "gs://bucket/b.tif"])
+        )
+
+    with (
+        patch("api.footprints.MosaicJSON") as mock_mosaic_json,
+        pytest.warns(UserWarning, match="maxzoom"),
+    ):
+        mosaic_from_footprints(features)
+
+    mock_mosaic_json.from_features.assert_called_once_with(
+        features, quiet=True, minzoom=7, maxzoom=12
+    )
 
 
 def test_generate_mosaic_rejects_unknown_sensor():
@@ -79,6 +211,199 @@ def test_generate_mosaic_rejects_unknown_sensor():
         assert "Unsupported sensor" in response.json()["detail"]
 
 
+def footprint(path, bounds, minzoom=7, maxzoom=12):
+    minx, miny, maxx, maxy = bounds
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [
+                [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+            ],
+        },
+        "properties": {"path": path, "minzoom": minzoom, "maxzoom": maxzoom},
+    }
+
+
+def test_merge_features_adds_and_replaces_tiles():
+    old_a = footprint("gs://b/a.tif", (-71.0, -33.0, -70.0, -32.0))
+    b = footprint("gs://b/b.tif", (-70.0, -33.0, -69.0, -32.0))
+    mosaic = MosaicJSON.from_features([old_a, b], minzoom=7, maxzoom=12, quiet=True)
+    old_a_quadkeys = {k for k, v in mosaic.tiles.items() if "gs://b/a.tif" in v}
+
+    # Tile a is reprocessed with a smaller footprint and tile c is new.
+    new_a = footprint("gs://b/a.tif", (-71.0, -33.0, -70.5, -32.5))
+    c = footprint("gs://b/c.tif", (-72.0, -33.0, -71.0, -32.0))
+    merged = merge_features(mosaic, [new_a, c])
+
+    expected = MosaicJSON.from_features([new_a, c], minzoom=7, maxzoom=12, quiet=True)
+    new_a_quadkeys = {k for k, v in expected.tiles.items() if "gs://b/a.tif" in v}
+    assert new_a_quadkeys < old_a_quadkeys
+    assert {k for k, v in merged.tiles.items() if "gs://b/a.tif" in v} == new_a_quadkeys
+    assert all(v.count("gs://b/a.tif") <= 1 for v in merged.tiles.values())
+    assert {k for k, v in merged.tiles.items() if "gs://b/b.tif" in v} == {
+        k for k, v in mosaic.tiles.items() if "gs://b/b.tif" in v
+    }
+    shared = next(k for k, v in merged.tiles.items() if len(v) > 1)
+    assert merged.tiles[shared][0] != "gs://b/b.tif"
+    assert merged.bounds == (-72.0, -33.0, -69.0, -32.0)
+    assert merged.version == "1.0.1"
+    assert mosaic.version == "1.0.0"
+
+
+def test_write_mosaic_reports_generation_mismatch():
+    fs = MagicMock()
+    fs.split_path.return_value = ("bucket", "mosaics/m.json.gz", None)
+    fs._call = AsyncMock(side_effect=FileExistsError("gs://bucket/mosaics/m.json.gz"))
+    mosaic = MosaicJSON.from_features(
+        [footprint("gs://b/a.tif", (-71.0, -33.0, -70.0, -32.0))],
+        minzoom=7,
+        maxzoom=12,
+        quiet=True,
+    )
+
+    with pytest.raises(GenerationMismatch):
+        asyncio.run(write_mosaic(fs, "gs://bucket/mosaics/m.json.gz", mosaic, 42))
+
+    assert fs._call.call_args.kwargs["ifGenerationMatch"] == "42"
+    assert fs._call.call_args.kwargs["name"] == "mosaics/m.json.gz"
+
+
+def test_mosaic_versions_expire_and_invalidate():
+    stored = {"gs://b/m.json": "1"}
+    lookups = []
+    timer = Mock(return_value=0.0)
+    versions = MosaicVersions(
+        ttl=5, timer=timer, lookup=lambda url: lookups.append(url) or stored.get(url)
+    )
+
+    assert versions.get("gs://b/m.json") == "1"
+    stored["gs://b/m.json"] = "2"
+    assert versions.get("gs://b/m.json") == "1"
+    timer.return_value = 6.0
+    assert versions.get("gs://b/m.json") == "2"
+    stored["gs://b/m.json"] = "3"
+    versions.invalidate("gs://b/m.json")
+    assert versions.get("gs://b/m.json") == "3"
+    assert versions.get("gs://b/missing.json") is None
+    assert len(lookups) == 4
+
+
+def test_stored_version_changes_when_mosaic_is_rewritten(tmp_path):
+    path = tmp_path / "mosaic.json"
+    assert stored_version(str(path)) is None
+
+    path.write_bytes(b"{}")
+    first = stored_version(str(path))
+    os.utime(path, (0, 0))
+    assert stored_version(str(path)) not in (None, first)
+
+
+def test_update_mosaic_merges_tiles():
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.read_mosaic", return_value=("mosaic", 7)) as mock_read,
+        patch(
+            "api.main.read_cog_footprints", return_value=["feature"]
+        ) as mock_footprints,
+        patch("api.main.merge_features") as mock_merge,
+        patch("api.main.write_mosaic", return_value=8) as mock_write,
+    ):
+        mock_merge.return_value.version = "1.0.1"
+        mock_merge.return_value.tiles = {"0123": ["a"]}
+
+        response = client.post(
+            "/mosaicjson/update?tile_ids=landsat_233_087",
+            headers={"X-API-Key": "test-key"},
+        )
+
+    path = "gs://bucket/cogs/mosaics/mosaic_landsat_uint8.json.gz"
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "saved_to": path,
+        "generation": 8,
+        "version": "1.0.1",
+        "updated": ["gs://bucket/cogs/landsat_233_087_uint8.tif"],
+        "tiles_count": 1,
+    }
+    mock_read.assert_called_once()
+    mock_footprints.assert_called_once_with(
+        ["gs://bucket/cogs/landsat_233_087_uint8.tif"], fs=fs
+    )
+    mock_merge.assert_called_once_with("mosaic", ["feature"])
+    assert mock_write.call_args.args[1:] == (path, mock_merge.return_value, 7)
+
+
+def test_update_mosaic_conflicts():
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.read_mosaic", return_value=("mosaic", 7)),
+        patch("api.main.read_cog_footprints", return_value=["feature"]),
+        patch("api.main.merge_features"),
+        patch("api.main.write_mosaic", side_effect=GenerationMismatch("changed")),
+    ):
+        stale = client.post(
+            "/mosaicjson/update?tile_ids=landsat_233_087&if_generation_match=6",
+            headers={"X-API-Key": "test-key"},
+        )
+        concurrent = client.post(
+            "/mosaicjson/update?tile_ids=landsat_233_087",
+            headers={"X-API-Key": "test-key"},
+        )
+
+    assert stale.status_code == 409
+    assert concurrent.status_code == 409
+
+
+def test_update_missing_mosaic():
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.read_mosaic", side_effect=FileNotFoundError),
+    ):
+        response = client.post(
+            "/mosaicjson/update?tile_ids=landsat_233_087",
+            headers={"X-API-Key": "test-key"},
+        )
+
+    assert response.status_code == 404
+
+
+def test_mosaic_endpoints_reject_malformed_tile_ids():
+    with (
+        patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}),
+        patch("api.main.read_mosaic") as mock_read,
+        patch("api.main.read_cog_footprints") as mock_footprints,
+    ):
+        unpadded = client.post(
+            "/mosaicjson/update?tile_ids=landsat_233_087,landsat_233087",
+            headers={"X-API-Key": "test-key"},
+        )
+        other_sensor = client.post(
+            "/mosaicjson/generate?tile_ids=sentinel2_19HCD",
+            headers={"X-API-Key": "test-key"},
+        )
+
+    assert unpadded.status_code == 400
+    assert "landsat_233087" in unpadded.json()["detail"]
+    assert "landsat_233_087," not in unpadded.json()["detail"]
+    assert other_sensor.status_code == 400
+    mock_read.assert_not_called()
+    mock_footprints.assert_not_called()
+
+
+def test_cached_tiles_still_require_api_key():
+    path = "/mosaicjson/tiles/WebMercatorQuad/5/1/2.png"
+    key = tile_cache_key(path, QueryParams("url=gs://bucket/mosaic.json"))
+    tile_cache.put(*key, b"png", {"content-type": "image/png"})
+    try:
+        response = client.get(f"{path}?url=gs://bucket/mosaic.json")
+    finally:
+        tile_cache.clear()
+
+    assert response.status_code == 401
+
+
 def test_list_mosaic_sensors():
     with patch.dict("os.environ", {"COG_STORAGE_URL": "gs://bucket/cogs"}):
         response = client.get("/mosaicjson/sensors")
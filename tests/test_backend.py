@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+from unittest.mock import patch
+
+import morecantile
+import numpy as np
+import pytest
+import rasterio
+from fastapi.testclient import TestClient
+
+from api.backend import CachedMosaicBackend, MosaicCache, mosaic_cache
+from api.footprints import mosaic_from_footprints, read_cog_footprints
+from api.main import app
+
+client = TestClient(app)
+pytestmark = pytest.mark.usefixtures("reset_caches")
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def mosaic_path(tmp_path, cog_transform):
+    """Write a 30 m COG near Santiago and a gzipped mosaic of it."""
+    cog_path = str(tmp_path / "landsat_233_083_uint8.tif")
+    profile = {
+        "driver": "COG",
+        "width": 512,
+        "height": 512,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": "EPSG:32719",
+        "transform": cog_transform,
+    }
+    with rasterio.open(cog_path, "w", **profile) as dst:
+        dst.write(np.full((1, 512, 512), 42, dtype="uint8"))
+
+    mosaic = mosaic_from_footprints(asyncio.run(read_cog_footprints([cog_path])))
+    path = str(tmp_path / "mosaic.json.gz")
+    with open(path, "wb") as f:
+        f.write(gzip.compress(mosaic.model_dump_json().encode("utf-8")))
+    return path
+
+
+def test_mosaic_cache_expires_and_invalidates():
+    timer = FakeTimer()
+    loads = []
+    cache = MosaicCache(
+        maxsize=1,
+        ttl=60,
+        timer=timer,
+        load=lambda url: loads.append(url) or url,
+        version=lambda url: "1",
+    )
+
+    cache.get("gs://a.json")
+    cache.get("gs://a.json")
+    assert loads == ["gs://a.json"]
+
+    timer.now = 61
+    cache.get("gs://a.json")
+    cache.invalidate("gs://a.json")
+    cache.get("gs://a.json")
+    cache.get("gs://b.json")
+    cache.get("gs://a.json")
+    assert loads == ["gs://a.json"] * 3 + ["gs://b.json", "gs://a.json"]
+
+
+def test_mosaic_cache_reloads_rewritten_mosaics():
+    versions = {"gs://a.json": "1"}
+    loads = []
+    cache = MosaicCache(
+        ttl=3600, load=lambda url: loads.append(url) or url, version=versions.get
+    )
+
+    cache.get("gs://a.json")
+    cache.get("gs://a.json")
+    # Another worker saved the mosaic; this worker's cache was not invalidated.
+    versions["gs://a.json"] = "2"
+    cache.get("gs://a.json")
+    cache.get("gs://a.json")
+
+    assert loads == ["gs://a.json"] * 2
+
+
+def test_backend_is_read_only(mosaic_path):
+    with CachedMosaicBackend(mosaic_path) as backend:
+        with pytest.raises(NotImplementedError):
+            backend.write()
+
+
+def test_tiles_share_one_parsed_mosaic(mosaic_path):
+    with CachedMosaicBackend(mosaic_path) as backend:
+        tiles = list(morecantile.tms.get("WebMercatorQuad").tiles(*backend.bounds, 13))
+    mosaic_cache.clear()
+
+    with patch.object(mosaic_cache, "load", wraps=mosaic_cache.load) as mock_load:
+        responses = [
+            client.get(
+                f"/mosaicjson/tiles/WebMercatorQuad/{t.z}/{t.x}/{t.y}.png",
+                params={"url": mosaic_path},
+                headers={"X-API-Key": "test-key"},
+            )
+            for t in tiles[:2]
+        ]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].headers["content-type"] == "image/png"
+    mock_load.assert_called_once_with(mosaic_path)
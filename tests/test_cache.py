@@ -0,0 +1,189 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from starlette.datastructures import QueryParams
+
+from api.cache import TileCache, etag_matches, tile_cache_key
+from api.main import tile_cache_middleware
+from api.mosaic_store import MosaicVersions
+
+MOSAIC = "gs://bucket/mosaics/mosaic_landsat_uint8.json.gz"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TileCache(max_bytes=1000, ttl=60, directory=str(tmp_path / "tiles"))
+
+
+@pytest.fixture
+def versions():
+    """Mosaic versions read from a dict instead of storage, without reuse."""
+    stored = {MOSAIC: "1"}
+    versions = MosaicVersions(ttl=0, lookup=stored.get)
+    versions.stored = stored
+    return versions
+
+
+@pytest.fixture
+def tile_app(cache, versions):
+    """A tile endpoint behind the cache middleware that counts renders."""
+    app = FastAPI()
+    app.state.renders = 0
+
+    @app.get("/mosaicjson/tiles/{tms}/{z}/{x}/{y}.png")
+    def tile(tms: str, z: int, x: int, y: int, url: str, bidx: int = 1):
+        app.state.renders += 1
+        if z > 20:
+            return Response(status_code=404)
+        return Response(content=f"{z}/{x}/{y}/{bidx}".encode(), media_type="image/png")
+
+    app.middleware("http")(tile_cache_middleware)
+    with (
+        patch("api.main.tile_cache", cache),
+        patch("api.main.mosaic_versions", versions),
+    ):
+        yield app
+
+
+def test_tile_cache_key_ignores_api_key_and_param_order():
+    path = "/mosaicjson/tiles/WebMercatorQuad/5/1/2.png"
+    first = tile_cache_key(path, QueryParams(f"url={MOSAIC}&bidx=1&api_key=a"))
+    second = tile_cache_key(path, QueryParams(f"bidx=1&url={MOSAIC}&api_key=b"))
+
+    assert first == second
+    assert first[0] == MOSAIC
+    assert tile_cache_key("/mosaicjson/validate", QueryParams("gcs_path=x")) is None
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"x"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = TileCache(max_bytes=10, ttl=60)
+    cache.put(MOSAIC, "a", b"aaaa", {})
+    cache.put(MOSAIC, "b", b"bbbb", {})
+    cache.get(MOSAIC, "a")
+    cache.put(MOSAIC, "c", b"cccc", {})
+
+    assert cache.get(MOSAIC, "b") is None
+    assert cache.get(MOSAIC, "a").body == b"aaaa"
+    assert cache.memory.size == 8
+
+
+def test_memory_tier_index_drops_evicted_tiles():
+    cache = TileCache(max_bytes=10, ttl=60)
+    for i in range(20):
+        cache.put(f"gs://bucket/mosaic_{i}.json", "a", b"aaaa", {})
+    cache.put(MOSAIC, "b", b"bbbb", {})
+    cache.put(MOSAIC, "c", b"cccc", {})
+
+    assert list(cache.memory._keys_by_mosaic) == [MOSAIC]
+    assert len(cache.memory._keys_by_mosaic[MOSAIC]) == 2
+    cache.invalidate(MOSAIC)
+    assert cache.memory._keys_by_mosaic == {}
+    assert cache.memory.size == 0
+
+
+def test_disk_tier_survives_memory_and_invalidates(cache):
+    cache.put(MOSAIC, "a", b"aaaa", {"content-type": "image/png"})
+    cache.put("gs://other.json", "b", b"bbbb", {})
+    cache.memory.clear()
+
+    tile = cache.get(MOSAIC, "a")
+    assert tile.body == b"aaaa"
+    assert tile.headers == {"content-type": "image/png"}
+    assert len(cache.memory) == 1
+
+    cache.invalidate(MOSAIC)
+    cache.memory.clear()
+    assert cache.get(MOSAIC, "a") is None
+    assert cache.get("gs://other.json", "b").body == b"bbbb"
+
+
+def test_disk_tier_prunes_oldest_entries(tmp_path):
+    cache = TileCache(max_bytes=0, ttl=60, directory=str(tmp_path), disk_max_bytes=4000)
+    for i in range(10):
+        cache.put(MOSAIC, str(i), bytes(1000), {})
+
+    assert cache.disk.size <= 4000
+    assert cache.get(MOSAIC, "9") is not None
+    assert cache.get(MOSAIC, "0") is None
+
+
+def test_expired_tiles_are_not_served(cache):
+    cache.put(MOSAIC, "a", b"aaaa", {})
+
+    with patch("api.cache.time.time", return_value=1e12):
+        assert cache.get(MOSAIC, "a") is None
+
+
+def test_middleware_serves_repeated_tiles_from_cache(tile_app):
+    client = TestClient(tile_app)
+    path = f"/mosaicjson/tiles/WebMercatorQuad/5/1/2.png?url={MOSAIC}"
+
+    first = client.get(path)
+    second = client.get(path)
+
+    assert tile_app.state.renders == 1
+    assert first.headers["X-Tile-Cache"] == "MISS"
+    assert second.headers["X-Tile-Cache"] == "HIT"
+    assert second.content == first.content == b"5/1/2/1"
+    assert second.headers["content-type"] == "image/png"
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["Cache-Control"] == "private, max-age=3600"
+
+    client.get(path + "&bidx=2")
+    assert tile_app.state.renders == 2
+
+
+def test_middleware_revalidates_with_etag(tile_app):
+    client = TestClient(tile_app)
+    path = f"/mosaicjson/tiles/WebMercatorQuad/5/1/2.png?url={MOSAIC}"
+    etag = client.get(path).headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_middleware_serves_new_tiles_after_rewrite_by_another_worker(
+    tile_app, versions
+):
+    client = TestClient(tile_app)
+    path = f"/mosaicjson/tiles/WebMercatorQuad/5/1/2.png?url={MOSAIC}"
+    etag = client.get(path).headers["ETag"]
+
+    # Another worker saved the mosaic; this worker's cache was not invalidated.
+    versions.stored[MOSAIC] = "2"
+    response = client.get(path, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["X-Tile-Cache"] == "MISS"
+    assert response.headers["ETag"] != etag
+    assert tile_app.state.renders == 2
+
+
+def test_disk_tier_keys_tiles_by_version(cache):
+    cache.put(MOSAIC, "a", b"aaaa", {}, version="1")
+    cache.memory.clear()
+
+    assert cache.get(MOSAIC, "a", version="1").body == b"aaaa"
+    assert cache.get(MOSAIC, "a", version="2") is None
+
+
+def test_middleware_does_not_cache_errors(tile_app):
+    client = TestClient(tile_app)
+    path = f"/mosaicjson/tiles/WebMercatorQuad/21/1/2.png?url={MOSAIC}"
+
+    assert client.get(path).status_code == 404
+    assert client.get(path).status_code == 404
+    assert tile_app.state.renders == 2
@@ -1,25 +1,53 @@
 """Tests for the clear sky data module."""
 
+from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
+import dask.array
 import geopandas as gpd
 import numpy as np
+import pystac
 import pytest
 import xarray as xr
-from shapely.geometry import box
+from shapely.geometry import box, mapping
 
+from data_pipeline import stac_cache
 from data_pipeline.clear_sky import (
+    LANDSAT_CLEAR_SKY_QA_FLAGS,
     _load_aoi,
+    add_clear_sky_counts,
+    build_landsat_clear_sky_lut,
+    clear_sky_percentage_from_counts,
+    compute_clear_sky_counts,
     compute_clear_sky_percentage,
+    decode_clear_sky,
     format_satellite_tile_key,
+    get_clear_sky_lut,
     get_jrc_surface_water,
     get_landsat_data,
+    get_period_bins,
     get_satellite_data,
+    get_water_mask,
+    load_clear_sky_counts,
+    open_catalog,
+    prune_stac_items,
+    restrict_to_footprint,
     run_clear_sky_pipeline,
+    search_satellite_items,
+    store_clear_sky_counts,
     store_clear_sky_percentage,
 )
 
 
+@pytest.fixture(autouse=True)
+def reset_catalog():
+    """Drop the per-process STAC client so each test sees its own mock."""
+    open_catalog.cache_clear()
+    yield
+    open_catalog.cache_clear()
+
+
 @pytest.fixture
 def sample_geometry():
     """Create a sample geometry for testing."""
@@ -65,16 +93,18 @@ def test_compute_clear_sky_percentage(sample_qa_dataarray):
     """Test computation of clear sky percentage."""
     result = compute_clear_sky_percentage(sample_qa_dataarray)
 
-    # Expected: 2/3, 1/3, 0/3 for each pixel column
+    # Expected: 2/3, 1/3, 0/3 for each pixel column, as rounded percentages
     expected = np.array(
         [
-            [2 / 3, 2 / 3, 0 / 3],
-            [1 / 3, 2 / 3, 0 / 3],
-            [0 / 3, 0 / 3, 2 / 3],
+            [67, 67, 0],
+            [33, 67, 0],
+            [0, 0, 67],
         ]
     )
 
-    np.testing.assert_allclose(result.values, expected)
+    np.testing.assert_array_equal(result.values, expected)
+    assert result.dtype == np.uint8
+    assert result["valid_count"].dtype == np.uint16
     assert isinstance(result, xr.DataArray)
     assert "y" in result.dims
     assert "x" in result.dims
@@ -88,13 +118,13 @@ def test_compute_clear_sky_percentage_custom_flags(sample_qa_dataarray):
 
     expected = np.array(
         [
-            [2 / 3, 2 / 3, 0 / 3],
-            [0 / 3, 2 / 3, 0 / 3],
-            [0 / 3, 0 / 3, 2 / 3],
+            [67, 67, 0],
+            [0, 67, 0],
+            [0, 0, 67],
         ]
     )
 
-    np.testing.assert_allclose(result.values, expected)
+    np.testing.assert_array_equal(result.values, expected)
 
 
 def test_compute_clear_sky_percentage_uses_dataarray_flags(sample_qa_dataarray):
@@ -105,13 +135,121 @@ def test_compute_clear_sky_percentage_uses_dataarray_flags(sample_qa_dataarray):
 
     expected = np.array(
         [
-            [2 / 3, 2 / 3, 0 / 3],
-            [0 / 3, 2 / 3, 0 / 3],
-            [0 / 3, 0 / 3, 2 / 3],
+            [67, 67, 0],
+            [0, 67, 0],
+            [0, 0, 67],
         ]
     )
 
-    np.testing.assert_allclose(result.values, expected)
+    np.testing.assert_array_equal(result.values, expected)
+
+
+def test_compute_clear_sky_percentage_ignores_nodata(sample_qa_dataarray):
+    """Nodata and masked observations are excluded from the denominator."""
+    data = sample_qa_dataarray.values.astype(float)
+    data[2, 0, 0] = 65535  # outside the scene footprint
+    data[2, 0, 1] = np.nan  # masked by the water mask
+    data[:, 1, 2] = 65535  # never observed
+    da = sample_qa_dataarray.copy(data=data)
+    da.attrs["sensor"] = "landsat"
+
+    result = compute_clear_sky_percentage(da)
+
+    assert result.values[0, 0] == 100
+    assert result.values[0, 1] == 100
+    assert result.values[1, 2] == 0
+    assert result["valid_count"].values.tolist() == [
+        [2, 2, 3],
+        [3, 3, 0],
+        [3, 3, 3],
+    ]
+    assert result.attrs["sensor"] == "landsat"
+
+
+@pytest.mark.parametrize("time_batch_size", [1, 2, 5])
+def test_compute_clear_sky_percentage_streaming(sample_qa_dataarray, time_batch_size):
+    """Streaming the time axis in batches matches the single-pass reduction."""
+    expected = compute_clear_sky_percentage(sample_qa_dataarray)
+
+    result = compute_clear_sky_percentage(
+        sample_qa_dataarray, time_batch_size=time_batch_size
+    )
+
+    np.testing.assert_array_equal(result.values, expected.values)
+    np.testing.assert_array_equal(
+        result["valid_count"].values, expected["valid_count"].values
+    )
+
+
+def test_clear_sky_percentage_from_counts_rounds_half_up():
+    """Integer percentages round half up and are zero without observations."""
+    ds_counts = xr.Dataset(
+        {
+            "clear": ("x", np.array([1, 1, 0, 0], dtype=np.uint16)),
+            "valid": ("x", np.array([8, 3, 0, 5], dtype=np.uint16)),
+        }
+    )
+
+    result = clear_sky_percentage_from_counts(ds_counts)
+
+    assert result.dtype == np.uint8
+    assert result.values.tolist() == [13, 33, 0, 0]
+
+
+def test_compute_clear_sky_percentage_rejects_bad_batch_size(sample_qa_dataarray):
+    """Streaming requires a positive batch size."""
+    with pytest.raises(ValueError, match="time_batch_size"):
+        compute_clear_sky_percentage(sample_qa_dataarray, time_batch_size=0)
+
+
+def test_landsat_lut_accepts_legacy_flags():
+    """All exact-match Landsat flags stay clear under bit-level decoding."""
+    lut = build_landsat_clear_sky_lut()
+
+    assert lut.shape == (2**16,)
+    assert lut[LANDSAT_CLEAR_SKY_QA_FLAGS].all()
+
+
+def test_landsat_lut_decodes_bit_fields():
+    """Bit-level decoding rejects cloud, shadow and fill, and accepts new combos."""
+    lut = build_landsat_clear_sky_lut()
+
+    assert lut[21824 | (1 << 2)]  # clear with low-confidence cirrus bit
+    assert not lut[22280]  # high confidence cloud
+    assert not lut[21824 | (1 << 4)]  # cloud shadow
+    assert not lut[1]  # fill
+    assert not lut[0]
+
+
+def test_landsat_lut_ignores_cirrus_and_dilated_cloud():
+    """Legacy high-confidence cirrus stays clear, whatever its cirrus fields say."""
+    lut = build_landsat_clear_sky_lut()
+    clear = 21824  # clear, low confidence in every field
+    cirrus = 1 << 2
+    high_cirrus_confidence = 3 << 14
+
+    assert clear | cirrus | high_cirrus_confidence == 54596
+    assert lut[54596]
+    assert lut[clear | high_cirrus_confidence]
+    assert lut[clear | (1 << 1)]  # dilated cloud
+    assert lut[clear | (3 << 12)]  # high confidence snow/ice on a clear pixel
+
+
+def test_get_clear_sky_lut_sentinel2():
+    """Sentinel-2 SCL classes are matched exactly."""
+    lut = get_clear_sky_lut("sentinel2")
+
+    assert np.flatnonzero(lut).tolist() == [4, 5, 6, 11]
+
+
+def test_decode_clear_sky_treats_nan_as_not_clear():
+    """Masked (NaN) pixels never count as clear sky."""
+    da = xr.DataArray(np.array([[21824.0, np.nan]]), dims=("y", "x"))
+
+    result = decode_clear_sky(da, build_landsat_clear_sky_lut())
+
+    assert result.dtype == bool
+    assert result.values.tolist() == [[True, False]]
 
 
 def test_compute_clear_sky_percentage_empty():
@@ -135,7 +273,8 @@ def test_get_satellite_data_landsat(mock_stac_load, mock_client, sample_geometry
     mock_client.open.return_value = mock_catalog
     mock_search = Mock()
     mock_catalog.search.return_value = mock_search
-    mock_search.item_collection.return_value = ["item1", "item2"]
+    items = [_stac_item("item1", 1, 10.0), _stac_item("item2", 17, 20.0)]
+    mock_search.item_collection.return_value = items
 
     # Mock the STAC load
     mock_da = xr.DataArray(
@@ -158,6 +297,7 @@ def test_get_satellite_data_landsat(mock_stac_load, mock_client, sample_geometry
     assert result.attrs["clear_sky_flags"]
     assert "aoi_wkt" in result.attrs
     assert "aoi_crs" in result.attrs
+    assert result.attrs["stac_item_ids"] == ["item1", "item2"]
     mock_client.open.assert_called_once()
     mock_catalog.search.assert_called_once_with(
         collections=["landsat-c2-l2"],
@@ -180,7 +320,8 @@ def test_get_satellite_data_sentinel2(mock_stac_load, mock_client, sample_geomet
     mock_client.open.return_value = mock_catalog
     mock_search = Mock()
     mock_catalog.search.return_value = mock_search
-    mock_search.item_collection.return_value = ["item1", "item2"]
+    items = [_stac_item("item1", 1, 10.0), _stac_item("item2", 17, 20.0)]
+    mock_search.item_collection.return_value = items
 
     mock_da = xr.DataArray(
         np.ones((2, 10, 10)),
@@ -208,7 +349,7 @@ def test_get_satellite_data_sentinel2(mock_stac_load, mock_client, sample_geomet
         query={"s2:mgrs_tile": {"eq": "19HCD"}},
     )
     mock_stac_load.assert_called_once_with(
-        ["item1", "item2"],
+        items,
         bands=["SCL"],
         intersects=sample_geometry.union_all(),
         chunks={"x": 512, "y": 512},
@@ -224,7 +365,7 @@ def test_get_landsat_data_wrapper(mock_stac_load, mock_client, sample_geometry):
     mock_client.open.return_value = mock_catalog
     mock_search = Mock()
     mock_catalog.search.return_value = mock_search
-    mock_search.item_collection.return_value = ["item1"]
+    mock_search.item_collection.return_value = [_stac_item("item1", 1, 10.0)]
     mock_stac_load.return_value = {
         "qa_pixel": xr.DataArray(np.ones((1, 10, 10)), dims=("time", "y", "x"))
     }
@@ -300,10 +441,39 @@ def test_get_jrc_surface_water(mock_stac_load, mock_client, sample_geometry):
     mock_catalog.search.assert_called_once()
 
 
+def test_get_water_mask_uses_cache(sample_qa_dataarray, sample_geometry, tmp_path):
+    """The JRC mask is computed once per grid and then read from the cache."""
+    da_sat = sample_qa_dataarray.rio.write_crs("EPSG:4326")
+    computed = xr.DataArray(
+        np.array([[True, False, False], [False, False, False], [False, False, True]]),
+        dims=("y", "x"),
+        coords={"y": da_sat["y"], "x": da_sat["x"]},
+    )
+
+    with (
+        patch.dict("os.environ", {"WATER_MASK_CACHE_DIR": str(tmp_path)}),
+        patch(
+            "data_pipeline.clear_sky._compute_water_mask", return_value=computed
+        ) as mock_compute,
+    ):
+        first = get_water_mask(sample_geometry, da_sat)
+        second = get_water_mask(sample_geometry, da_sat)
+
+    mock_compute.assert_called_once()
+    np.testing.assert_array_equal(first.values, computed.values)
+    np.testing.assert_array_equal(second.values, computed.values)
+    assert len(list(tmp_path.glob("water_*.npy"))) == 1
+
+
+@patch("data_pipeline.cog.write_footprint")
 @patch("data_pipeline.clear_sky.logging")
 @patch("rioxarray.raster_array.RasterArray.to_raster")
 def test_store_clear_sky_percentage(
-    mock_to_raster, mock_logging, sample_qa_dataarray, sample_geometry
+    mock_to_raster,
+    mock_logging,
+    mock_write_footprint,
+    sample_qa_dataarray,
+    sample_geometry,
 ):
     """Test storing clear sky percentage as COG."""
     da_csp = compute_clear_sky_percentage(sample_qa_dataarray)
@@ -314,14 +484,27 @@ def test_store_clear_sky_percentage(
     output_path = store_clear_sky_percentage(da_csp, path=42, row=35)
 
     assert output_path == "landsat_042_035.tif"
-    mock_to_raster.assert_called_once_with("landsat_042_035.tif", driver="COG")
+    mock_to_raster.assert_called_once()
+    assert mock_to_raster.call_args.args == ("landsat_042_035.tif",)
+    assert mock_to_raster.call_args.kwargs["driver"] == "COG"
+    assert mock_to_raster.call_args.kwargs["compress"] == "DEFLATE"
+    mock_write_footprint.assert_called_once_with(
+        "landsat_042_035.tif", "landsat_042_035.tif"
+    )
     mock_logging.info.assert_called_once()
 
 
+@patch("data_pipeline.cog.write_footprint")
+@patch("data_pipeline.cog.fsspec.core.url_to_fs")
 @patch("data_pipeline.clear_sky.logging")
 @patch("rioxarray.raster_array.RasterArray.to_raster")
 def test_store_clear_sky_percentage_sentinel2(
-    mock_to_raster, mock_logging, sample_qa_dataarray, sample_geometry
+    mock_to_raster,
+    mock_logging,
+    mock_url_to_fs,
+    mock_write_footprint,
+    sample_qa_dataarray,
+    sample_geometry,
 ):
     """Test storing Sentinel-2 clear sky percentage with tile key naming."""
     da_csp = compute_clear_sky_percentage(sample_qa_dataarray)
@@ -329,17 +512,26 @@ def test_store_clear_sky_percentage_sentinel2(
     da_csp.attrs["aoi_wkt"] = sample_geometry.union_all().wkt
     da_csp.attrs["aoi_crs"] = str(sample_geometry.crs)
 
+    mock_fs = Mock()
+    mock_url_to_fs.return_value = (mock_fs, "bucket/cogs/sentinel2_19HCD_uint8.tif")
+
     output_path = store_clear_sky_percentage(
         da_csp,
         tile_id="T19HCD",
         sensor="sentinel2",
         output_template="gs://bucket/cogs/{tile_key}_uint8.tif",
+        cog_profile="zstd",
     )
 
     assert output_path == "gs://bucket/cogs/sentinel2_19HCD_uint8.tif"
-    mock_to_raster.assert_called_once_with(
-        "gs://bucket/cogs/sentinel2_19HCD_uint8.tif", driver="COG"
+    tmp_path = mock_to_raster.call_args.args[0]
+    assert tmp_path.endswith("sentinel2_19HCD_uint8.tif")
+    assert not tmp_path.startswith("gs://")
+    assert mock_to_raster.call_args.kwargs["compress"] == "ZSTD"
+    mock_fs.put_file.assert_called_once_with(
+        tmp_path, "bucket/cogs/sentinel2_19HCD_uint8.tif"
     )
+    mock_write_footprint.assert_called_once_with(tmp_path, output_path)
     mock_logging.info.assert_called_once()
 
 
@@ -389,8 +581,12 @@ def test_run_clear_sky_pipeline(
         bands=None,
         chunks={"x": 512, "y": 512},
         mask_water=True,
+        prune_items=False,
+        clip_buffer=-500,
+    )
+    mock_compute_clear_sky_percentage.assert_called_once_with(
+        mock_da_sat, time_batch_size=None, group=None
     )
-    mock_compute_clear_sky_percentage.assert_called_once_with(mock_da_sat)
     mock_store_clear_sky_percentage.assert_called_once_with(
         da_csp=mock_da_csp,
         path=None,
@@ -399,8 +595,90 @@ def test_run_clear_sky_pipeline(
         sensor="sentinel2",
         output_template="gs://bucket/cogs/{tile_key}.tif",
         buffer=-500,
+        cog_profile="deflate",
+    )
+
+
+def _stac_item(item_id, day, cloud_cover, bounds=(-120, 35, -119, 36), **props):
+    """Build a minimal stand-in for a pystac Item."""
+    return SimpleNamespace(
+        id=item_id,
+        datetime=datetime(2020, 1, day, 14, 30),
+        geometry=mapping(box(*bounds)),
+        properties={"eo:cloud_cover": cloud_cover, **props},
+    )
+
+
+def test_prune_stac_items_deduplicates_landsat_same_day(sample_geometry):
+    """Same-day Landsat scenes of one path/row keep the least cloudy one."""
+    wrs = {"landsat:wrs_path": "042", "landsat:wrs_row": "035"}
+    items = [
+        _stac_item("LC08", 1, 40.0, **wrs),
+        _stac_item("LC09", 1, 10.0, **wrs),
+        _stac_item("LC08_next", 17, 20.0, **wrs),
+    ]
+
+    to_load, cloudy = prune_stac_items(
+        items, aoi=sample_geometry.union_all(), sensor="landsat"
+    )
+
+    assert [item.id for item in to_load] == ["LC09", "LC08_next"]
+    assert cloudy == []
+
+
+def test_prune_stac_items_keeps_newest_sentinel2_baseline(sample_geometry):
+    """Sentinel-2 reprocessing baselines collapse to the newest one."""
+    tile = {"s2:mgrs_tile": "19HCD"}
+    items = [
+        _stac_item("old", 3, 5.0, **tile, **{"s2:processing_baseline": "02.14"}),
+        _stac_item("new", 3, 6.0, **tile, **{"s2:processing_baseline": "05.00"}),
+    ]
+
+    to_load, _ = prune_stac_items(
+        items, aoi=sample_geometry.union_all(), sensor="sentinel2"
+    )
+
+    assert [item.id for item in to_load] == ["new"]
+
+
+def test_prune_stac_items_drops_small_overlap_and_sets_aside_cloudy(sample_geometry):
+    """Barely overlapping scenes are dropped and fully cloudy ones set aside."""
+    items = [
+        _stac_item("clear", 1, 10.0),
+        _stac_item("cloudy", 2, 100.0),
+        _stac_item("sliver", 3, 0.0, bounds=(-119.01, 35, -118, 36)),
+    ]
+
+    to_load, cloudy = prune_stac_items(
+        items, aoi=sample_geometry.union_all(), sensor="landsat"
+    )
+
+    assert [item.id for item in to_load] == ["clear"]
+    assert [item.id for item in cloudy] == ["cloudy"]
+
+
+def test_prune_stac_items_always_loads_one_scene(sample_geometry):
+    """When every scene is cloudy, the least cloudy one is still loaded."""
+    items = [_stac_item("a", 1, 100.0), _stac_item("b", 2, 99.5)]
+
+    to_load, cloudy = prune_stac_items(
+        items, aoi=sample_geometry.union_all(), sensor="landsat"
     )
 
+    assert [item.id for item in to_load] == ["b"]
+    assert [item.id for item in cloudy] == ["a"]
+
+
+def test_compute_clear_sky_counts_adds_cloudy_footprints(sample_qa_dataarray):
+    """Pruned fully cloudy scenes add valid but never clear observations."""
+    da = sample_qa_dataarray.rio.write_crs("EPSG:4326")
+    da.attrs["cloudy_footprints_wkt"] = [box(-120, 35, -119, 36).wkt]
+
+    result = compute_clear_sky_percentage(da)
+
+    assert result["valid_count"].values.tolist() == [[4] * 3] * 3
+    assert result.values[0, 0] == 50
+
 
 def test_load_aoi_uses_geojson_when_provided(sample_geometry):
     """Explicit aoi_geojson takes priority over tile footprint."""
@@ -440,3 +718,324 @@ def test_load_aoi_falls_back_to_wrs2_tile_for_landsat(sample_geometry):
         )
         mock_tile.assert_called_once_with(233, 85)
         assert result is sample_geometry
+
+
+def _counts(clear, valid, sensor="landsat"):
+    """Build a small counters Dataset on a projected grid."""
+    clear = np.array(clear, dtype="uint16")
+    ny, nx = clear.shape
+    coords = {"y": 10.0 * np.arange(ny, 0, -1) - 5, "x": 10.0 * np.arange(nx) + 5}
+    ds_counts = xr.Dataset(
+        {
+            "clear": (("y", "x"), clear),
+            "valid": (("y", "x"), np.array(valid, dtype="uint16")),
+        },
+        coords=coords,
+        attrs={"sensor": sensor},
+    )
+    return ds_counts.rio.write_crs("EPSG:32719")
+
+
+def test_add_clear_sky_counts_saturates():
+    """Add counters pixel by pixel and clamp at the uint16 maximum."""
+    ds_stored = _counts([[1, 2], [3, 65535]], [[4, 4], [4, 65535]])
+    ds_new = _counts([[1, 0], [0, 1]], [[1, 1], [0, 1]])
+    ds_new.attrs["aoi_wkt"] = "POINT (0 0)"
+
+    ds_total = add_clear_sky_counts(ds_stored, ds_new)
+
+    np.testing.assert_array_equal(ds_total["clear"], [[2, 2], [3, 65535]])
+    np.testing.assert_array_equal(ds_total["valid"], [[5, 5], [4, 65535]])
+    assert ds_total["valid"].dtype == np.uint16
+    assert ds_total.attrs["aoi_wkt"] == "POINT (0 0)"
+
+    with pytest.raises(ValueError, match="shape"):
+        add_clear_sky_counts(ds_stored, ds_new.isel(x=[0]))
+
+
+def test_store_and_load_clear_sky_counts(tmp_path):
+    """Round-trip counters and counted item IDs through the sidecar COG."""
+    fname = str(tmp_path / "landsat_233_087_uint8.tif")
+    assert load_clear_sky_counts(fname) is None
+
+    ds_counts = _counts([[1, 2], [3, 4]], [[5, 6], [7, 8]])
+    counts_path = store_clear_sky_counts(ds_counts, fname, ["LC09_b", "LC08_a"])
+
+    assert counts_path == str(tmp_path / "landsat_233_087_uint8_counts.tif")
+    ds_loaded, item_ids = load_clear_sky_counts(fname)
+    assert item_ids == {"LC08_a", "LC09_b"}
+    assert ds_loaded.attrs["sensor"] == "landsat"
+    np.testing.assert_array_equal(ds_loaded["clear"], ds_counts["clear"])
+    np.testing.assert_array_equal(ds_loaded["valid"], ds_counts["valid"])
+
+
+@patch("data_pipeline.clear_sky.get_satellite_data")
+@patch("data_pipeline.clear_sky.search_satellite_items")
+@patch("data_pipeline.clear_sky.load_clear_sky_counts")
+@patch("data_pipeline.clear_sky._load_aoi")
+def test_update_skips_when_no_new_items(
+    mock_load_aoi,
+    mock_load_counts,
+    mock_search,
+    mock_get_satellite_data,
+    sample_geometry,
+):
+    """Leave outputs untouched when every searched item is already counted."""
+    mock_load_aoi.return_value = sample_geometry
+    mock_load_counts.return_value = (_counts([[1]], [[1]]), {"a", "b"})
+    mock_search.return_value = [_stac_item("a", 1, 0.0), _stac_item("b", 17, 0.0)]
+
+    result = run_clear_sky_pipeline(path=233, row=87, update=True)
+
+    assert result == "landsat_233_087.tif"
+    mock_get_satellite_data.assert_not_called()
+
+
+@patch("data_pipeline.clear_sky.store_clear_sky_counts")
+@patch("data_pipeline.clear_sky.store_clear_sky_percentage")
+@patch("data_pipeline.clear_sky.get_satellite_data")
+@patch("data_pipeline.clear_sky.search_satellite_items")
+@patch("data_pipeline.clear_sky.load_clear_sky_counts")
+@patch("data_pipeline.clear_sky._load_aoi")
+def test_update_adds_unseen_items_to_stored_counts(
+    mock_load_aoi,
+    mock_load_counts,
+    mock_search,
+    mock_get_satellite_data,
+    mock_store_percentage,
+    mock_store_counts,
+    sample_geometry,
+    sample_qa_dataarray,
+):
+    """Load only unseen items onto the stored grid and add their counts."""
+    sample_qa_dataarray.attrs["sensor"] = "landsat"
+    ds_stored = _counts(np.full((3, 3), 2), np.full((3, 3), 4))
+    new_counts = compute_clear_sky_counts(sample_qa_dataarray)
+    mock_load_aoi.return_value = sample_geometry
+    mock_load_counts.return_value = (ds_stored, {"old"})
+    new_item = _stac_item("new", 17, 0.0)
+    mock_search.return_value = [_stac_item("old", 1, 0.0), new_item]
+    sample_qa_dataarray.attrs["stac_item_ids"] = ["new"]
+    mock_get_satellite_data.return_value = sample_qa_dataarray
+    mock_store_percentage.return_value = "landsat_233_087.tif"
+
+    result = run_clear_sky_pipeline(path=233, row=87, update=True, mask_water=False)
+
+    assert result == "landsat_233_087.tif"
+    load_kwargs = mock_get_satellite_data.call_args.kwargs
+    assert load_kwargs["items"] == [new_item]
+    xr.testing.assert_identical(load_kwargs["like"], ds_stored["valid"])
+
+    ds_total, _, item_ids = mock_store_counts.call_args.args
+    np.testing.assert_array_equal(ds_total["clear"], new_counts["clear"] + 2)
+    np.testing.assert_array_equal(ds_total["valid"], new_counts["valid"] + 4)
+    assert item_ids == {"old", "new"}
+    da_csp = mock_store_percentage.call_args.kwargs["da_csp"]
+    np.testing.assert_array_equal(da_csp["valid_count"], ds_total["valid"])
+
+
+@patch("data_pipeline.stac_cache.planetary_computer.sign", side_effect=lambda x: x)
+@patch("data_pipeline.clear_sky.store_clear_sky_counts")
+@patch("data_pipeline.clear_sky.store_clear_sky_percentage")
+@patch("data_pipeline.clear_sky.get_satellite_data")
+@patch("data_pipeline.clear_sky.load_clear_sky_counts")
+@patch("data_pipeline.clear_sky._load_aoi")
+@patch("data_pipeline.clear_sky.pystac_client.Client")
+def test_update_searches_past_stac_cache(
+    mock_client,
+    mock_load_aoi,
+    mock_load_counts,
+    mock_get_satellite_data,
+    mock_store_percentage,
+    mock_store_counts,
+    mock_sign,
+    sample_geometry,
+    sample_qa_dataarray,
+    tmp_path,
+    monkeypatch,
+):
+    """Find scenes published after the tile's search results were cached."""
+    monkeypatch.setenv(stac_cache.STAC_CACHE_DIR_ENV, str(tmp_path))
+    old_item, new_item = (
+        pystac.Item(
+            item_id,
+            mapping(box(-120, 35, -119, 36)),
+            [-120, 35, -119, 36],
+            datetime(2020, 1, day),
+            {},
+        )
+        for item_id, day in (("old", 1), ("new", 17))
+    )
+    results = Mock()
+    mock_client.open.return_value.search.return_value = results
+    results.item_collection.return_value = pystac.ItemCollection([old_item])
+    # An earlier run cached search results holding only the old scene.
+    search_satellite_items(shp=sample_geometry, path=233, row=87)
+    results.item_collection.return_value = pystac.ItemCollection([old_item, new_item])
+
+    mock_load_aoi.return_value = sample_geometry
+    mock_load_counts.return_value = (
+        _counts(np.full((3, 3), 2), np.full((3, 3), 4)),
+        {"old"},
+    )
+    sample_qa_dataarray.attrs["sensor"] = "landsat"
+    sample_qa_dataarray.attrs["stac_item_ids"] = ["new"]
+    mock_get_satellite_data.return_value = sample_qa_dataarray
+    mock_store_percentage.return_value = "landsat_233_087.tif"
+
+    run_clear_sky_pipeline(path=233, row=87, update=True, mask_water=False)
+
+    load_kwargs = mock_get_satellite_data.call_args.kwargs
+    assert [item.id for item in load_kwargs["items"]] == ["new"]
+    # The refreshed results replace the cache entry.
+    cached = search_satellite_items(shp=sample_geometry, path=233, row=87)
+    assert [item.id for item in cached] == ["old", "new"]
+    assert results.item_collection.call_count == 2
+
+
+@pytest.fixture
+def monthly_qa_dataarray():
+    """Create Landsat QA observations in January, February and July."""
+    clear, cloud = 21824, 22280
+    data = np.array(
+        [
+            [[clear, cloud], [clear, 1]],
+            [[cloud, cloud], [clear, 1]],
+            [[clear, clear], [cloud, 1]],
+        ],
+        dtype="uint16",
+    )
+    return xr.DataArray(
+        data,
+        dims=("time", "y", "x"),
+        coords={
+            "time": np.array(["2020-01-05", "2020-02-10", "2020-07-15"], "M8[ns]"),
+            "y": [35.25, 35.5],
+            "x": [-119.75, -119.5],
+        },
+        attrs={"sensor": "landsat"},
+    )
+
+
+def test_get_period_bins():
+    """Resolve month, season and custom groupings."""
+    months = get_period_bins("month")
+    assert list(months)[:2] == ["Jan", "Feb"]
+    assert len(months) == 12
+    assert get_period_bins("season")["DJF"] == (12, 1, 2)
+    assert get_period_bins({"wet": [5, 6], "dry": [12, 1]}) == {
+        "wet": (5, 6),
+        "dry": (12, 1),
+    }
+
+    with pytest.raises(ValueError, match="share months"):
+        get_period_bins({"a": [1, 2], "b": [2, 3]})
+    with pytest.raises(ValueError, match="between 1 and 12"):
+        get_period_bins({"a": [0]})
+    with pytest.raises(ValueError, match="Unsupported group"):
+        get_period_bins("year")
+
+
+@pytest.mark.parametrize("time_batch_size", [None, 2])
+def test_compute_clear_sky_percentage_by_season(monthly_qa_dataarray, time_batch_size):
+    """Reduce every season in one pass, leaving empty seasons at zero."""
+    da_csp = compute_clear_sky_percentage(
+        monthly_qa_dataarray, group="season", time_batch_size=time_batch_size
+    )
+
+    assert da_csp.dims == ("period", "y", "x")
+    assert list(da_csp["period"].values) == ["DJF", "MAM", "JJA", "SON"]
+    np.testing.assert_array_equal(da_csp.sel(period="DJF"), [[50, 0], [100, 0]])
+    np.testing.assert_array_equal(da_csp.sel(period="JJA"), [[100, 100], [0, 0]])
+    np.testing.assert_array_equal(da_csp.sel(period="MAM"), 0)
+    np.testing.assert_array_equal(
+        da_csp["valid_count"].sel(period="DJF"), [[2, 2], [2, 0]]
+    )
+
+
+def test_compute_clear_sky_percentage_custom_bins(monthly_qa_dataarray):
+    """Ignore scenes outside custom bins."""
+    da_csp = compute_clear_sky_percentage(
+        monthly_qa_dataarray, group={"winter": [6, 7, 8]}
+    )
+
+    assert list(da_csp["period"].values) == ["winter"]
+    np.testing.assert_array_equal(da_csp["valid_count"], [[[1, 1], [1, 0]]])
+
+
+@patch("data_pipeline.cog.write_footprint")
+@patch("rioxarray.raster_array.RasterArray.to_raster", autospec=True)
+def test_store_clear_sky_percentage_by_period(
+    mock_to_raster, mock_write_footprint, monthly_qa_dataarray, sample_geometry
+):
+    """Write one described band per period and layer."""
+    da_csp = compute_clear_sky_percentage(monthly_qa_dataarray, group="season")
+    da_csp = da_csp.rio.write_crs("EPSG:4326")
+    da_csp.attrs["aoi_wkt"] = sample_geometry.union_all().wkt
+    da_csp.attrs["aoi_crs"] = str(sample_geometry.crs)
+
+    store_clear_sky_percentage(da_csp, path=42, row=35)
+
+    da_written = mock_to_raster.call_args.args[0]._obj
+    assert da_written.sizes["band"] == 8
+    assert da_written.dtype == np.uint16
+    assert da_written.attrs["long_name"][0] == "clear_sky_percentage_DJF"
+    assert da_written.attrs["long_name"][4] == "valid_observations_DJF"
+
+
+def test_run_clear_sky_pipeline_rejects_group_with_counts():
+    """Refuse period grouping for incremental counters."""
+    with pytest.raises(ValueError, match="group"):
+        run_clear_sky_pipeline(path=233, row=87, group="month", store_counts=True)
+
+
+def _tracked_cube(loaded):
+    """Build a lazy 2 x 4 x 4 cube on a 10 m grid that records the blocks it reads."""
+
+    def load_block(block_info=None):
+        location = block_info[None]["chunk-location"]
+        loaded.add(location[1:])
+        return np.full(block_info[None]["chunk-shape"], 21824, dtype="uint16")
+
+    data = dask.array.map_blocks(
+        load_block, chunks=((1, 1), (2, 2), (2, 2)), dtype="uint16"
+    )
+    da_sat = xr.DataArray(
+        data,
+        dims=("time", "y", "x"),
+        coords={"y": [35.0, 25.0, 15.0, 5.0], "x": [5.0, 15.0, 25.0, 35.0]},
+    )
+    return da_sat.rio.write_crs("EPSG:32719")
+
+
+def test_restrict_to_footprint_skips_blocks_outside():
+    """Never read blocks outside the footprint and mask partially covered ones."""
+    loaded = set()
+    da_sat = _tracked_cube(loaded)
+    footprint = box(0, 20, 20, 40).union(box(20, 30, 30, 40))
+
+    restricted = restrict_to_footprint(da_sat, footprint, nodata=0, crop=False)
+    values = restricted.values
+
+    assert loaded == {(0, 0), (0, 1)}
+    np.testing.assert_array_equal(
+        values[0],
+        [
+            [21824, 21824, 21824, 0],
+            [21824, 21824, 0, 0],
+            [0, 0, 0, 0],
+            [0, 0, 0, 0],
+        ],
+    )
+    assert restricted.dtype == np.uint16
+
+
+def test_restrict_to_footprint_crops_to_bounds():
+    """Crop the grid to the footprint bounds before masking."""
+    da_sat = _tracked_cube(set())
+
+    restricted = restrict_to_footprint(da_sat, box(0, 20, 20, 40), nodata=0)
+
+    assert restricted.sizes["y"] == 2
+    assert restricted.sizes["x"] == 2
+    np.testing.assert_array_equal(restricted.values, 21824)
@@ -0,0 +1,108 @@
+"""Tests for COG profiles and the COG writer."""
+
+import json
+
+import fsspec
+import numpy as np
+import pytest
+import rasterio
+import xarray as xr
+
+from data_pipeline import cog
+
+
+def test_resolve_cog_profile_merges_overrides():
+    """Extend a named profile and drop options overridden with None."""
+    options = cog.resolve_cog_profile(
+        {"profile": "zstd", "blocksize": 256, "predictor": None}
+    )
+
+    assert options["compress"] == "ZSTD"
+    assert options["blocksize"] == 256
+    assert "predictor" not in options
+    assert cog.resolve_cog_profile({"level": 9})["compress"] == "DEFLATE"
+
+
+def test_resolve_cog_profile_validates():
+    """Reject unknown profiles and block sizes that do not match web tiles."""
+    with pytest.raises(ValueError, match="Unsupported COG profile"):
+        cog.resolve_cog_profile("jpeg")
+
+    with pytest.raises(ValueError, match="block size"):
+        cog.resolve_cog_profile({"blocksize": 300})
+
+
+def test_overview_count_matches_min_zoom():
+    """Add overviews until one is as coarse as a tile at the minimum zoom."""
+    # Zoom 5 tiles are ~4.9 km per pixel: 30 m needs 7 halvings, 4 km none.
+    assert cog.overview_count_for_zoom(30, 5) == 7
+    assert cog.overview_count_for_zoom(10, 5) == 8
+    assert cog.overview_count_for_zoom(4000, 5) == 0
+
+    assert cog.cog_creation_options("deflate", resolution=30)["overview_count"] == 7
+    assert cog.cog_creation_options("deflate", resolution=4000)["overviews"] == "NONE"
+    assert "overview_count" not in cog.cog_creation_options("deflate")
+
+
+def test_write_cog_uploads_remote_outputs():
+    """Write remote COGs locally and upload them with the profile applied."""
+    da = xr.DataArray(
+        np.arange(1024 * 1024, dtype="uint16").reshape(1, 1024, 1024) % 101,
+        dims=("band", "y", "x"),
+        coords={
+            "band": [1],
+            "y": np.arange(1024)[::-1] * 30.0 + 15,
+            "x": np.arange(1024) * 30.0 + 15,
+        },
+    ).rio.write_crs("EPSG:32719")
+
+    fname = cog.write_cog(
+        da, "memory://cogs/landsat_233_087.tif", {"profile": "zstd", "blocksize": 256}
+    )
+
+    assert fname == "memory://cogs/landsat_233_087.tif"
+    data = fsspec.filesystem("memory").cat_file("/cogs/landsat_233_087.tif")
+    with rasterio.MemoryFile(data) as memfile, memfile.open() as src:
+        assert src.compression.name.upper() == "ZSTD"
+        assert src.block_shapes[0] == (256, 256)
+        assert src.overviews(1) == [2, 4, 8, 16, 32, 64, 128]
+
+
+def test_write_cog_stores_footprint_sidecar():
+    """Describe the written COG in a sidecar matching TiTiler's zoom range."""
+    da = xr.DataArray(
+        np.ones((1, 1024, 1024), dtype="uint8"),
+        dims=("band", "y", "x"),
+        coords={
+            "band": [1],
+            "y": 6300000 + np.arange(1024)[::-1] * 30.0 + 15,
+            "x": 300000 + np.arange(1024) * 30.0 + 15,
+        },
+    ).rio.write_crs("EPSG:32719")
+
+    fname = cog.write_cog(da, "memory://cogs/landsat_233_087.tif", footprint=True)
+
+    fs = fsspec.filesystem("memory")
+    footprint = json.loads(fs.cat_file("/cogs/landsat_233_087_footprint.json"))
+    properties = footprint["properties"]
+    assert properties["path"] == fname
+    assert properties["crs"] == "EPSG:32719"
+    assert properties["bounds"] == [300000.0, 6300000.0, 330720.0, 6330720.0]
+    # 30 m matches zoom 12, and the coarsest overview at least a tile wide zoom 9.
+    assert (properties["minzoom"], properties["maxzoom"]) == (9, 12)
+    assert properties["checksum"] == cog.compute_checksum(fname)
+    minx, miny = footprint["geometry"]["coordinates"][0][0]
+    assert -72 < minx < -70 and -34 < miny < -33
+
+
+def test_checksum_of_missing_file(tmp_path):
+    """Report missing files as having no checksum."""
+    assert cog.compute_checksum(str(tmp_path / "missing.tif")) is None
+
+
+def test_zoom_for_resolution():
+    """Pick the closest Web Mercator zoom to a pixel size."""
+    assert cog.zoom_for_resolution(cog.WEB_MERCATOR_ZOOM0_RESOLUTION / 2**12) == 12
+    assert cog.zoom_for_resolution(30) == 12
+    assert cog.zoom_for_resolution(10) == 14
+    assert cog.zoom_for_resolution(1e9) == 0
@@ -0,0 +1,78 @@
+import asyncio
+import gzip
+
+import numpy as np
+import pytest
+import rasterio
+from pmtiles.reader import MmapSource, Reader, all_tiles
+from pmtiles.tile import Compression, TileType, tileid_to_zxy
+from rasterio.transform import from_origin
+
+from api.export_tiles import export_pmtiles, main, pyramid_tile_ids
+from api.footprints import mosaic_from_footprints, read_cog_footprints
+
+
+@pytest.fixture
+def mosaic_path(tmp_path):
+    """Write a 30 m clear-sky COG near Santiago and a gzipped mosaic of it."""
+    cog_path = str(tmp_path / "landsat_233_083_uint8.tif")
+    profile = {
+        "driver": "COG",
+        "width": 512,
+        "height": 512,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": "EPSG:32719",
+        "transform": from_origin(340000, 6310000, 30, 30),
+        "nodata": 0,
+    }
+    with rasterio.open(cog_path, "w", **profile) as dst:
+        dst.write(np.full((1, 512, 512), 42, dtype="uint8"))
+
+    mosaic = mosaic_from_footprints(asyncio.run(read_cog_footprints([cog_path])))
+    path = str(tmp_path / "mosaic.json.gz")
+    with open(path, "wb") as f:
+        f.write(gzip.compress(mosaic.model_dump_json().encode("utf-8")))
+    return path
+
+
+def test_pyramid_tile_ids_are_sorted_by_zoom():
+    tile_ids = pyramid_tile_ids((-71.0, -34.0, -70.0, -33.0), 0, 8)
+
+    zooms = [tileid_to_zxy(tile_id)[0] for tile_id in tile_ids]
+    assert tile_ids == sorted(tile_ids)
+    assert zooms == sorted(zooms)
+    assert set(zooms) == set(range(9))
+
+
+def test_export_pmtiles(mosaic_path, tmp_path):
+    output = str(tmp_path / "landsat.pmtiles")
+
+    count = export_pmtiles(mosaic_path, output, minzoom=5, maxzoom=9, workers=2)
+
+    with open(output, "rb") as f:
+        reader = Reader(MmapSource(f))
+        header = reader.header()
+        metadata = reader.metadata()
+        tiles = list(all_tiles(MmapSource(f)))
+        assert header["tile_type"] == TileType.PNG
+        assert header["tile_compression"] == Compression.NONE
+        assert header["clustered"]
+        assert (header["min_zoom"], header["max_zoom"]) == (5, 9)
+        assert metadata["colormap_name"] == "coolwarm"
+        assert len(tiles) == count
+        assert all(data.startswith(b"\x89PNG") for _, data in tiles)
+
+
+def test_cli_rejects_inverted_zooms(mosaic_path, tmp_path):
+    with pytest.raises(SystemExit):
+        main(
+            [
+                mosaic_path,
+                str(tmp_path / "out.pmtiles"),
+                "--minzoom",
+                "9",
+                "--maxzoom",
+                "5",
+            ]
+        )
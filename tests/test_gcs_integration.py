@@ -0,0 +1,114 @@
+"""
+Mosaic endpoints against a local fake GCS server.
+
+Skipped unless STORAGE_EMULATOR_HOST points gcsfs at an emulator, e.g.:
+
+    gcp-storage-emulator start --port=4443 --in-memory &
+    STORAGE_EMULATOR_HOST=http://localhost:4443 API_KEY=test-key \\
+        pytest tests/test_gcs_integration.py
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import httpx
+import pytest
+
+from api.main import app, fs, rate_limit_storage
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("STORAGE_EMULATOR_HOST"), reason="STORAGE_EMULATOR_HOST not set"
+)
+
+HEADERS = {"X-API-Key": "test-key"}
+
+
+def footprint(path, bounds):
+    minx, miny, maxx, maxy = bounds
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [
+                [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+            ],
+        },
+        "properties": {"path": path, "minzoom": 7, "maxzoom": 12},
+    }
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """A fresh bucket used as COG_STORAGE_URL."""
+    name = f"mosaic-test-{uuid.uuid4().hex[:8]}"
+    monkeypatch.setenv("COG_STORAGE_URL", f"gs://{name}")
+    rate_limit_storage.clear()
+    return name
+
+
+async def put_sidecar(bucket, tile_id, bounds):
+    """Upload the footprint sidecar of a COG, which is all generation reads."""
+    cog = f"gs://{bucket}/landsat_{tile_id}_uint8.tif"
+    data = json.dumps(footprint(cog, bounds)).encode()
+    await fs._pipe_file(f"{bucket}/landsat_{tile_id}_uint8_footprint.json", data)
+
+
+async def run_with_app(test):
+    """Run a test coroutine with a client sharing the app's GCS session."""
+    # TestClient requests in other test modules leave a session bound to their
+    # closed event loops.
+    fs._session = None
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test", headers=HEADERS
+        ) as client:
+            await test(client)
+
+
+def test_generate_validate_and_update(bucket):
+    async def test(client):
+        await fs._mkdir(bucket)
+        await put_sidecar(bucket, "233_083", (-71.0, -33.0, -70.0, -32.0))
+        await put_sidecar(bucket, "233_084", (-71.0, -34.0, -70.0, -33.0))
+        # The glob must only match COGs, not their sidecars.
+        await fs._pipe_file(f"{bucket}/landsat_233_083_uint8.tif", b"cog")
+        await fs._pipe_file(f"{bucket}/landsat_233_084_uint8.tif", b"cog")
+
+        response = await client.post("/mosaicjson/generate?save_to_gcs=true")
+        assert response.status_code == 200
+        saved_to = response.json()["saved_to"]
+        assert saved_to == f"gs://{bucket}/mosaics/mosaic_landsat_uint8.json.gz"
+
+        response = await client.get(f"/mosaicjson/validate?gcs_path={saved_to}")
+        assert response.json()["valid"]
+        tiles_count = response.json()["tiles_count"]
+
+        await put_sidecar(bucket, "232_083", (-60.0, -33.0, -59.0, -32.0))
+        response = await client.post("/mosaicjson/update?tile_ids=landsat_232_083")
+        assert response.status_code == 200
+        assert response.json()["version"] == "1.0.1"
+        assert response.json()["tiles_count"] > tiles_count
+
+    asyncio.run(run_with_app(test))
+
+
+def test_concurrent_validations_share_one_session(bucket):
+    async def test(client):
+        await fs._mkdir(bucket)
+        await put_sidecar(bucket, "233_083", (-71.0, -33.0, -70.0, -32.0))
+        await fs._pipe_file(f"{bucket}/landsat_233_083_uint8.tif", b"cog")
+        await client.post("/mosaicjson/generate?tile_ids=landsat_233_083&save_to_gcs=1")
+        session = fs.session
+        path = f"gs://{bucket}/mosaics/mosaic_landsat_uint8.json.gz"
+
+        responses = await asyncio.gather(
+            *(client.get(f"/mosaicjson/validate?gcs_path={path}") for _ in range(20))
+        )
+
+        assert all(response.json()["valid"] for response in responses)
+        assert fs.session is session
+
+    asyncio.run(run_with_app(test))
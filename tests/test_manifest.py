@@ -0,0 +1,83 @@
+"""Tests for the resumable batch run manifest."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from data_pipeline import cog, manifest
+
+PIPELINE_KWARGS = {
+    "sensor": "landsat",
+    "time_range": "2020-01-01/2020-12-31",
+    "bands": None,
+    "chunks": {"x": 512, "y": 512},
+    "mask_water": True,
+    "output_template": "{tile_key}.tif",
+    "buffer": -500,
+    "time_batch_size": None,
+    "prune_items": False,
+}
+
+
+def test_params_hash_ignores_execution_settings():
+    """Change the hash only for parameters that change the output."""
+    base = manifest.make_params_hash(PIPELINE_KWARGS)
+
+    rechunked = {**PIPELINE_KWARGS, "chunks": {"x": 256}, "time_batch_size": 8}
+    assert manifest.make_params_hash(rechunked) == base
+    assert manifest.make_params_hash({**PIPELINE_KWARGS, "buffer": 0}) != base
+    assert manifest.make_params_hash({**PIPELINE_KWARGS, "mask_water": False}) != base
+
+
+def test_manifest_round_trip_and_up_to_date(tmp_path):
+    """Record a tile and reuse it only while parameters and output match."""
+    output = tmp_path / "landsat_233_087.tif"
+    output.write_bytes(b"cog")
+    path = str(tmp_path / "runs" / "manifest.json")
+
+    run_manifest = manifest.load_manifest(path)
+    assert run_manifest == {"version": manifest.MANIFEST_VERSION, "tiles": {}}
+
+    manifest.record_tile(
+        run_manifest,
+        "landsat_233_087",
+        "abc",
+        str(output),
+        cog.compute_checksum(str(output)),
+    )
+    manifest.save_manifest(path, run_manifest)
+    run_manifest = manifest.load_manifest(path)
+
+    assert manifest.is_up_to_date(run_manifest, "landsat_233_087", "abc")
+    assert not manifest.is_up_to_date(run_manifest, "landsat_233_087", "def")
+    assert not manifest.is_up_to_date(run_manifest, "landsat_233_088", "abc")
+
+    output.write_bytes(b"changed")
+    assert not manifest.is_up_to_date(run_manifest, "landsat_233_087", "abc")
+
+    output.unlink()
+    assert not manifest.is_up_to_date(run_manifest, "landsat_233_087", "abc")
+
+
+def test_load_manifest_rejects_unknown_version(tmp_path):
+    """Refuse to resume from a manifest written in another format."""
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"version": 99, "tiles": {}}))
+
+    with pytest.raises(ValueError, match="version"):
+        manifest.load_manifest(str(path))
+
+
+def test_remote_output_checksum_uses_object_metadata():
+    """Identify remote outputs by their stored hash instead of downloading them."""
+    fs = MagicMock()
+    fs.info.return_value = {"crc32c": "AAAAAA==", "generation": "17"}
+
+    with patch("fsspec.core.url_to_fs", return_value=(fs, "bucket/tile.tif")):
+        assert manifest.output_checksum("gs://bucket/tile.tif") == "crc32c:AAAAAA=="
+
+        fs.info.side_effect = FileNotFoundError
+        assert manifest.output_checksum("gs://bucket/tile.tif") is None
+
+    fs.open.assert_not_called()
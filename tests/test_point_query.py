@@ -0,0 +1,131 @@
+import asyncio
+import gzip
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import rasterio
+import rasterio.warp
+from fastapi.testclient import TestClient
+from rasterio.io import DatasetReader
+
+from api.footprints import mosaic_from_footprints, read_cog_footprints
+from api.main import app
+from api.point_query import query_points, sample_cog
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": "test-key"}
+pytestmark = pytest.mark.usefixtures("reset_caches")
+
+
+@pytest.fixture
+def pixel_lonlat(cog_transform):
+    """Return the lon/lat of pixel centers of the test COGs."""
+
+    def lonlat(row, col):
+        x, y = cog_transform * (col + 0.5, row + 0.5)
+        (lon,), (lat,) = rasterio.warp.transform("EPSG:32719", "EPSG:4326", [x], [y])
+        return lon, lat
+
+    return lonlat
+
+
+@pytest.fixture
+def cogs(tmp_path, write_cog):
+    percentage = np.full((512, 512), 60)
+    count = np.full((512, 512), 20)
+    # The left half of the newer COG has no observations.
+    count[:, :256] = 0
+    percentage[:, :256] = 0
+    newer = write_cog(tmp_path / "newer_uint8.tif", percentage, count)
+    older = write_cog(tmp_path / "older_uint8.tif", np.full((512, 512), 35))
+    return newer, older
+
+
+@pytest.fixture
+def mosaic(cogs):
+    return mosaic_from_footprints(asyncio.run(read_cog_footprints(list(cogs))))
+
+
+def test_sample_cog_reads_each_block_once(cogs, pixel_lonlat):
+    newer, _ = cogs
+    points = [pixel_lonlat(row, col) for row in (10, 20, 300) for col in (300, 400)]
+
+    reads = []
+    original_read = DatasetReader.read
+
+    def counting_read(self, *args, **kwargs):
+        reads.append(kwargs["window"])
+        return original_read(self, *args, **kwargs)
+
+    with patch.object(DatasetReader, "read", counting_read):
+        values = sample_cog(newer, points)
+
+    assert len(reads) == 2
+    assert all(value.clear_sky_percentage == 60 for value in values)
+    assert all(value.valid_observations == 20 for value in values)
+
+
+def test_sample_cog_skips_pixels_without_observations(cogs, pixel_lonlat):
+    newer, older = cogs
+    points = [pixel_lonlat(5, 5), pixel_lonlat(5, 500), (-60.0, -33.0)]
+
+    assert sample_cog(newer, points)[0] is None
+    assert sample_cog(newer, points)[1].clear_sky_percentage == 60
+    assert sample_cog(newer, points)[2] is None
+    # Single-band COGs fall back to their nodata value.
+    assert sample_cog(older, points)[0].valid_observations is None
+
+
+def test_query_points_falls_through_to_next_cog(mosaic, cogs, pixel_lonlat):
+    newer, older = cogs
+    points = [pixel_lonlat(5, 5), pixel_lonlat(5, 500), (-60.0, -33.0)]
+
+    values = asyncio.run(query_points(mosaic, points))
+
+    assert values[0].asset == older
+    assert values[0].clear_sky_percentage == 35
+    assert values[1].asset == newer
+    assert values[2] is None
+
+
+def test_point_endpoints(mosaic, tmp_path, pixel_lonlat):
+    url = str(tmp_path / "mosaic.json.gz")
+    with open(url, "wb") as f:
+        f.write(gzip.compress(mosaic.model_dump_json().encode("utf-8")))
+    lon, lat = pixel_lonlat(5, 500)
+
+    response = client.get(
+        "/clear-sky/point", params={"lon": lon, "lat": lat, "url": url}, headers=HEADERS
+    )
+    assert response.status_code == 200
+    assert response.json()["clear_sky_percentage"] == 60
+    assert response.json()["valid_observations"] == 20
+
+    response = client.post(
+        "/clear-sky/point",
+        params={"url": url},
+        json={"points": [[lon, lat], [-60.0, -33.0]]},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert [p["clear_sky_percentage"] for p in points] == [60, None]
+
+
+def test_point_batch_rejects_invalid_points():
+    response = client.post(
+        "/clear-sky/point",
+        params={"url": "gs://bucket/mosaic.json.gz"},
+        json={"points": [[-200.0, -33.0]]},
+        headers=HEADERS,
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        "/clear-sky/point",
+        params={"url": "gs://bucket/mosaic.json.gz"},
+        json={"points": []},
+        headers=HEADERS,
+    )
+    assert response.status_code == 422
@@ -0,0 +1,115 @@
+import pytest
+
+from api.rate_limit import (
+    MemoryBackend,
+    RateLimiter,
+    SQLiteBackend,
+    WindowState,
+    advance,
+    backend_from_url,
+)
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_advance_weights_previous_window():
+    # A quarter into the next window, 75% of the previous 10 requests still count,
+    # so three more fit under the limit of 10.
+    state = WindowState(window=0, current=10, previous=0)
+    allowed = []
+    for _ in range(4):
+        state, ok = advance(state, now=12.5, limit=10, window=10)
+        allowed.append(ok)
+
+    assert allowed == [True, True, True, False]
+    assert state == WindowState(window=1, current=3, previous=10)
+
+
+def test_advance_forgets_stale_windows():
+    state, allowed = advance(WindowState(0, 10, 0), now=25.0, limit=10, window=10)
+
+    assert allowed
+    assert state == WindowState(window=2, current=1, previous=0)
+
+
+def test_rate_limiter_resets_after_two_windows():
+    clock = FakeClock()
+    limiter = RateLimiter(3, 60, MemoryBackend(), clock=clock)
+
+    assert [limiter.allow("1.2.3.4") for _ in range(4)] == [True] * 3 + [False]
+    assert limiter.allow("5.6.7.8")
+
+    clock.now = 120.0
+    assert limiter.allow("1.2.3.4")
+
+
+def test_memory_backend_evicts_least_recently_seen_clients():
+    clock = FakeClock()
+    backend = MemoryBackend(max_clients=2)
+    limiter = RateLimiter(1, 60, backend, clock=clock)
+
+    limiter.allow("a")
+    limiter.allow("b")
+    limiter.allow("a")
+    limiter.allow("c")
+
+    assert len(backend) == 2
+    # "b" was evicted, so its limit starts over.
+    assert limiter.allow("b")
+    assert not limiter.allow("c")
+
+
+def test_memory_backend_drops_idle_clients():
+    clock = FakeClock()
+    backend = MemoryBackend()
+    limiter = RateLimiter(5, 60, backend, clock=clock)
+    for i in range(100):
+        limiter.allow(f"10.0.0.{i}")
+
+    clock.now = 150.0
+    limiter.allow("10.0.1.1")
+
+    assert len(backend) == 1
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "rate_limit.db")
+    clock = FakeClock()
+    worker_1 = RateLimiter(4, 60, SQLiteBackend(path), clock=clock)
+    worker_2 = RateLimiter(4, 60, SQLiteBackend(path), clock=clock)
+
+    allowed = [worker.allow("1.2.3.4") for worker in [worker_1, worker_2] * 3]
+
+    assert allowed == [True] * 4 + [False] * 2
+
+    worker_1.backend.clear()
+    assert worker_2.allow("1.2.3.4")
+
+
+def test_sqlite_backend_purges_expired_clients(tmp_path):
+    clock = FakeClock()
+    backend = SQLiteBackend(str(tmp_path / "rate_limit.db"), purge_interval=3)
+    limiter = RateLimiter(5, 60, backend, clock=clock)
+    limiter.allow("a")
+    limiter.allow("b")
+
+    clock.now = 150.0
+    limiter.allow("c")
+
+    rows = backend._connect().execute("SELECT key FROM rate_limits").fetchall()
+    assert rows == [("c",)]
+
+
+def test_backend_from_url(tmp_path):
+    assert isinstance(backend_from_url("memory"), MemoryBackend)
+    backend = backend_from_url(f"sqlite:///{tmp_path}/limits.db")
+    assert backend.path == f"{tmp_path}/limits.db"
+
+    with pytest.raises(ValueError, match="redis"):
+        backend_from_url("redis://localhost")
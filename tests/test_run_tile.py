@@ -1,5 +1,6 @@
 """Tests for the clear-sky tile job CLI."""
 
+import json
 import sys
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
@@ -72,6 +73,12 @@ def test_landsat_cli_wires_pipeline_arguments(
         mask_water=False,
         output_template="gs://bucket/cogs/{tile_key}.tif",
         buffer=-250,
+        time_batch_size=None,
+        prune_items=False,
+        store_counts=False,
+        update=False,
+        group=None,
+        cog_profile="deflate",
     )
 
 
@@ -109,6 +116,12 @@ def test_sentinel2_cli_wires_pipeline_arguments(
         mask_water=True,
         output_template="gs://bucket/cogs/{tile_key}.tif",
         buffer=-500,
+        time_batch_size=None,
+        prune_items=False,
+        store_counts=False,
+        update=False,
+        group=None,
+        cog_profile="deflate",
     )
 
 
@@ -150,3 +163,161 @@ def test_dask_client_is_closed_after_pipeline(
     run_tile.main(["--sensor", "landsat", "--path", "233", "--row", "87"])
 
     mock_client.close.assert_called_once_with()
+
+
+def test_parse_tile_formats():
+    """Parse Landsat PATH/ROW pairs and Sentinel-2 MGRS IDs."""
+    assert run_tile.parse_tile("landsat", " 233/087 ") == {
+        "path": 233,
+        "row": 87,
+        "tile_id": None,
+    }
+    assert run_tile.parse_tile("landsat", "1_2")["row"] == 2
+    assert run_tile.parse_tile("sentinel2", "T19HCD")["tile_id"] == "T19HCD"
+
+    with pytest.raises(ValueError):
+        run_tile.parse_tile("landsat", "T19HCD")
+
+
+def test_resolve_batch_tiles_merges_sources(tmp_path, sample_geometry):
+    """Combine --tiles, --tiles-file and --tiles-aoi without duplicates."""
+    tiles_file = tmp_path / "tiles.txt"
+    tiles_file.write_text("# Atacama\n233/087\n\n1/76\n")
+    aoi_file = tmp_path / "aoi.geojson"
+    sample_geometry.to_file(aoi_file, driver="GeoJSON")
+    grid = gpd.GeoDataFrame(
+        {"PATH": [1, 2], "ROW": [76, 77]}, geometry=[box(0, 0, 1, 1)] * 2
+    )
+    args = run_tile.build_parser().parse_args(
+        [
+            "--tiles",
+            "233/087,233/088",
+            "--tiles-file",
+            str(tiles_file),
+            "--tiles-aoi",
+            str(aoi_file),
+        ]
+    )
+
+    with patch("data_pipeline.run_tile.get_intersecting_wrs2_tiles", return_value=grid):
+        tiles = run_tile.resolve_batch_tiles(args)
+
+    assert [(t["path"], t["row"]) for t in tiles] == [
+        (233, 87),
+        (233, 88),
+        (1, 76),
+        (2, 77),
+    ]
+
+
+@patch("data_pipeline.run_tile.build_grid_store")
+@patch("data_pipeline.run_tile.run_clear_sky_pipeline")
+def test_batch_mode_reports_failures(
+    mock_run_clear_sky_pipeline, mock_build_grid_store, monkeypatch, capsys
+):
+    """Run every tile, keep going after a failure and summarize the outcome."""
+    monkeypatch.delenv("DASK_SCHEDULER_ADDRESS", raising=False)
+    mock_run_clear_sky_pipeline.side_effect = [
+        "gs://bucket/cogs/sentinel2_19HCD.tif",
+        RuntimeError("no STAC items"),
+    ]
+
+    result = run_tile.main(
+        ["--sensor", "sentinel2", "--tiles", "T19HCD,T19HCC", "--no-mask-water"]
+    )
+
+    assert result == 1
+    mock_build_grid_store.assert_called_once_with()
+    assert mock_run_clear_sky_pipeline.call_count == 2
+    first_call = mock_run_clear_sky_pipeline.call_args_list[0].kwargs
+    assert first_call["tile_id"] == "T19HCD"
+    assert first_call["aoi_geojson"] is None
+    assert first_call["mask_water"] is False
+
+    summary = capsys.readouterr().out
+    assert "sentinel2_19HCD" in summary
+    assert "no STAC items" in summary
+    assert "1 succeeded, 0 skipped, 1 failed" in summary
+
+
+def test_batch_mode_skips_single_tile_validation():
+    """Accept batch options without --path/--row, but reject zero workers."""
+    parser = run_tile.build_parser()
+    run_tile.validate_args(parser.parse_args(["--tiles", "233/087"]), parser)
+
+    with pytest.raises(SystemExit):
+        run_tile.main(["--tiles", "233/087", "--workers", "0"])
+
+
+@patch("data_pipeline.run_tile.build_grid_store")
+@patch("data_pipeline.run_tile.run_clear_sky_pipeline")
+def test_batch_mode_resumes_from_manifest(
+    mock_run_clear_sky_pipeline, mock_build_grid_store, tmp_path, monkeypatch
+):
+    """Skip tiles recorded in the manifest and process only the rest."""
+    monkeypatch.delenv("DASK_SCHEDULER_ADDRESS", raising=False)
+
+    def write_output(tile_id, output_template, **kwargs):
+        output = output_template.format(tile_key=f"sentinel2_{tile_id[1:]}")
+        with open(output, "wb") as f:
+            f.write(tile_id.encode())
+        return output
+
+    mock_run_clear_sky_pipeline.side_effect = write_output
+    manifest_path = str(tmp_path / "manifest.json")
+    argv = [
+        "--sensor",
+        "sentinel2",
+        "--manifest",
+        manifest_path,
+        "--output-template",
+        str(tmp_path / "{tile_key}.tif"),
+    ]
+
+    assert run_tile.main([*argv, "--tiles", "T19HCD"]) == 0
+    assert run_tile.main([*argv, "--tiles", "T19HCD,T19HCC"]) == 0
+
+    calls = mock_run_clear_sky_pipeline.call_args_list
+    processed = [c.kwargs["tile_id"] for c in calls]
+    assert processed == ["T19HCD", "T19HCC"]
+    tiles = json.loads((tmp_path / "manifest.json").read_text())["tiles"]
+    assert set(tiles) == {"sentinel2_19HCD", "sentinel2_19HCC"}
+    assert tiles["sentinel2_19HCC"]["checksum"].startswith("sha256:")
+
+    assert run_tile.main([*argv, "--tiles", "T19HCD", "--buffer", "0"]) == 0
+    assert mock_run_clear_sky_pipeline.call_count == 3
+
+
+def test_parse_group():
+    """Parse named and custom period groupings."""
+    assert run_tile.parse_group("season") == "season"
+    assert run_tile.parse_group("wet=5,6,7,8;dry=11,12,1,2") == {
+        "wet": [5, 6, 7, 8],
+        "dry": [11, 12, 1, 2],
+    }
+
+    with pytest.raises(SystemExit):
+        run_tile.main(["--path", "233", "--row", "87", "--group", "wet:5,6"])
+
+
+def test_cog_options_extend_profile():
+    """Merge repeated --cog-option overrides into the selected profile."""
+    args = run_tile.build_parser().parse_args(
+        [
+            "--cog-profile",
+            "zstd",
+            "--cog-option",
+            "blocksize=256",
+            "--cog-option",
+            "PREDICTOR=NO",
+        ]
+    )
+
+    assert run_tile.pipeline_kwargs(args)["cog_profile"] == {
+        "profile": "zstd",
+        "blocksize": 256,
+        "predictor": "NO",
+    }
+
+    with pytest.raises(SystemExit):
+        run_tile.build_parser().parse_args(["--cog-option", "blocksize"])
@@ -8,6 +8,7 @@ import pytest
 from shapely.geometry import box
 
 from data_pipeline.shapefiles import (
+    clear_grid_cache,
     download_wrs2_grid,
     get_chile_boundary,
     get_chile_wrs2_tiles,
@@ -20,6 +21,15 @@ from data_pipeline.shapefiles import (
 # --- Fixtures ---
 
 
+@pytest.fixture(autouse=True)
+def grid_store(tmp_path, monkeypatch):
+    """Isolate the on-disk grid store and in-process indexes per test."""
+    monkeypatch.setenv("PARCELAS_GRID_CACHE_DIR", str(tmp_path / "grids"))
+    clear_grid_cache()
+    yield tmp_path / "grids"
+    clear_grid_cache()
+
+
 @pytest.fixture
 def mock_wrs2_gdf():
     return gpd.GeoDataFrame(
@@ -58,6 +68,29 @@ def test_get_wrs2_grid(mock_wrs2_gdf):
         assert "ROW" in result.columns
 
 
+def test_get_wrs2_grid_builds_local_store(mock_wrs2_gdf, grid_store):
+    with patch(
+        "data_pipeline.shapefiles.gpd.read_file", return_value=mock_wrs2_gdf
+    ) as mock_read:
+        first = get_wrs2_grid()
+        second = get_wrs2_grid()
+
+    mock_read.assert_called_once()
+    assert (grid_store / "wrs2_descending.parquet").exists()
+    assert second["PATH"].tolist() == first["PATH"].tolist()
+
+
+def test_get_wrs2_tile_uses_in_process_index(mock_wrs2_gdf):
+    with patch(
+        "data_pipeline.shapefiles.get_wrs2_grid", return_value=mock_wrs2_gdf
+    ) as mock_grid:
+        get_wrs2_tile(233, 85)
+        result = get_wrs2_tile(233, 86)
+
+    mock_grid.assert_called_once()
+    assert result.iloc[0]["ROW"] == 86
+
+
 def test_get_wrs2_tile(mock_wrs2_gdf):
     with patch("data_pipeline.shapefiles.get_wrs2_grid", return_value=mock_wrs2_gdf):
         result = get_wrs2_tile(233, 85)
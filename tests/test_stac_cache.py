@@ -0,0 +1,138 @@
+"""Tests for the STAC search result cache."""
+
+import os
+import time
+from unittest.mock import Mock, patch
+
+import pystac
+import pytest
+from shapely.geometry import box
+
+from data_pipeline import stac_cache
+from data_pipeline.clear_sky import open_catalog, search_stac_items
+
+FAKE_ITEM = {
+    "type": "Feature",
+    "stac_version": "1.0.0",
+    "id": "LC09_L2SP_233087_20200115_02_T1",
+    "geometry": {
+        "type": "Polygon",
+        "coordinates": [
+            [
+                [-72.0, -39.0],
+                [-71.0, -39.0],
+                [-71.0, -38.0],
+                [-72.0, -38.0],
+                [-72.0, -39.0],
+            ]
+        ],
+    },
+    "bbox": [-72.0, -39.0, -71.0, -38.0],
+    "properties": {"datetime": "2020-01-15T14:30:00Z", "eo:cloud_cover": 12.5},
+    "links": [],
+    "assets": {
+        "qa_pixel": {
+            "href": "https://landsateuwest.blob.core.windows.net/qa_pixel.tif?st=2020&sig=abc"
+        }
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_catalog():
+    open_catalog.cache_clear()
+    yield
+    open_catalog.cache_clear()
+
+
+@pytest.fixture
+def fake_items():
+    """A local STAC ItemCollection with one signed Landsat item."""
+    return pystac.ItemCollection([pystac.Item.from_dict(FAKE_ITEM)])
+
+
+@pytest.fixture
+def unsigned():
+    """Stand in for Planetary Computer signing."""
+    with patch(
+        "data_pipeline.stac_cache.planetary_computer.sign", side_effect=lambda x: x
+    ) as mock_sign:
+        yield mock_sign
+
+
+def test_make_cache_key_is_stable_and_sensitive():
+    aoi = box(-72, -39, -71, -38)
+    key = stac_cache.make_cache_key(
+        collections=["landsat-c2-l2"], intersects=aoi, datetime="2020", query=None
+    )
+
+    assert key == stac_cache.make_cache_key(
+        query=None,
+        datetime="2020",
+        intersects=box(-72, -39, -71, -38),
+        collections=["landsat-c2-l2"],
+    )
+    assert key != stac_cache.make_cache_key(
+        collections=["landsat-c2-l2"], intersects=aoi, datetime="2021", query=None
+    )
+
+
+def test_save_and_load_round_trip(tmp_path, fake_items, unsigned):
+    path = stac_cache.save_cached_items(str(tmp_path), "abc", fake_items)
+
+    items = stac_cache.load_cached_items(str(tmp_path), "abc")
+
+    assert os.path.exists(path)
+    assert [item.id for item in items] == [FAKE_ITEM["id"]]
+    assert "?" not in items[0].assets["qa_pixel"].href
+    unsigned.assert_called_once()
+    # The original collection keeps its signed URLs.
+    assert "sig=abc" in fake_items[0].assets["qa_pixel"].href
+
+
+def test_load_missing_entry(tmp_path):
+    assert stac_cache.load_cached_items(str(tmp_path), "missing") is None
+
+
+def test_load_expired_entry(tmp_path, fake_items, unsigned):
+    path = stac_cache.save_cached_items(str(tmp_path), "abc", fake_items)
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+
+    assert stac_cache.load_cached_items(str(tmp_path), "abc", ttl=60) is None
+
+
+@patch("data_pipeline.clear_sky.pystac_client.Client")
+def test_search_stac_items_reuses_cache(
+    mock_client, tmp_path, fake_items, unsigned, monkeypatch
+):
+    monkeypatch.setenv(stac_cache.STAC_CACHE_DIR_ENV, str(tmp_path))
+    mock_catalog = Mock()
+    mock_client.open.return_value = mock_catalog
+    mock_catalog.search.return_value.item_collection.return_value = fake_items
+    search_kwargs = {
+        "collections": ["landsat-c2-l2"],
+        "intersects": box(-72, -39, -71, -38),
+        "datetime": "2020-01-01/2020-12-31",
+    }
+
+    first = search_stac_items(**search_kwargs)
+    second = search_stac_items(**search_kwargs)
+
+    mock_client.open.assert_called_once()
+    assert [item.id for item in second] == [item.id for item in first]
+
+
+@patch("data_pipeline.clear_sky.pystac_client.Client")
+def test_search_stac_items_without_cache(mock_client, fake_items, monkeypatch):
+    monkeypatch.delenv(stac_cache.STAC_CACHE_DIR_ENV, raising=False)
+    mock_catalog = Mock()
+    mock_client.open.return_value = mock_catalog
+    mock_catalog.search.return_value.item_collection.return_value = fake_items
+
+    search_stac_items(collections=["jrc-gsw"])
+    search_stac_items(collections=["jrc-gsw"])
+
+    # The catalog client is shared, but every search reaches the catalog.
+    mock_client.open.assert_called_once()
+    assert mock_catalog.search.call_count == 2
@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+import json
+
+import fsspec
+import pytest
+from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+
+from api.validation import MosaicValidator, validate_mosaic_file
+
+COG = "memory://cogs/landsat_233083_uint8.tif"
+
+
+@pytest.fixture
+def memory_fs():
+    fs = fsspec.filesystem("memory")
+    fs.store.clear()
+    fs.pseudo_dirs.clear()
+    fs.pseudo_dirs.append("")
+    fs.pipe_file("/cogs/landsat_233083_uint8.tif", b"cog")
+    yield fs
+    fs.store.clear()
+
+
+def mosaic_document(**overrides) -> dict:
+    # Quadkeys 0 and 2 at zoom 1 cover the western hemisphere.
+    document = {
+        "mosaicjson": "0.0.3",
+        "version": "1.0.0",
+        "minzoom": 1,
+        "maxzoom": 12,
+        "quadkey_zoom": 1,
+        "bounds": [-71.0, -34.0, -70.0, -32.0],
+        "tiles": {"0": [COG], "2": [COG]},
+    }
+    document.update(overrides)
+    return document
+
+
+def validate(memory_fs, document: dict, path="memory://mosaics/m.json.gz", **kwargs):
+    data = json.dumps(document).encode()
+    if path.endswith(".gz"):
+        data = gzip.compress(data)
+    memory_fs.pipe_file(path.split("://", 1)[1], data)
+    return asyncio.run(
+        validate_mosaic_file(
+            AsyncFileSystemWrapper(memory_fs), path, chunk_size=7, **kwargs
+        )
+    )
+
+
+def test_valid_mosaic_in_small_ranged_reads(memory_fs):
+    report = validate(memory_fs, mosaic_document())
+
+    assert report["valid"], report["errors"]
+    assert report["tiles_count"] == 2
+    assert report["assets_count"] == 1
+    assert report["quadkey_zooms"] == {1: 2}
+    assert report["tiles_bounds"] == pytest.approx([-180.0, -85.0511, 0.0, 85.0511])
+
+
+def test_uncompressed_mosaic(memory_fs):
+    report = validate(memory_fs, mosaic_document(), path="memory://mosaics/m.json")
+
+    assert report["valid"], report["errors"]
+    assert report["tiles_count"] == 2
+
+
+def test_reports_structural_errors(memory_fs):
+    document = mosaic_document(
+        bounds=[10.0, -34.0, 20.0, -32.0],
+        tiles={"0": [COG], "02": [COG], "9": ["memory://cogs/missing.tif"]},
+    )
+
+    report = validate(memory_fs, document)
+
+    assert not report["valid"]
+    assert report["missing_assets"] == ["memory://cogs/missing.tif"]
+    errors = "\n".join(report["errors"])
+    assert "1 invalid quadkey(s)" in errors
+    assert "1 quadkey(s) not at quadkey zoom 1" in errors
+    assert "not the mosaic bounds" in errors
+    assert "referenced COG(s) not found" in errors
+
+
+def test_missing_fields_and_skipped_asset_check(memory_fs):
+    document = mosaic_document(tiles={"2": ["memory://cogs/missing.tif"]})
+    del document["maxzoom"]
+
+    report = validate(memory_fs, document, check_assets=False)
+
+    assert report["errors"] == ["Missing required fields: maxzoom"]
+    assert report["missing_assets"] == []
+
+
+def test_truncated_gzip_stream():
+    data = gzip.compress(json.dumps(mosaic_document()).encode())
+    validator = MosaicValidator(gzipped=True)
+    validator.write(data[:-20])
+
+    with pytest.raises(ValueError, match="Truncated"):
+        validator.close()
+
+
+def test_decompressed_steps_are_bounded():
+    validator = MosaicValidator(gzipped=True, chunk_size=64)
+    sizes = []
+    validator._parse = lambda data: sizes.append(len(data))
+    tiles = {"0" * 12: [COG] * 1000}
+
+    validator.write(gzip.compress(json.dumps(mosaic_document(tiles=tiles)).encode()))
+
+    assert max(sizes) <= 64
+    assert sum(sizes) > 64 * 100
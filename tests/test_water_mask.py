@@ -0,0 +1,29 @@
+"""Tests for the per-tile water mask cache."""
+
+import numpy as np
+
+from data_pipeline import water_mask
+
+
+def test_make_grid_key_depends_on_grid():
+    transform = (30.0, 0.0, 500000.0, 0.0, -30.0, 6000000.0)
+    key = water_mask.make_grid_key("EPSG:32719", transform, (100, 200))
+
+    assert key == water_mask.make_grid_key("EPSG:32719", transform, (100, 200))
+    assert key != water_mask.make_grid_key("EPSG:32719", transform, (100, 201))
+    assert key != water_mask.make_grid_key("EPSG:32718", transform, (100, 200))
+
+
+def test_load_missing_mask(tmp_path):
+    assert water_mask.load_water_mask(str(tmp_path), "missing") is None
+
+
+def test_save_and_load_is_memory_mapped(tmp_path):
+    water = np.array([[True, False, False], [False, True, False]])
+
+    path = water_mask.save_water_mask(str(tmp_path / "masks"), "abc", water)
+    loaded = water_mask.load_water_mask(str(tmp_path / "masks"), "abc")
+
+    assert path.endswith("water_abc.npy")
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, water)
@@ -0,0 +1,171 @@
+import asyncio
+import gzip
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import rasterio
+import rasterio.warp
+from fastapi.testclient import TestClient
+
+from api.footprints import mosaic_from_footprints, read_cog_footprints
+from api.main import app
+from api.zonal_stats import overview_level, polygon_statistics
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": "test-key"}
+pytestmark = pytest.mark.usefixtures("reset_caches")
+
+
+@pytest.fixture
+def pixel_box(cog_transform):
+    """Return WGS84 GeoJSON polygons around blocks of pixels of the test COGs."""
+
+    def box(row_start, row_stop, col_start, col_stop):
+        west, north = cog_transform * (col_start, row_start)
+        east, south = cog_transform * (col_stop, row_stop)
+        ring = [
+            (west, south),
+            (east, south),
+            (east, north),
+            (west, north),
+            (west, south),
+        ]
+        return rasterio.warp.transform_geom(
+            "EPSG:32719", "EPSG:4326", {"type": "Polygon", "coordinates": [ring]}
+        )
+
+    return box
+
+
+@pytest.fixture
+def cogs(tmp_path, write_cog):
+    # The newer COG has 80% on its top half, 40% on its bottom-right quarter, and
+    # no observations on its bottom-left quarter.
+    percentage = np.full((512, 512), 80)
+    percentage[256:] = 40
+    count = np.full((512, 512), 20)
+    count[256:, :256] = 0
+    percentage[256:, :256] = 0
+    newer = write_cog(tmp_path / "newer_uint8.tif", percentage, count)
+    older = write_cog(tmp_path / "older_uint8.tif", np.full((512, 512), 10))
+    return newer, older
+
+
+@pytest.fixture
+def mosaic(cogs):
+    return mosaic_from_footprints(asyncio.run(read_cog_footprints(list(cogs))))
+
+
+def test_statistics_over_one_cog(mosaic, cogs, pixel_box):
+    newer, _ = cogs
+
+    stats = polygon_statistics(mosaic, pixel_box(100, 400, 300, 400))
+
+    assert stats["assets"] == [newer]
+    assert stats["coverage"] == 1.0
+    assert stats["min"] == 40
+    assert stats["max"] == 80
+    assert stats["valid_observations_mean"] == 20
+    assert stats["resolution"] == pytest.approx(30)
+    assert sum(stats["histogram"]["counts"]) == stats["valid_pixels"]
+
+
+def test_pixels_without_observations_fall_through(mosaic, cogs, pixel_box):
+    newer, older = cogs
+
+    stats = polygon_statistics(mosaic, pixel_box(300, 400, 200, 300))
+
+    assert stats["assets"] == [newer, older]
+    assert stats["coverage"] == 1.0
+    assert stats["min"] == 10
+    # Pixels from single-band COGs have no counts.
+    assert stats["valid_observations_mean"] is None
+
+
+def test_large_polygons_read_overviews(mosaic, cogs, pixel_box):
+    newer, _ = cogs
+    with rasterio.open(newer) as src:
+        assert src.overviews(1) == [2]
+        assert overview_level(src, 30) is None
+        assert overview_level(src, 60) == 0
+
+    stats = polygon_statistics(mosaic, pixel_box(0, 512, 0, 512), max_size=256)
+
+    assert stats["resolution"] == pytest.approx(60, rel=0.05)
+    assert stats["pixels"] < 256 * 256 * 1.1
+    assert stats["mean"] == pytest.approx((80 * 2 + 40 + 10) / 4, abs=1)
+
+
+def test_each_cog_is_opened_once(mosaic, cogs, pixel_box):
+    opened = []
+    original_open = rasterio.open
+
+    def counting_open(url, *args, **kwargs):
+        opened.append(url)
+        return original_open(url, *args, **kwargs)
+
+    with patch("api.zonal_stats.rasterio.open", counting_open):
+        stats = polygon_statistics(mosaic, pixel_box(0, 512, 0, 512), max_size=256)
+
+    assert opened == stats["assets"] == list(cogs)
+
+
+def test_polygon_outside_mosaic(pixel_box):
+    mosaic = mosaic_from_footprints(
+        [
+            {
+                "type": "Feature",
+                "geometry": pixel_box(0, 1, 0, 1),
+                "properties": {"path": "missing.tif", "minzoom": 7, "maxzoom": 12},
+            }
+        ]
+    )
+    ring = [(-60, -33), (-59, -33), (-59, -32), (-60, -32), (-60, -33)]
+
+    stats = polygon_statistics(mosaic, {"type": "Polygon", "coordinates": [ring]})
+
+    assert stats["valid_pixels"] == 0
+    assert stats["mean"] is None
+
+
+def test_zonal_stats_endpoint(mosaic, tmp_path, pixel_box):
+    url = str(tmp_path / "mosaic.json.gz")
+    with open(url, "wb") as f:
+        f.write(gzip.compress(mosaic.model_dump_json().encode("utf-8")))
+    feature = {
+        "type": "Feature",
+        "geometry": pixel_box(10, 20, 10, 20),
+        "properties": {"rol": "123-45"},
+    }
+
+    response = client.post(
+        "/clear-sky/zonal-stats", params={"url": url}, json=feature, headers=HEADERS
+    )
+    assert response.status_code == 200
+    properties = response.json()["properties"]
+    assert properties["rol"] == "123-45"
+    assert properties["statistics"]["mean"] == 80
+
+    response = client.post(
+        "/clear-sky/zonal-stats",
+        params={"url": url},
+        json={"type": "FeatureCollection", "features": [feature, feature]},
+        headers=HEADERS,
+    )
+    assert response.status_code == 200
+    assert len(response.json()["features"]) == 2
+
+
+def test_zonal_stats_rejects_points():
+    response = client.post(
+        "/clear-sky/zonal-stats",
+        params={"url": "gs://bucket/mosaic.json.gz"},
+        json={
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [-70.6, -33.4]},
+            "properties": {},
+        },
+        headers=HEADERS,
+    )
+    assert response.status_code == 400